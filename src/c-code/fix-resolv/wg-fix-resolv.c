@@ -10,8 +10,18 @@
  *  - openssl to compute file hash for fast compare
  *
  * Since resolv.conf files are tiny they are read into memory.
+ *
+ * Modes:
+ *  - one-shot (no args) : check / restore once and exit.
+ *  - --serve            : stay running and handle requests, one per line on stdin.
+ *                         Each "repair" request is answered by one line on stdout:
+ *                           ok same | ok updated | ok restored | err <reason>
+ *                         Messages go to stderr so stdout carries replies only.
+ *                         Caps are checked and digest setup done once.
+ *                         Exits on "quit" or end of input.
  */
 #include <stdio.h>
+#include <stdarg.h>
 #include <stdlib.h>
 #include <fcntl.h>
 #include <unistd.h>
@@ -26,6 +36,15 @@
 
 #define OPENSSL_ENGINE NULL
 #define BUFSZ 10240
+#define LINESZ 256
+
+// where messages go : stdout (one-shot) or stderr (serve mode)
+static FILE *msg_out = NULL;
+
+// digest setup shared by every read (and every request in serve mode)
+static EVP_MD *md_cached = NULL;
+static const char *md_cached_algo = NULL;
+static EVP_MD_CTX *ctx_cached = NULL;
 
 // track permissions / capabilities
 struct perms {
@@ -45,6 +64,18 @@ struct file_data {
     unsigned int digest_len ;
 };
 
+//
+// printf for messages
+//
+static void msg(const char *fmt, ...)
+{
+    va_list args;
+
+    va_start(args, fmt);
+    vfprintf(msg_out != NULL ? msg_out : stdout, fmt, args);
+    va_end(args);
+}
+
 #if defined(TESTING)
 //
 // testing tool : print digest in standard hex form
@@ -94,6 +125,52 @@ static int check_permissions(struct perms *perms)
     return(0) ;
 }
 
+//
+// Digest algorithm and context
+//  - fetched / allocated once and reused for every digest
+//  - released by free_digest()
+//
+static int get_digest(const char *digest_algo, EVP_MD **md, EVP_MD_CTX **ctx)
+{
+    if (md_cached != NULL && strcmp(md_cached_algo, digest_algo) != 0) {
+        EVP_MD_free(md_cached);
+        md_cached = NULL;
+    }
+
+    if (md_cached == NULL) {
+        md_cached = EVP_MD_fetch(NULL, digest_algo, NULL);
+        if (md_cached == NULL){
+            msg("Digest error: failed allocate md\n");
+            return(-1);
+        }
+        md_cached_algo = digest_algo;
+    }
+
+    if (ctx_cached == NULL) {
+        ctx_cached = EVP_MD_CTX_new();
+        if (ctx_cached == NULL) {
+            msg("Digest error: failed allocate ctx\n");
+            return(-1);
+        }
+    }
+
+    *md = md_cached;
+    *ctx = ctx_cached;
+    return(0);
+}
+
+static void free_digest(void)
+{
+    if (ctx_cached != NULL) {
+        EVP_MD_CTX_free(ctx_cached);
+        ctx_cached = NULL;
+    }
+    if (md_cached != NULL) {
+        EVP_MD_free(md_cached);
+        md_cached = NULL;
+    }
+}
+
 //
 // Compute digest of the file data 
 //  - use openssl crypto lib to do the work
@@ -105,7 +182,7 @@ static const int compute_digest(struct file_data *fdata)
     int ret = 0;
 
     if (fdata == NULL || fdata->data == NULL || fdata->data_len < 1){
-        printf("Digest error: missing input\n") ;
+        msg("Digest error: missing input\n") ;
         ret = -1;
         goto clean_up;
     }
@@ -119,24 +196,15 @@ static const int compute_digest(struct file_data *fdata)
     }
 
     //
-    // Make new md and ctx
+    // md and ctx (reused)
     //
-    md = EVP_MD_fetch(NULL, fdata->digest_algo, NULL);
-    if (md == NULL){
-        printf("Digest error: failed allocate md\n");
-        ret = -1;
-        goto clean_up;
-    }
-
-    ctx = EVP_MD_CTX_new();
-    if (ctx == NULL) {
-        printf("Digest error: failed allocate ctx\n");
+    if (get_digest(fdata->digest_algo, &md, &ctx) < 0) {
         ret = -1;
         goto clean_up;
     }
 
     if (EVP_DigestInit_ex(ctx, md, OPENSSL_ENGINE) < 0) {
-        printf("Digest errir: Digest init\n");
+        msg("Digest errir: Digest init\n");
         ret = -1;
         goto clean_up;
     }
@@ -145,7 +213,7 @@ static const int compute_digest(struct file_data *fdata)
     // Pass data into the digest context ctx
     //
     if (EVP_DigestUpdate(ctx, fdata->data, fdata->data_len) < 0) {
-        printf("Digest error: update failed\n");
+        msg("Digest error: update failed\n");
         ret = -1;
         goto clean_up;
     }
@@ -155,7 +223,7 @@ static const int compute_digest(struct file_data *fdata)
     //
     fdata->digest = OPENSSL_malloc(EVP_MD_get_size(md));
     if (fdata->digest == NULL) {
-        printf("Digest error: memory alloc failed\n");
+        msg("Digest error: memory alloc failed\n");
         ret = -1;
         goto clean_up;
     }
@@ -164,16 +232,12 @@ static const int compute_digest(struct file_data *fdata)
     // Calculate digest value and save into allocated digest buffer
     //
     if (EVP_DigestFinal_ex(ctx, fdata->digest, &fdata->digest_len) < 0) {
-        printf("Hash: digest finalization failed.\n");
+        msg("Hash: digest finalization failed.\n");
         ret = -1;
         goto clean_up;
     }
 
 clean_up:
-    if (ctx != NULL)
-        EVP_MD_CTX_free(ctx);
-    if (md != NULL)
-        EVP_MD_free(md);
     if (ret != 0)
         ERR_print_errors_fp(stderr);
 
@@ -200,7 +264,7 @@ static unsigned char *mem_alloc(unsigned char *curr_mem, ssize_t bytes)
     }
 
     if (mem == NULL) {
-        printf("Error %sallocating %zd bytes: %s\n", which, bytes, strerror(errno));
+        msg("Error %sallocating %zd bytes: %s\n", which, bytes, strerror(errno));
     }
     return (mem);
 }
@@ -233,7 +297,7 @@ static int read_file(struct file_data *fdata)
     //
     fdin = open(fdata->pathname, O_RDONLY) ;
     if (fdin < 0) {
-        printf("Failed to open file %s : %s\n", fdata->pathname, strerror(errno));
+        msg("Failed to open file %s : %s\n", fdata->pathname, strerror(errno));
         fdata->data_is_good = false ;
         return(-1);
     }
@@ -245,14 +309,16 @@ static int read_file(struct file_data *fdata)
     fdata->data = mem_alloc(fdata->data, bytes_total);
     if (fdata->data == NULL) {
         fdata->data_is_good = false ;
+        close(fdin) ;
         return(-1);
     }
 
     do {
         bytes = read(fdin, &(fdata->data[fdata->data_len]), BUFSZ) ;
         if (bytes < 0) {
-            printf("Error reading %s : %s\n", fdata->pathname, strerror(errno));
+            msg("Error reading %s : %s\n", fdata->pathname, strerror(errno));
             fdata->data_is_good = false ;
+            close(fdin) ;
             return(-1);
         }
         fdata->data_len += (unsigned int)bytes;
@@ -265,6 +331,7 @@ static int read_file(struct file_data *fdata)
             fdata->data = mem_alloc(fdata->data, bytes_total);
             if (fdata->data == NULL) {
                 fdata->data_is_good = false ;
+                close(fdin) ;
                 return(-1);
             }
         }
@@ -278,6 +345,8 @@ static int read_file(struct file_data *fdata)
     //
     // Resize down to free up unused mem
     //
+    close(fdin) ;
+
     bytes = fdata->data_len ;
     fdata->data = mem_alloc(fdata->data, bytes);
     if (fdata->data == NULL) {
@@ -285,14 +354,12 @@ static int read_file(struct file_data *fdata)
         return(-1);
     }
 
-    close(fdin) ;
-
     //
     // All good - compute the hash 
     //
     ret = compute_digest(fdata);
     if (ret < 0) {
-        printf("Failed to compute digest : %s\n", fdata->pathname);
+        msg("Failed to compute digest : %s\n", fdata->pathname);
         return(-1);
     }
     return(0);
@@ -310,7 +377,7 @@ static int write_file(struct file_data *fdata, const char *pathname)
     pid_t pid ;
 
     if (fdata->data == NULL || fdata->data_len == 0){
-        printf("No data to write to : %s\n", pathname);
+        msg("No data to write to : %s\n", pathname);
         return(-1) ;
     }
 
@@ -322,14 +389,15 @@ static int write_file(struct file_data *fdata, const char *pathname)
 
     fdout = open(path_tmp, O_CREAT|O_RDWR, S_IRUSR|S_IWUSR|S_IRGRP|S_IROTH);
     if (fdout < 0) {
-        printf("Failed to open path %s : %s\n", pathname, strerror(errno));
+        msg("Failed to open path %s : %s\n", pathname, strerror(errno));
         return(-1) ;
     }
 
     if (fdata->data_len > 0) {
         ret = write(fdout, fdata->data, fdata->data_len);
         if (ret < 0){
-            printf("Failed to write path %s : %s\n", path_tmp, strerror(errno));
+            msg("Failed to write path %s : %s\n", path_tmp, strerror(errno));
+            close(fdout) ;
             return(-1) ;
         }
     }
@@ -340,7 +408,7 @@ static int write_file(struct file_data *fdata, const char *pathname)
     //
     ret = rename((const char *)path_tmp, pathname) ;
     if (ret < 0) {
-        printf("Failed to rename %s to %s : %s\n", path_tmp, pathname, strerror(errno));
+        msg("Failed to rename %s to %s : %s\n", path_tmp, pathname, strerror(errno));
         return(-1) ;
     }
     return(0) ;
@@ -353,7 +421,7 @@ static int chown_root(const struct perms *perms, const char *pathname) {
 
     if (perms->euid == 0 || perms->cap_chown == true) {
         if (chown(pathname, 0, 0)) {
-            printf("Failed chown root : %s\n", pathname);
+            msg("Failed chown root : %s\n", pathname);
             return(-1);
         }
     }
@@ -372,7 +440,7 @@ static bool files_same(const struct file_data *fd1, const struct file_data *fd2)
     if (fd1->data_len != fd2->data_len) {
         return (false);
     } 
-    else if (strncmp((const char *)fd1->digest, (const char *)fd2->digest, fd1->digest_len) == 0) {
+    else if (memcmp(fd1->digest, fd2->digest, fd1->digest_len) == 0) {
         return (true);
     } 
     return (false);
@@ -385,36 +453,28 @@ static void clean_mem(struct file_data *fdata)
 {
     if (fdata->data != NULL) {
         free((void *)fdata->data) ;
+        fdata->data = NULL;
     }
     if (fdata->digest != NULL) {
         OPENSSL_free(fdata->digest);
+        fdata->digest = NULL;
         fdata->digest_len = 0;
     }
 }
 
 //
-// Program to manage resolv.conf file and ensure 
-// wireguard version is in /etc/resolv.conf
-// While VPN is running, some events lead  networking tools 
-// (e.g. dhcp) to replace it.
-//
-// When wireguard exits it restores the original resolv.conf
-// using PostDown wireguard config.
-//
-// Our job is to keep the correct wireguard resolv.conf
-//
-// Requires capabilities : CAP_CHOWN, CAP_DAC_OVERRIDE
-//  - caps are needed to write /etc/resolv.conf
-//  or owner has appropriate file permissions.
-// Hard code pathnames to minimize any attack surface.
-// NB: any change to binary will cause caps to be dropped
+// Check and restore resolv.conf once
+//  - action is set to what was done : "same", "updated" or "restored"
+// Returns 0 on success and -1 on error
 //
-int main(int argc, char **argv) {
+static int fix_resolv(const struct perms *perms, const char **action)
+{
     int ret = -1 ;
-    struct perms perms ;
     struct file_data fdata_wg, fdata_save, fdata_resolv ;
     const char *digest_algo = "SHA384" ;
 
+    *action = "same";
+
     memset((void *)&fdata_wg, 0, sizeof(fdata_wg)) ;
     memset((void *)&fdata_save, 0, sizeof(fdata_save)) ;
     memset((void *)&fdata_resolv, 0, sizeof(fdata_resolv)) ;
@@ -427,19 +487,14 @@ int main(int argc, char **argv) {
     fdata_save.digest_algo  = digest_algo;
     fdata_resolv.digest_algo  = digest_algo;
 
-    check_permissions(&perms);
-    if (perms.cap_dac_override == false) {
-        printf("Warning : missing CAP_DAC_OVERRIDE capability\n");
-    }
-
     //
     // Read wg resolv
     //  - quit if not found 
     //
     ret = read_file(&fdata_wg);
     if (ret < 0) {
-        printf("Error : missing file %s\n", fdata_wg.pathname);
-        return(-1);
+        msg("Error : missing file %s\n", fdata_wg.pathname);
+        goto clean_up;
     }
 
     //
@@ -450,12 +505,12 @@ int main(int argc, char **argv) {
         //
         // If Missing resolv.conf then replace with wg version
         //
-        printf("Restoring missing %s from wg version %s\n", fdata_resolv.pathname, fdata_wg.pathname);
+        msg("Restoring missing %s from wg version %s\n", fdata_resolv.pathname, fdata_wg.pathname);
         ret = write_file(&fdata_wg, fdata_resolv.pathname) ;
-        if (ret < 1) {
-            return(-1);
+        if (ret == 0) {
+            *action = "restored";
         }
-        return (0);
+        goto clean_up;
     }
 
     //
@@ -463,8 +518,9 @@ int main(int argc, char **argv) {
     //
     ret = read_file(&fdata_save);
     if (ret < 0) {
-        printf("Warning: Unable to read : %s\n", fdata_save.pathname);
+        msg("Warning: Unable to read : %s\n", fdata_save.pathname);
     } 
+    ret = 0;
     
     //
     // Check resolv.conf :
@@ -475,12 +531,13 @@ int main(int argc, char **argv) {
         //
         // resolv.conf changed and doesn't match wireguard version so replace it.
         //
-        printf("Updating : %s\n", fdata_resolv.pathname);
+        msg("Updating : %s\n", fdata_resolv.pathname);
         ret = write_file(&fdata_wg, fdata_resolv.pathname) ;
         if (ret < 0) {
-            return(-1);
+            goto clean_up;
         }
-        chown_root(&perms, fdata_resolv.pathname) ;
+        chown_root(perms, fdata_resolv.pathname) ;
+        *action = "updated";
 
         //
         // resolv.conf.saved
@@ -488,16 +545,16 @@ int main(int argc, char **argv) {
         //   Probably only happens after changing network location with different default resolver
         //
         if (!fdata_save.data_is_good || !files_same(&fdata_resolv, &fdata_save)){
-            printf("Updating : %s\n", fdata_save.pathname);
+            msg("Updating : %s\n", fdata_save.pathname);
             ret = write_file(&fdata_resolv, fdata_save.pathname);
             if (ret < 0) {
-                return(-1);
+                goto clean_up;
             }
-            chown_root(&perms, fdata_save.pathname) ;
+            chown_root(perms, fdata_save.pathname) ;
         }
     } 
 
-
+clean_up:
     //
     // Clean up mem
     //
@@ -505,5 +562,86 @@ int main(int argc, char **argv) {
     clean_mem(&fdata_resolv);
     clean_mem(&fdata_save);
 
+    return(ret);
+}
+
+//
+// Serve mode : one request per line on stdin, one reply line on stdout
+//  - "repair" : check / restore resolv.conf
+//  - "quit" or end of input : exit
+//
+static int serve(const struct perms *perms)
+{
+    char line[LINESZ];
+    const char *action = NULL;
+    size_t len ;
+
+    msg_out = stderr;
+    setvbuf(stdout, NULL, _IOLBF, 0);
+
+    while (fgets(line, sizeof(line), stdin) != NULL) {
+        len = strcspn(line, "\r\n");
+        line[len] = '\0';
+
+        if (strcmp(line, "quit") == 0) {
+            break;
+        }
+        else if (strcmp(line, "repair") == 0) {
+            if (fix_resolv(perms, &action) == 0) {
+                printf("ok %s\n", action);
+            } else {
+                printf("err repair failed\n");
+            }
+        }
+        else {
+            printf("err unknown request\n");
+        }
+        fflush(stderr);
+    }
     return(0);
 }
+
+//
+// Program to manage resolv.conf file and ensure 
+// wireguard version is in /etc/resolv.conf
+// While VPN is running, some events lead  networking tools 
+// (e.g. dhcp) to replace it.
+//
+// When wireguard exits it restores the original resolv.conf
+// using PostDown wireguard config.
+//
+// Our job is to keep the correct wireguard resolv.conf
+//
+// Requires capabilities : CAP_CHOWN, CAP_DAC_OVERRIDE
+//  - caps are needed to write /etc/resolv.conf
+//  or owner has appropriate file permissions.
+// Hard code pathnames to minimize any attack surface.
+// NB: any change to binary will cause caps to be dropped
+//
+// With --serve stays running and handles requests from stdin (see serve())
+//
+int main(int argc, char **argv) {
+    int ret = -1 ;
+    struct perms perms ;
+    const char *action = NULL;
+    bool serve_mode = false;
+
+    if (argc > 1 && strcmp(argv[1], "--serve") == 0) {
+        serve_mode = true;
+        msg_out = stderr;
+    }
+
+    check_permissions(&perms);
+    if (perms.cap_dac_override == false) {
+        msg("Warning : missing CAP_DAC_OVERRIDE capability\n");
+    }
+
+    if (serve_mode) {
+        ret = serve(&perms);
+    } else {
+        ret = fix_resolv(&perms, &action);
+    }
+
+    free_digest();
+    return(ret);
+}
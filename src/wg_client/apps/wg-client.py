@@ -5,7 +5,8 @@
 Command line Start and Stop Wireguard
 """
 # pylint: disable=invalid-name
-from wg_client.cmd_line import WgClient
+import sys
+from wg_client.daemon import thin_request
 
 
 def main():
@@ -18,7 +19,15 @@ def main():
     create /etc/sudoers.d/wg-runner
         <user>   ALL=NOPASSWD: SETENV: /usr/bin/wg-quick
     where <user> is the user who will be using the tool
+
+    With a control daemon running, a single request is handed straight to it
     """
+    if thin_request(sys.argv[1:]):
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from wg_client.cmd_line import WgClient
+
     client = WgClient()
 
     if client.okay:
@@ -4,6 +4,7 @@
 Library
 """
 from .class_client import WgClient
+from .class_opts import WgClientOpts
 
 from .get_info import is_wg_running
 from .get_info import get_wg_iface
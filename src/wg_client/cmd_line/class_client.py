@@ -13,25 +13,41 @@ Class for Start, Stop Wireguard client on linux
 """
 # pylint: disable=too-many-instance-attributes,too-many-branches
 import os
+import json
 import time
-from typing import Callable
+import threading
+from typing import (Any, Callable)
 
 from wg_client.proc import MyProc
 from wg_client.proc import MySignals
 from wg_client.proc import who_logged_in
+from wg_client.proc import ProcTable
+from wg_client.proc import process_owner
+from wg_client.proc import user_uid
 from wg_client.utils import MyLog
 from wg_client.utils import version
 from wg_client.resolv import WgResolv
+from wg_client.resolv import RESOLV_SIGNATURE
 
 from wg_client.net import iface_to_ips
+from wg_client.net import wait_for_iface
 
 from wg_client.ssh import (get_ssh_port_prefix, ssh_args)
-from wg_client.ssh import SshMgr
-
-from .class_opts import WgClientOpts
+from wg_client.ssh import (SshMgr, reconnect_policy)
+from wg_client.ssh import (SSH_SIGNATURE, ssh_pid_tag)
+from wg_client.ssh import (read_prefix_cache, prefix_order)
+from wg_client.ssh import (read_ssh_status, latency_string, ssh_failure)
+from wg_client.ssh import (read_ssh_pid, check_ssh_pid)
+from wg_client.daemon import daemon_request
+from wg_client.config import ConfigWatch
+
+from .class_opts import (WgClientOpts, parse_ssh_pfx)
 from .get_info import is_wg_running
 
 
+STATUS_SCHEMA = 3
+
+
 def wg_quick_cmd(test: bool, euid: int, updn: str, iface: str):
     '''
     consruct pargs for running wg_quick
@@ -57,6 +73,7 @@ class WgClient():
         self.wg_ip: str = ''
         self.wg_ip6: str = ''
         self.test: bool = False
+        self.iface_wait_max: float = 60.0
 
         self.opts = WgClientOpts()
         self.iface: str = self.opts.iface
@@ -64,7 +81,7 @@ class WgClient():
             self.test = True
 
         self.run_proc = None
-        self.resolv: WgResolv = WgResolv()
+        self.resolv: WgResolv = WgResolv(self.opts.resolv_quiet_ms, self.opts.resolv_max_ms)
 
         self.mysignals: MySignals = MySignals()
         self.logger: MyLog = MyLog('wg-client')
@@ -81,20 +98,177 @@ class WgClient():
         self.ssh_lport: str = ''
         self.ssh_args: list[str] = []
         self.ssh_pfx: int = -1
-        self.ssh_mgr = SshMgr(self.opts.test, log=self.log)
+        self.ssh_mgr = self.new_ssh_mgr()
+        # listeners on ssh_extra_servers (filled by ssh_init)
+        self.ssh_extra: list[SshMgr] = []
+        # listener running in this process : its managers must be kept
+        self.ssh_active: bool = False
+
+        # control daemon: None until asked
+        self.use_daemon: bool = not self.opts.no_daemon
+        self.daemon_status: dict[str, Any] | None = None
+
+        # live config reload (long running only)
+        self.config_watch: ConfigWatch | None = None
         # self.ssh_init()
 
     def log(self, msg: str):
         """ log file """
         self.logger.log(msg)
 
-    def is_ssh_running(self, user: str = '') -> bool:
+    def new_ssh_mgr(self, server: str = '') -> SshMgr:
+        """
+        SshMgr for one tunnel
+         - server empty for the primary (ssh_server)
+         - extra tunnels log with their server name and have their own pidfile
+        """
+        def server_log(msg: str):
+            self.log(f'[{server}] {msg}')
+
+        log = server_log if server else self.log
+        ssh_mgr = SshMgr(self.opts.test, log=log, policy=reconnect_policy(vars(self.opts)),
+                         tag=ssh_pid_tag(server))
+        ssh_mgr.wg_iface = self.iface
+        ssh_mgr.set_health(self.opts.ssh_alive_interval, self.opts.ssh_alive_count,
+                           self.opts.ssh_probe_secs)
+        return ssh_mgr
+
+    def ssh_ports(self, wg_ip: str, server: str, first: int) -> list[tuple[int, str]]:
+        """
+        Remote ports to try on server : (prefix, port) for first prefix
+        then the rest of pfx_range
+        """
+        ports: list[tuple[int, str]] = []
+        for prefix in prefix_order(self.opts.pfx_range, first):
+            rport = ssh_args(wg_ip, server, prefix)[1]
+            if rport:
+                ports.append((prefix, rport))
+        return ports
+
+    def ssh_mgrs(self) -> list[SshMgr]:
+        """ all tunnels : primary first """
+        return [self.ssh_mgr] + self.ssh_extra
+
+    def ssh_tunnels(self) -> list[tuple[str, str]]:
+        """
+        Configured tunnels : (pidfile tag, server), primary first
+         - from config so works without a running listener in this process
+        """
+        tunnels = [(ssh_pid_tag(), self.opts.ssh_server)]
+        for server in self.opts.ssh_extra_servers:
+            if server != self.opts.ssh_server:
+                tunnels.append((ssh_pid_tag(server), server))
+        return tunnels
+
+    def ssh_status(self) -> dict[str, dict[str, Any]]:
+        """
+        Saved state record of each configured tunnel : server -> record ({} if none)
+        """
+        return {server: read_ssh_status(tag) for (tag, server) in self.ssh_tunnels()}
+
+    def start_config_watch(self):
+        """
+        Long running processes follow config file changes
+        """
+        if self.config_watch is None:
+            self.config_watch = ConfigWatch(self.apply_config, log=self.log)
+            self.config_watch.start()
+
+    def apply_config(self, old: dict[str, Any], new: dict[str, Any]):
+        """
+        Config file changed (called from config watch thread)
+         - values given on command line are kept
+         - iface change needs a restart (wireguard is already up on old one)
+         - ssh listener is only reconnected if its command changes
+           (server, prefix, keepalive or probe settings)
+        """
+        changed: list[str] = []
+        for key in sorted(set(old) | set(new)):
+            if old.get(key) == new.get(key):
+                continue
+            if key in self.opts.cmdline_keys:
+                self.log(f'config: {key} set on command line - change ignored')
+                continue
+            if key == 'iface':
+                self.log(f'config: iface change to {new.get(key)} needs restart')
+                continue
+            setattr(self.opts, key, new.get(key))
+            changed.append(key)
+
+        if not changed:
+            return
+        self.log(f'config: applied {", ".join(changed)}')
+        self.opts.config = new
+
+        if 'ssh_extra_servers' in changed:
+            self.log('config: ssh_extra_servers change needs restart')
+
+        if any(key.startswith('ssh_reconnect') for key in changed):
+            for ssh_mgr in self.ssh_mgrs():
+                ssh_mgr.set_policy(reconnect_policy(vars(self.opts)))
+            policy = self.ssh_mgr.policy.describe()
+            self.log(f'config: ssh reconnect {self.opts.ssh_reconnect}: {policy}')
+
+        health = ('ssh_alive_interval', 'ssh_alive_count', 'ssh_probe_secs')
+        if any(key in changed for key in health):
+            for ssh_mgr in self.ssh_mgrs():
+                ssh_mgr.set_health(self.opts.ssh_alive_interval, self.opts.ssh_alive_count,
+                                   self.opts.ssh_probe_secs)
+
+        # listener loop may be moving on to next port meanwhile
+        with self.ssh_mgr.lock:
+            self._apply_ssh_config(changed, health)
+
+    def _apply_ssh_config(self, changed: list[str], health: tuple[str, ...]):
+        """
+        Config change of ssh listener prefix, server or health settings
+         - caller holds ssh_mgr lock
+        """
+        if self.ssh_mgr.prefix > 0:
+            # may have moved on from a remote port in use
+            self.ssh_pfx = self.ssh_mgr.prefix
+
+        if 'ssh_pfx' in changed:
+            self.opts.pfx_range = parse_ssh_pfx(self.opts.ssh_pfx)
+            # keep current prefix (and tunnel) if still allowed
+            if not _pfx_in_range(self.ssh_pfx, self.opts.pfx_range):
+                self.ssh_pfx = get_ssh_port_prefix(self.opts.pfx_range)
+
+        listener = ('ssh_server', 'ssh_pfx') + health
+        if not self.ssh_mgr.pargs or not any(key in changed for key in listener):
+            return
+
+        wg_ip = self.wg_ip if self.wg_ip else self.wg_ip6
+        (server, rport, lip, lport) = ssh_args(wg_ip, self.opts.ssh_server, self.ssh_pfx)
+        if not (server and rport):
+            self.log('config: ssh info incomplete - keeping current listener')
+            return
+
+        self.ssh_server = server
+        self.ssh_rport = rport
+        self.ssh_lip = lip
+        self.ssh_lport = lport
+        self.ssh_mgr.set_ports(self.ssh_ports(wg_ip, server, self.ssh_pfx))
+        self.ssh_mgr.reconfigure(server, rport, lip, lport)
+
+        # extra tunnels keep their server - only health and prefix changes matter
+        for ssh_mgr in self.ssh_extra:
+            with ssh_mgr.lock:
+                prefix = ssh_mgr.prefix
+                if not _pfx_in_range(prefix, self.opts.pfx_range):
+                    prefix = self.ssh_pfx
+                ports = self.ssh_ports(wg_ip, ssh_mgr.server, prefix)
+                ssh_mgr.set_ports(ports)
+                ssh_mgr.reconfigure(ssh_mgr.server, ports[0][1] if ports else rport, lip, lport)
+
+    def is_ssh_running(self, user: str = '', procs: ProcTable | None = None) -> bool:
         """
         Check saved PID and check if running
          - if ssh_server missing, we'll check pid is valid
         Optional user requires root user is not process owner
+        Optional procs is process table snapshot to check against
         """
-        is_running = self.ssh_mgr.is_running(user=user)
+        is_running = self.ssh_mgr.is_running(user=user, procs=procs)
         return is_running
 
     def wg_up(self):
@@ -139,29 +313,21 @@ class WgClient():
         """
         self.log('starting resolv monitor')
 
-        #
-        # Can take time for wg to actually start so handle that
-        # GUI fires up wg and immediately starts the monitor
-        # We give it a little time in case it was started and not yet up
-        #
-        timeout = 0.5
-        max_time = 10.0
-        timer = timeout
-        wg_running = False
-        while timer <= max_time:
-            self.log(f' wg run check timer {timer}')
-            time.sleep(timer)
-            if is_wg_running(self.iface):
-                wg_running = True
-                break
-            timer += timeout
-
-        if wg_running:
+        if self.wait_for_wg():
             self.log(' wg is up -> starting resolv monitor')
             self.resolv.monitor_resolv()
         else:
             self.log(' wg not running - skipping')
 
+    def wait_for_wg(self) -> bool:
+        """
+        Can take time for wg to actually start so handle that
+        GUI fires up wg and immediately starts the monitor
+        Wait for kernel to announce the interface (or give up at deadline)
+        """
+        deadline = time.monotonic() + self.iface_wait_max
+        return wait_for_iface(self.iface, deadline)
+
     def kill_resolv_monitor(self):
         """
         Kill any running resolv monitor
@@ -221,8 +387,12 @@ class WgClient():
         #  - We dont know the port until wireguard is running
         #  - prefix can be random if prefix range is used
         #  - establish the prefix once and save.
+        #  - prefix that worked last time for this server is used first
         #
-        self.ssh_pfx = get_ssh_port_prefix(self.opts.pfx_range)
+        prefix_cache = read_prefix_cache()
+        self.ssh_pfx = prefix_cache.get(ssh_server, -1)
+        if not _pfx_in_range(self.ssh_pfx, self.opts.pfx_range):
+            self.ssh_pfx = get_ssh_port_prefix(self.opts.pfx_range)
         if not self.ssh_pfx:
             self.log(' Warning: unable to find ssh port prefix')
 
@@ -238,17 +408,37 @@ class WgClient():
         self.ssh_lport = ssh_lport
 
         if ssh_server:
+            self.ssh_mgr.set_ports(self.ssh_ports(wg_ip, ssh_server, self.ssh_pfx))
             self.ssh_mgr.set_info(ssh_server, ssh_rport, ssh_lip, ssh_lport)
         else:
             self.log('Warning - ssh info missing: Cant start ssh listener')
+            return
+
+        # extra servers : their cached prefix else same listening port
+        self.ssh_extra = []
+        for server in self.opts.ssh_extra_servers:
+            if server == ssh_server:
+                continue
+            prefix = prefix_cache.get(server, -1)
+            if not _pfx_in_range(prefix, self.opts.pfx_range):
+                prefix = self.ssh_pfx
+            ports = self.ssh_ports(wg_ip, server, prefix)
+            ssh_mgr = self.new_ssh_mgr(server)
+            ssh_mgr.set_ports(ports)
+            ssh_mgr.set_info(server, ports[0][1] if ports else ssh_rport, ssh_lip, ssh_lport)
+            self.ssh_extra.append(ssh_mgr)
 
     def stop_ssh_listener(self):
         """
         kill based on saved pid
          - is running check fills self.ssh_pid
+         - listener running in this process (daemon) : stop the managers its
+           threads run rather than making new ones
         """
-        self.ssh_init()
-        self.ssh_mgr.stop()
+        if not self.ssh_active:
+            self.ssh_init()
+        for ssh_mgr in self.ssh_mgrs():
+            ssh_mgr.stop()
 
     def ssh_listener(self):
         """
@@ -256,43 +446,187 @@ class WgClient():
          - only run if vpn is running
          - should we skip if on local network?
         This will not return until the ssh process exits
+         - extra tunnels (ssh_extra_servers) each run in a thread of this process
         """
         self.log('ssh-listener requested')
+        if not self.ssh_prepare():
+            return
+
+        #
+        # This will block until its stopped
+        # and will restart ssh if it dies (usually network drops, lid closed, server reboot etc)
+        # Can be stopped from another wg-client
+        #
+        self.start_config_watch()
+        extras = list(self.ssh_extra)
+        threads = [threading.Thread(target=ssh_mgr.start, daemon=True) for ssh_mgr in extras]
+        self.ssh_active = True
+        try:
+            for thread in threads:
+                thread.start()
+
+            self.ssh_mgr.start()
+
+            # primary stopped : take the others down with it
+            for ssh_mgr in extras:
+                ssh_mgr.stop_event.set()
+                ssh_mgr.wake()
+                if ssh_mgr.proc is not None:
+                    ssh_mgr.proc.terminate()
+            for thread in threads:
+                thread.join()
+        finally:
+            self.ssh_active = False
+
+    def ssh_prepare(self) -> bool:
+        """
+        Check vpn is up and gather ssh listener info
+        Returns True if ssh listener can be started
+        """
         self.get_wg_ip()
         if not is_wg_running(self.iface):
             self.log('VPN not running : can\'t start ssh')
             if not self.test:
-                return
+                return False
             self.wg_ip = '10.10.10.123'
             self.log(f'Test: using fake ip : {self.wg_ip}')
 
         if not self.opts.ssh_server:
             self.log('No ssh_server provided')
-            return
+            return False
 
-        #
-        # This will block until its stopped
-        # and will restart ssh if it dies (usually network drops, lid closed, server reboot etc)
-        # Can be stopped from another wg-client
-        #
         self.ssh_init()
-        self.ssh_mgr.start()
+        return True
 
     def runit(self, pargs: list[str], pid_saver: Callable[[int], None] | None = None):
         """
-        run a program via subprocess.run
+        run a program and wait for it
             - used for wg-quick up/down
-            - returns stdout
+            - ended after wg_quick_timeout secs (0 = no limit) so a hung
+              sudo or PostUp script cannot hang us
         """
         if not pargs:
             return
+        timeout = self.opts.wg_quick_timeout or None
         self.run_proc = MyProc(self.mysignals)
-        (_ret, _outs, _errs) = self.run_proc.popen(pargs, logger=self.log, pid_saver=pid_saver)
+        (_ret, _outs, _errs) = self.run_proc.popen(pargs, logger=self.log, pid_saver=pid_saver,
+                                                   timeout=timeout)
+        if self.run_proc.aproc is not None and self.run_proc.aproc.timed_out:
+            self.log(f'Error: {pargs[-2]} {self.iface} did not finish in {timeout} secs')
+
+    def is_wg_running(self) -> bool:
+        """ wg running if interface exists """
+        return is_wg_running(self.iface)
+
+    def get_status(self, which: str, procs: ProcTable | None = None) -> dict[str, bool | str | int]:
+        """
+        Status items for current user
+        which is one item or 'status' for all of them
+         - process checks share one /proc snapshot (made here if not provided)
+        """
+        items: dict[str, bool | str | int] = {}
+        if procs is None and which in ('ssh_running', 'ssh_tunnels', 'resolv_monitor', 'status'):
+            procs = ProcTable()
+
+        if which in ('wg_iface', 'status'):
+            items['wg_iface'] = self.iface
+
+        if which in ('wg_running', 'status'):
+            items['wg_running'] = self.is_wg_running()
+
+        if which in ('ssh_server', 'status'):
+            items['ssh_server'] = self.opts.ssh_server
+
+        if which in ('ssh_pfx', 'status'):
+            items['ssh_pfx'] = self.ssh_mgr.prefix if self.ssh_mgr.prefix > 0 else self.ssh_pfx
+
+        if which in ('ssh_running', 'status'):
+            items['ssh_running'] = self.is_ssh_running(procs=procs)
+
+        if which in ('ssh_probe', 'status'):
+            probe_ms = read_ssh_status(self.ssh_mgr.tag).get('probe_ms', {})
+            items['ssh_probe'] = latency_string(probe_ms)
+
+        if which in ('ssh_failed', 'status'):
+            failed: list[str] = []
+            for (server, record) in self.ssh_status().items():
+                why = ssh_failure(record)
+                if why:
+                    failed.append(f'{server}: {why}')
+            items['ssh_failed'] = ', '.join(failed)
+
+        if which in ('ssh_tunnels', 'status') and self.opts.ssh_extra_servers:
+            tunnels: list[str] = []
+            for (tag, server) in self.ssh_tunnels():
+                pid = read_ssh_pid(tag=tag)
+                running = pid > 0 and check_ssh_pid(pid, server, procs=procs)
+                tunnels.append(f'{server}:{"up" if running else "down"}')
+            items['ssh_tunnels'] = ' '.join(tunnels)
+
+        if which in ('resolv_monitor', 'status'):
+            items['resolv_monitor'] = self.resolv.check_already_running(procs=procs)
+
+        return items
+
+    def daemon_request(self, cmd: str) -> dict[str, Any] | None:
+        """
+        Hand request to control daemon if one is running.
+        Returns the daemon result or None if caller should do it in process.
+         - daemon took it but its answer was lost : error is reported and
+           result is {} - it is not done again here
+        """
+        if not self.use_daemon or self.opts.daemon:
+            return None
+
+        reply = daemon_request(cmd, self.iface)
+        if reply is None:
+            # no daemon - dont bother asking again
+            self.use_daemon = False
+            return None
+
+        if not reply.get('okay'):
+            self.log(f'Error: {cmd} : {reply.get("error", "")}')
+            print(f'Error: {cmd} : {reply.get("error", "")}')
+            return {}
+
+        self.log(f'{cmd} handled by daemon')
+        return reply.get('result', {})
+
+    def run_daemon(self):
+        """
+        Run control daemon in foreground until signalled
+        """
+        # pylint: disable=import-outside-toplevel
+        from wg_client.daemon import WgClientDaemon
+
+        self.ssh_pfx = get_ssh_port_prefix(self.opts.pfx_range)
+        daemon = WgClientDaemon(self)
+        self.start_config_watch()
+        daemon.serve()
+
+    def run_supervisor(self):
+        """
+        Run resolv monitor and/or ssh listener in this one process
+        until signalled
+        """
+        # pylint: disable=import-outside-toplevel
+        from wg_client.supervisor import WgSupervisor
+
+        supervisor = WgSupervisor(self)
+        supervisor.run()
 
     def do_all(self):
         """
         Perform the requested tasks
         """
+        if self.opts.daemon:
+            self.run_daemon()
+            return
+
+        if self.opts.supervise and (self.opts.fix_dns_auto_start or self.opts.ssh_start):
+            self.run_supervisor()
+            return
+
         #
         # Show options
         #
@@ -312,8 +646,17 @@ class WgClient():
         if self.opts.show_fix_dns_auto:
             _show_status(self, 'resolv_monitor')
 
+        if self.opts.show_fix_dns_stats:
+            _show_resolv_metrics(self)
+
+        if self.opts.show_ssh_stats:
+            _show_ssh_stats(self)
+
         if self.opts.status or self.opts.show_info:
-            _show_status(self, 'status')
+            if self.opts.json:
+                _show_status_json(self)
+            else:
+                _show_status(self, 'status')
 
         #
         # dns fix
@@ -327,47 +670,64 @@ class WgClient():
         #
         # wg up/dn
         #
-        if self.opts.wg_up:
+        if self.opts.wg_up and self.daemon_request('up') is None:
             self.wg_up()
 
-        if self.opts.wg_dn:
+        if self.opts.wg_dn and self.daemon_request('down') is None:
             self.wg_dn()
 
         #
         # ssh
         #
-        if self.opts.ssh_start:
+        if self.opts.ssh_start and self.daemon_request('ssh-start') is None:
             self.ssh_listener()
 
-        if self.opts.ssh_stop:
+        if self.opts.ssh_stop and self.daemon_request('ssh-stop') is None:
             self.stop_ssh_listener()
 
 
-def _show_status(client: WgClient, which: str) -> None:
+def _pfx_in_range(pfx: int, pfx_range: list[str]) -> bool:
     """
-    Display status
+    True if current port prefix is allowed by pfx_range ("n" or "n-m")
     """
-    items: dict[str, bool | str | int] = {}
-    #
-    # Current user
-    #
-    if which in ('wg_iface', 'status'):
-        items['wg_iface'] = client.iface
+    if pfx < 0 or not pfx_range:
+        return False
+    nums = [int(num) for num in pfx_range]
+    return nums[0] <= pfx <= nums[-1]
 
-    if which in ('wg_running', 'status'):
-        items['wg_running'] = is_wg_running(client.iface)
 
-    if which in ('ssh_server', 'status'):
-        items['ssh_server'] = client.opts.ssh_server
+def _status_items(client: WgClient, which: str,
+                  procs: ProcTable | None = None) -> dict[str, bool | str | int]:
+    """
+    Status from daemon if running (one status request per invocation)
+    otherwise gathered in process.
+     - root status covers all users so is always done in process
+    """
+    if client.euid != 0:
+        if client.daemon_status is None:
+            client.daemon_status = client.daemon_request('status')
+
+        if client.daemon_status is not None:
+            if which == 'status':
+                return client.daemon_status
+            if which in client.daemon_status:
+                return {which: client.daemon_status[which]}
 
-    if which in ('ssh_pfx', 'status'):
-        items['ssh_pfx'] = client.ssh_pfx
+    return client.get_status(which, procs=procs)
 
-    if which in ('ssh_running', 'status'):
-        items['ssh_running'] = client.is_ssh_running()
 
-    if which in ('resolv_monitor', 'status'):
-        items['resolv_monitor'] = client.resolv.check_already_running()
+def _show_status(client: WgClient, which: str) -> None:
+    """
+    Display status
+    """
+    #
+    # Current user
+    #  - root shares one process snapshot with the other users check
+    #
+    procs: ProcTable | None = None
+    if client.euid == 0:
+        procs = ProcTable()
+    items = _status_items(client, which, procs)
 
     for (key, val) in items.items():
         if which == 'status':
@@ -378,20 +738,128 @@ def _show_status(client: WgClient, which: str) -> None:
     #
     # Other users
     #
-    if client.euid != 0:
+    if procs is None:
         return
 
-    #
-    # Get list of any other users
-    #
-    users = who_logged_in(with_self=False)
-    if not users:
+    users = _other_users_status(client, procs)
+    for (user, state) in users.items():
+        if state['ssh_running'] or state['resolv_monitor']:
+            print(f'user: {user}')
+            print(f'{"ssh_running":>15s} : {state["ssh_running"]}')
+            print(f'{"resolv_monitor":>15s} : {state["resolv_monitor"]}')
+
+
+def _other_users_status(client: WgClient, procs: ProcTable) -> dict[str, dict[str, bool]]:
+    """
+    ssh / resolv monitor state for all other logged in users (root only)
+     - as for the current user : pid in user's pidfile checked against the snapshot
+     - process table is indexed once by (uid, signature) : users without any
+       matching process are answered without reading their pidfiles
+    """
+    users: dict[str, dict[str, bool]] = {}
+    logged_in = who_logged_in(with_self=False)
+    if not logged_in:
+        return users
+
+    ssh_pargs = SSH_SIGNATURE + ([client.opts.ssh_server] if client.opts.ssh_server else [])
+    procs.index({'ssh': SSH_SIGNATURE, 'resolv': RESOLV_SIGNATURE})
+    for user in logged_in:
+        uid = user_uid(user)
+        ssh_running = False
+        if procs.find(uid, 'ssh'):
+            ssh_running = procs.check(read_ssh_pid(user), ssh_pargs, user=user)
+        resolv_monitor = False
+        if procs.find(uid, 'resolv'):
+            resolv_monitor = client.resolv.check_already_running(user, procs=procs)
+        users[user] = {'ssh_running': ssh_running, 'resolv_monitor': resolv_monitor}
+    return users
+
+
+def _show_resolv_metrics(client: WgClient) -> None:
+    """
+    Resolv monitor counters and event to restore latency
+     - read from the status file the monitor keeps up to date
+    """
+    metrics = client.resolv.read_metrics()
+    if client.opts.json:
+        print(json.dumps(metrics))
         return
 
-    for user in users:
-        ssh_running = client.is_ssh_running(user)
-        resolv_monitor = client.resolv.check_already_running(user)
-        if ssh_running or resolv_monitor:
-            print(f'user: {user}')
-            print(f'{"ssh_running":>15s} : {ssh_running}')
-            print(f'{"resolv_monitor":>15s} : {resolv_monitor}')
+    if not metrics:
+        print('No resolv monitor metrics')
+        return
+
+    latency = metrics.pop('latency_ms', {})
+    for (key, val) in metrics.items():
+        print(f'{key:>15s} : {val}')
+
+    print(f'{"latency avg":>15s} : {latency.get("avg", 0)} ms')
+    print(f'{"latency max":>15s} : {latency.get("max", 0)} ms')
+    for (bucket, count) in latency.get('hist', {}).items():
+        print(f'{bucket:>15s} : {count}')
+
+
+def _show_ssh_stats(client: WgClient) -> None:
+    """
+    State record and probe latency of each ssh tunnel
+     - read from the status file each listener keeps up to date
+    """
+    stats = client.ssh_status()
+    if client.opts.json:
+        print(json.dumps(stats))
+        return
+
+    for (server, record) in stats.items():
+        print(f'{"tunnel":>15s} : {server}')
+        if not record:
+            print(f'{"state":>15s} : no status')
+            continue
+        latency = record.get('probe_ms', {})
+        for key in ('rport', 'state', 'connects', 'exit_reason'):
+            print(f'{key:>15s} : {record.get(key, "")}')
+        for key in ('last', 'p50', 'p95', 'max'):
+            print(f'{"probe " + key:>15s} : {latency.get(key, 0)} ms')
+        print(f'{"probe samples":>15s} : {latency.get("count", 0)}')
+
+
+def _show_status_json(client: WgClient) -> None:
+    """
+    Machine readable status (--status --json)
+     - stable schema; bump STATUS_SCHEMA if fields change
+     - all process checks are answered from a single /proc snapshot
+     - collect_ms is time spent gathering all of it (not printing)
+    """
+    start = time.perf_counter()
+
+    procs: ProcTable | None = None
+    status: dict[str, Any]
+    if client.euid != 0:
+        status = _status_items(client, 'status')
+    else:
+        procs = ProcTable()
+        status = client.get_status('status', procs=procs)
+
+    users: dict[str, dict[str, bool]] = {}
+    if procs is not None:
+        users = _other_users_status(client, procs)
+
+    owner = process_owner()
+    resolv_metrics = client.resolv.read_metrics()
+    ssh_stats = client.ssh_status()
+    collect_ms = 1000 * (time.perf_counter() - start)
+
+    report: dict[str, Any] = {
+            'schema': STATUS_SCHEMA,
+            'user': owner,
+            'wg_iface': status.get('wg_iface', client.iface),
+            'wg_running': bool(status.get('wg_running', False)),
+            'ssh_server': status.get('ssh_server') or '',
+            'ssh_pfx': status.get('ssh_pfx', client.ssh_pfx),
+            'ssh_running': bool(status.get('ssh_running', False)),
+            'resolv_monitor': bool(status.get('resolv_monitor', False)),
+            'users': users,
+            'resolv_metrics': resolv_metrics,
+            'ssh_stats': ssh_stats,
+            'collect_ms': round(collect_ms, 3),
+            }
+    print(json.dumps(report))
@@ -5,16 +5,15 @@ Command line options handling
 """
 # pylint: disable=too-few-public-methods
 # pylint: disable=too-many-statements
-import os
 from typing import Any
 import argparse
 
-from wg_client.utils import read_toml_file
+from wg_client.config import (config_files, load_config)
 
 type _Opt = tuple[str | tuple[str, ...], dict[str, Any]]
 
 
-def _parse_ssh_pfx(ssh_pfx: str) -> list[str]:
+def parse_ssh_pfx(ssh_pfx: str) -> list[str]:
     """
     Parse:
        'n'      -> [n]
@@ -33,21 +32,17 @@ def read_config(opts: WgClientOpts) -> bool:
      iface = 'wgc'
      ssh_server = "xxx.example.org"
      ssh_pfx = "n" or "n-m"
+    Parsed config is cached (see wg_client.config) and kept in opts.config
+    so long running processes can tell later config changes from command line.
     """
     okay = True
-    conf: dict[str, Any] = {}
-
-    conf_dirs = ['./etc/wg-client', '/etc/wg-client']
-    for conf_dir in conf_dirs:
-        file = os.path.join(conf_dir, 'config')
-        conf = read_toml_file(file)
-        if conf:
-            for (key, val) in conf.items():
-                setattr(opts, key, val)
-            break
-
-    if not conf:
-        print(f'Error loading config {file}')
+    (path, conf) = load_config()
+    opts.config = conf
+    for (key, val) in conf.items():
+        setattr(opts, key, val)
+
+    if not path:
+        print(f'Error loading config {config_files()[-1]}')
         return not okay
     return okay
 
@@ -122,6 +117,14 @@ def get_avail_options(defaults: dict[str, str]) -> list[_Opt]:
     opt = ('--show-fix-dns-auto', {'help': ohelp, 'action': 'store_true'})
     opts.append(opt)
 
+    ohelp = 'Report resolv monitor counters and repair latency'
+    opt = ('--show-fix-dns-stats', {'help': ohelp, 'action': 'store_true'})
+    opts.append(opt)
+
+    ohelp = 'Report ssh tunnel state and probe latency'
+    opt = ('--show-ssh-stats', {'help': ohelp, 'action': 'store_true'})
+    opts.append(opt)
+
     ohelp = 'Display status - alias for --status'
     opt = ('--show-info', {'help': ohelp, 'action': 'store_true'})
     opts.append(opt)
@@ -130,6 +133,22 @@ def get_avail_options(defaults: dict[str, str]) -> list[_Opt]:
     opt = ('--status', {'help': ohelp, 'action': 'store_true'})
     opts.append(opt)
 
+    ohelp = 'With --status: report as json'
+    opt = ('--json', {'help': ohelp, 'action': 'store_true'})
+    opts.append(opt)
+
+    ohelp = 'Run per user control daemon (stays running)'
+    opt = ('--daemon', {'help': ohelp, 'action': 'store_true'})
+    opts.append(opt)
+
+    ohelp = 'Do not use control daemon even if running'
+    opt = ('--no-daemon', {'help': ohelp, 'action': 'store_true'})
+    opts.append(opt)
+
+    ohelp = 'With --fix-dns-auto-start and/or --ssh-start: run them in one process'
+    opt = ('--supervise', {'help': ohelp, 'action': 'store_true'})
+    opts.append(opt)
+
     ohelp = 'Display version'
     opt = ('--version', {'help': ohelp, 'action': 'store_true'})
     opts.append(opt)
@@ -142,12 +161,29 @@ def get_avail_options(defaults: dict[str, str]) -> list[_Opt]:
     return opts
 
 
+def cmdline_keys(opts: list[_Opt]) -> set[str]:
+    """
+    Options actually given on the command line
+     - same options parsed again without defaults : only those given are set
+    """
+    par = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS)
+    for (opt_list, kwargs) in opts:
+        kwargs = {key: val for (key, val) in kwargs.items() if key != 'default'}
+        if isinstance(opt_list, str):
+            par.add_argument(opt_list, **kwargs)
+        else:
+            par.add_argument(*opt_list, **kwargs)
+    return set(vars(par.parse_args()))
+
+
 class WgClientOpts:
     """
     Client Options
+     - parse_args False skips the command line and uses config only (gui)
+     - cmdline_keys : options given on the command line (config reload keeps those)
     """
     # pylint: disable=too-many-instance-attributes
-    def __init__(self):
+    def __init__(self, parse_args: bool = True):
         desc = 'wg-client : manage wireguard peer'
         self.okay: bool = True
         self.wg_up: bool = False
@@ -162,20 +198,43 @@ class WgClientOpts:
         self.show_ssh_running: bool = False
         self.show_wg_running: bool = False
         self.show_fix_dns_auto: bool = False
+        self.show_fix_dns_stats: bool = False
+        self.show_ssh_stats: bool = False
         self.show_info: bool = False
         self.status: bool = False
+        self.json: bool = False
         self.version: bool = False
+        self.daemon: bool = False
+        self.no_daemon: bool = False
+        self.supervise: bool = False
         self.iface: str = 'wgc'
         self.ssh_server: str = ''
+        self.ssh_extra_servers: list[str] = []
         self.ssh_pfx: str = ''
         self.pfx_range: list[str] = []
+        self.resolv_quiet_ms: int = 200
+        self.resolv_max_ms: int = 1000
+        self.ssh_reconnect: str = 'backoff'
+        self.ssh_reconnect_initial: float = 2.0
+        self.ssh_reconnect_multiplier: float = 2.0
+        self.ssh_reconnect_max: float = 120.0
+        self.ssh_reconnect_jitter: float = 0.2
+        self.ssh_reconnect_reset: float = 60.0
+        self.ssh_alive_interval: int = 15
+        self.ssh_alive_count: int = 3
+        self.ssh_probe_secs: int = 0
+        self.wg_quick_timeout: int = 60
+        self.config: dict[str, Any] = {}
+        self.cmdline_keys: set[str] = set()
 
         # get config settings
         self.okay = read_config(self)
         if not self.okay:
             return
-        if not self.ssh_pfx:
-            self.ssh_pfx = '55'
+
+        if not parse_args:
+            self.pfx_range = parse_ssh_pfx(self.ssh_pfx)
+            return
 
         defaults = {
                 'ssh-pfx': self.ssh_pfx,
@@ -197,8 +256,9 @@ class WgClientOpts:
         if parsed:
             for (key, val) in vars(parsed).items():
                 setattr(self, key, val)
+        self.cmdline_keys = cmdline_keys(opts)
 
-        self.pfx_range = _parse_ssh_pfx(self.ssh_pfx)
+        self.pfx_range = parse_ssh_pfx(self.ssh_pfx)
 
     def __getattr__(self, name):
         """ non-set items simply return None makes it easy to check existence"""
@@ -9,7 +9,10 @@ Info
 """
 import os
 from typing import Callable
-from pyconcurrent import run_prog
+
+from wg_client.utils.lazy import lazy_import
+
+pyconcurrent = lazy_import('pyconcurrent')
 
 
 def is_valid_interface(iface: str) -> bool:
@@ -41,7 +44,7 @@ def get_wg_iface(log: Callable[[str], None]) -> str:
     iface = ''
 
     pargs = ['/usr/bin/wg-client', '--show-iface']
-    (ret, out, err) = run_prog(pargs)
+    (ret, out, err) = pyconcurrent.run_prog(pargs)
     if ret == 0:
         iface = out.strip()
     else:
@@ -60,7 +63,7 @@ def get_ssh_server(log: Callable[[str], None]) -> str:
     ssh_server = ''
 
     pargs = ['/usr/bin/wg-client', '--show-ssh-server']
-    (ret, out, err) = run_prog(pargs)
+    (ret, out, err) = pyconcurrent.run_prog(pargs)
     if ret == 0:
         ssh_server = out.strip()
     else:
@@ -80,7 +83,7 @@ def is_ssh_running(log: Callable[[str], None]) -> bool:
     ssh_running = False
 
     pargs = ['/usr/bin/wg-client', '--show-ssh-running']
-    (ret, out, err) = run_prog(pargs)
+    (ret, out, err) = pyconcurrent.run_prog(pargs)
     if ret == 0:
         answer = out.strip()
         if answer == 'True':
@@ -0,0 +1,12 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Config
+"""
+from .config_file import CONF_DEFAULTS
+from .config_file import config_files
+from .config_file import load_config
+from .config_file import read_config_file
+from .config_file import validate_config
+
+from .class_watch import ConfigWatch
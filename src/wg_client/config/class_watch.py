@@ -0,0 +1,132 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Live config reload for long running processes
+ - inotify watch on each config directory (editors and package managers
+   usually replace the file, so watching the file itself would lose it)
+ - on change the config is reloaded and on_change(old, new) called
+   only if the effective config differs
+"""
+import os
+import select
+import threading
+from typing import (Any, Callable)
+
+from wg_client.utils import Inotify
+from wg_client.utils import class_inotify as ino
+
+from .config_file import (CONF_DIRS, CONF_NAME, load_config)
+
+_DIR_EVENTS = (ino.IN_CLOSE_WRITE | ino.IN_MOVED_TO | ino.IN_MOVED_FROM
+               | ino.IN_CREATE | ino.IN_DELETE | ino.IN_ATTRIB | ino.IN_ONLYDIR)
+
+
+class ConfigWatch:
+    """
+    Watch config and report changes
+     - start() runs it in its own (daemon) thread and
+       on_change(old_config, new_config) is called from that thread
+     - or open() and call read_changes() from an event loop
+    """
+    def __init__(self, on_change: Callable[[dict[str, Any], dict[str, Any]], None],
+                 log: Callable[[str], None] = print):
+        self.on_change = on_change
+        self.log = log
+        (self.path, self.conf) = load_config(log=log)
+        self.inot: Inotify | None = None
+        self.thread: threading.Thread | None = None
+        self.stop_fd: int = -1
+
+    def open(self) -> bool:
+        """
+        Set up the inotify watches (no thread).
+        Caller then calls read_changes() when fileno() is readable.
+        Returns False if inotify is unavailable (config is then fixed at start)
+        """
+        self.inot = Inotify()
+        if not self.inot.okay:
+            self.log('config: inotify unavailable - no live reload')
+            return False
+
+        for conf_dir in CONF_DIRS:
+            if self.inot.add_watch(os.path.abspath(conf_dir), _DIR_EVENTS) >= 0:
+                self.log(f'config: watching {conf_dir}')
+
+        if not self.inot.watches:
+            self.inot.close()
+            return False
+        return True
+
+    def fileno(self) -> int:
+        """ inotify fd (for poll or event loop) """
+        return self.inot.fileno() if self.inot else -1
+
+    def start(self) -> bool:
+        """
+        Start watching in own thread.
+        Returns False if inotify is unavailable (config is then fixed at start)
+        """
+        if self.thread and self.thread.is_alive():
+            return True
+
+        if not self.open():
+            return False
+
+        self.stop_fd = os.eventfd(0, os.EFD_CLOEXEC)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """ stop watching """
+        if self.stop_fd >= 0:
+            os.eventfd_write(self.stop_fd, 1)
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        if self.stop_fd >= 0:
+            os.close(self.stop_fd)
+            self.stop_fd = -1
+        if self.inot:
+            self.inot.close()
+
+    def check(self) -> bool:
+        """
+        Reload config (cheap if file unchanged).
+        Returns True if it changed
+        """
+        (path, conf) = load_config(log=self.log)
+        if conf == self.conf:
+            return False
+
+        old = self.conf
+        self.path = path
+        self.conf = conf
+        self.log(f'config: reloaded {path}')
+        self.on_change(old, conf)
+        return True
+
+    def _run(self):
+        """ watcher thread """
+        if self.inot is None:
+            return
+
+        poller = select.poll()
+        poller.register(self.inot.fileno(), select.POLLIN)
+        poller.register(self.stop_fd, select.POLLIN)
+
+        while True:
+            ready = [fd for (fd, _event) in poller.poll()]
+            if self.stop_fd in ready:
+                return
+
+            self.read_changes()
+
+    def read_changes(self):
+        """ read queued events and reload if our config file was touched """
+        if self.inot is None:
+            return
+        events = self.inot.read_events()
+        if any(name == CONF_NAME or mask & ino.IN_Q_OVERFLOW
+               for (_wd, mask, _cookie, name) in events):
+            self.check()
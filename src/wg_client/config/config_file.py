@@ -0,0 +1,155 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Config file
+ - first of ./etc/wg-client/config, /etc/wg-client/config
+ - parsed and validated once; result cached keyed by
+   path + (device, inode, mtime, size) so an unchanged file is never re-read
+"""
+import os
+import re
+from typing import Any
+
+from wg_client.utils import read_toml_file
+
+CONF_DIRS = ['./etc/wg-client', '/etc/wg-client']
+CONF_NAME = 'config'
+
+# values used when not in config file
+CONF_DEFAULTS: dict[str, Any] = {
+        'iface': 'wgc',
+        'ssh_server': '',
+        'ssh_extra_servers': [],
+        'ssh_pfx': '55',
+        'resolv_quiet_ms': 200,
+        'resolv_max_ms': 1000,
+        'ssh_reconnect': 'backoff',
+        'ssh_reconnect_initial': 2.0,
+        'ssh_reconnect_multiplier': 2.0,
+        'ssh_reconnect_max': 120.0,
+        'ssh_reconnect_jitter': 0.2,
+        'ssh_reconnect_reset': 60.0,
+        'ssh_alive_interval': 15,
+        'ssh_alive_count': 3,
+        'ssh_probe_secs': 0,
+        'wg_quick_timeout': 60,
+        }
+
+# numbers that may be 0
+CONF_ZERO_OK = ('ssh_reconnect_jitter', 'ssh_probe_secs', 'wg_quick_timeout')
+
+# ssh_reconnect presets (see wg_client.ssh.class_reconnect)
+RECONNECT_NAMES = ('backoff', 'fixed')
+
+type _FileKey = tuple[int, int, int, int]
+
+_CACHE: dict[str, tuple[_FileKey, dict[str, Any]]] = {}
+
+
+def config_files() -> list[str]:
+    """ config file paths in search order """
+    return [os.path.join(conf_dir, CONF_NAME) for conf_dir in CONF_DIRS]
+
+
+def file_key(path: str) -> _FileKey | None:
+    """
+    Identity of current file content : (device, inode, mtime_ns, size)
+    None if file does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def validate_config(conf: dict[str, Any], log=print) -> dict[str, Any]:
+    """
+    Check known keys
+     - toml ints are accepted for ssh_pfx (ssh_pfx = 47) and for float values
+     - numbers (e.g. resolv_quiet_ms) must be positive
+       except ssh_reconnect_jitter (0 to 1), ssh_reconnect_multiplier (>= 1),
+       ssh_probe_secs and wg_quick_timeout (0 is off)
+     - lists (ssh_extra_servers) must hold non empty strings
+     - invalid values are dropped (default is used) with a message
+    """
+    valid: dict[str, Any] = {}
+    for (key, val) in conf.items():
+        if key == 'ssh_pfx' and isinstance(val, int):
+            val = str(val)
+
+        if key in CONF_DEFAULTS:
+            want = type(CONF_DEFAULTS[key])
+            if want is float and isinstance(val, int) and not isinstance(val, bool):
+                val = float(val)
+            if not isinstance(val, want) or isinstance(val, bool):
+                log(f'config: {key} must be {want.__name__} - ignored')
+                continue
+
+            if want in (int, float) and (val < 0 or (val == 0 and key not in CONF_ZERO_OK)):
+                log(f'config: {key} must be positive - ignored')
+                continue
+
+        if key == 'ssh_extra_servers' and not all(isinstance(item, str) and item for item in val):
+            log('config: ssh_extra_servers must be list of server names - ignored')
+            continue
+
+        if key == 'ssh_reconnect_jitter' and not 0 <= val <= 1:
+            log('config: ssh_reconnect_jitter must be from 0 to 1 - ignored')
+            continue
+
+        if key == 'ssh_reconnect_multiplier' and val < 1:
+            log('config: ssh_reconnect_multiplier must be at least 1 - ignored')
+            continue
+
+        if key == 'ssh_reconnect' and val not in RECONNECT_NAMES:
+            names = ', '.join(RECONNECT_NAMES)
+            log(f'config: ssh_reconnect "{val}" must be one of {names} - ignored')
+            continue
+
+        if key == 'ssh_pfx' and not re.fullmatch(r'\d+(-\d+)?', val):
+            log(f'config: ssh_pfx "{val}" must be "n" or "n-m" - ignored')
+            continue
+
+        if key == 'iface' and not val:
+            log('config: empty iface - ignored')
+            continue
+
+        valid[key] = val
+    return valid
+
+
+def read_config_file(path: str, log=print) -> dict[str, Any]:
+    """
+    Parsed and validated config from path ({} if missing or bad)
+     - cached until the file changes
+    """
+    key = file_key(path)
+    if key is None:
+        _CACHE.pop(path, None)
+        return {}
+
+    cached = _CACHE.get(path)
+    if cached and cached[0] == key:
+        return dict(cached[1])
+
+    conf = read_toml_file(path)
+    if conf:
+        conf = validate_config(conf, log=log)
+    _CACHE[path] = (key, conf)
+    return dict(conf)
+
+
+def load_config(log=print) -> tuple[str, dict[str, Any]]:
+    """
+    Effective config : first config file found, with defaults filled in.
+    Returns (path, config)
+     - path is '' if no usable config file was found
+    """
+    conf: dict[str, Any] = {}
+    for path in config_files():
+        conf = read_config_file(path, log=log)
+        if conf:
+            return (path, CONF_DEFAULTS | conf)
+
+    return ('', dict(CONF_DEFAULTS))
@@ -0,0 +1,21 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Per user control daemon
+"""
+from .client import daemon_socket_path
+from .client import daemon_request
+from .client import daemon_running
+from .thin_client import thin_request
+
+
+def __getattr__(name: str):
+    """
+    Server side is only loaded when needed (--daemon)
+    Every other wg-client invocation only needs the client side.
+    """
+    if name == 'WgClientDaemon':
+        # pylint: disable=import-outside-toplevel
+        from .class_daemon import WgClientDaemon
+        return WgClientDaemon
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,166 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Per user control daemon
+ - keeps config, interface and process state of one WgClient in memory
+ - answers requests on unix socket in $XDG_RUNTIME_DIR
+ - wg-client (and gui) become thin clients when this is running
+"""
+import os
+import json
+import socketserver
+import threading
+from typing import (Any, TYPE_CHECKING)
+
+from wg_client.proc.class_proc import signal_catcher
+
+from .client import (daemon_socket_path, daemon_running)
+
+if TYPE_CHECKING:
+    from wg_client.cmd_line.class_client import WgClient
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """
+    One json request line -> one json reply line
+    """
+    def handle(self):
+        daemon: WgClientDaemon = getattr(self.server, 'wg_daemon')
+        reply: dict[str, Any]
+        line = self.rfile.readline(65536)
+        if not line:
+            # connect only (e.g. daemon_running())
+            return
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            request = None
+
+        if isinstance(request, dict):
+            reply = daemon.handle(request)
+        else:
+            reply = {'okay': False, 'error': 'bad request'}
+
+        self.wfile.write(json.dumps(reply).encode() + b'\n')
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    """ unix socket server with a handle back to daemon """
+    daemon_threads = True
+    wg_daemon: Any = None
+
+
+class WgClientDaemon:
+    """
+    Control daemon for a WgClient
+    """
+    def __init__(self, client: 'WgClient'):
+        self.client = client
+        self.path: str = daemon_socket_path()
+        self.server: _Server | None = None
+        self.ssh_thread: threading.Thread | None = None
+        self.lock = threading.Lock()
+
+    def log(self, msg: str):
+        """ share client log """
+        self.client.log(msg)
+
+    def _on_signal(self, signum, frame):
+        """
+        Kill any children and stop serving.
+        shutdown() must be called from a thread other than serve_forever()
+        """
+        self.log(f'daemon: signal {signum} - shutting down')
+        for ssh_mgr in self.client.ssh_mgrs():
+            ssh_mgr.stop_event.set()
+            ssh_mgr.wake()
+            ssh_mgr.mysignals.signal_handler(signum, frame)
+        self.client.mysignals.signal_handler(signum, frame)
+        if self.server:
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def serve(self) -> bool:
+        """
+        Serve requests until signalled
+         - socket left by a daemon that died is replaced; one that is running is not
+        """
+        if daemon_running():
+            self.log('daemon: already running')
+            print('wg-client daemon already running')
+            return False
+
+        try:
+            os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.server = _Server(self.path, _Handler)
+            os.chmod(self.path, 0o600)
+
+        except OSError as err:
+            self.log(f'daemon: failed to open {self.path} : {err}')
+            print(f'Error: daemon failed to open {self.path} : {err}')
+            return False
+
+        self.server.wg_daemon = self
+        signal_catcher(self._on_signal)
+
+        self.log(f'daemon: listening on {self.path}')
+        self.server.serve_forever()
+        self.server.server_close()
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.log('daemon: exit')
+        return True
+
+    def _ssh_start(self) -> dict[str, Any]:
+        """
+        ssh listener blocks - so supervise it from a thread
+        """
+        if self.ssh_thread and self.ssh_thread.is_alive():
+            return {'started': False, 'ssh_running': True}
+
+        if not (self.client.test or self.client.is_wg_running()):
+            return {'started': False, 'ssh_running': False}
+
+        self.ssh_thread = threading.Thread(target=self.client.ssh_listener, daemon=True)
+        self.ssh_thread.start()
+        return {'started': True, 'ssh_running': True}
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        """
+        Perform request and return reply
+        """
+        cmd = request.get('cmd')
+        iface = request.get('iface')
+        if iface and iface != self.client.iface:
+            return {'okay': False, 'error': f'daemon iface is {self.client.iface}'}
+
+        result: dict[str, Any] = {}
+        self.log(f'daemon: request {cmd}')
+        if cmd == 'status':
+            # read only - dont wait behind a slow wg-quick
+            result = self.client.get_status('status')
+            return {'okay': True, 'result': result}
+
+        with self.lock:
+            match cmd:
+                case 'up':
+                    self.client.wg_up()
+                    result = {'wg_running': self.client.is_wg_running()}
+
+                case 'down':
+                    self.client.wg_dn()
+                    result = {'wg_running': self.client.is_wg_running()}
+
+                case 'ssh-start':
+                    result = self._ssh_start()
+
+                case 'ssh-stop':
+                    self.client.stop_ssh_listener()
+                    result = {'ssh_running': self.client.is_ssh_running()}
+
+                case _:
+                    return {'okay': False, 'error': f'unknown request {cmd}'}
+
+        return {'okay': True, 'result': result}
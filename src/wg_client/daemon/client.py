@@ -0,0 +1,119 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Control daemon client side.
+ - one request per connection
+ - request and reply are each a single line of json
+     request : {"cmd": <cmd>, "iface": <iface>}
+     reply   : {"okay": bool, "result": {...}, "error": str}
+Kept light on imports as this is used by every wg-client invocation.
+"""
+import os
+import json
+import socket
+from typing import Any
+
+DAEMON_CMDS = ('status', 'up', 'down', 'ssh-start', 'ssh-stop')
+
+# secs : connecting (daemon is local - answers at once or is not there), status reply
+CONNECT_TIMEOUT = 5.0
+STATUS_TIMEOUT = 30.0
+
+
+def daemon_socket_path() -> str:
+    """
+    Per user control socket
+      $XDG_RUNTIME_DIR/wg-client/ctl.sock
+    falls back to /run/user/<uid> if XDG_RUNTIME_DIR not set
+    """
+    run_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if not run_dir:
+        run_dir = f'/run/user/{os.geteuid()}'
+    return os.path.join(run_dir, 'wg-client', 'ctl.sock')
+
+
+def read_line(sock: socket.socket, max_bytes: int = 65536) -> bytes:
+    """
+    Read from socket up to newline (or eof)
+    """
+    data = b''
+    while b'\n' not in data and len(data) < max_bytes:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data.split(b'\n', 1)[0]
+
+
+def daemon_running() -> bool:
+    """
+    Is a daemon listening on the control socket
+     - only a missing socket or refused connect means no : a daemon that is
+       busy, slow to answer or serves another iface is still running
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM | socket.SOCK_CLOEXEC) as sock:
+        try:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(daemon_socket_path())
+        except (FileNotFoundError, ConnectionRefusedError):
+            return False
+        except OSError:
+            return True
+    return True
+
+
+def daemon_request(cmd: str, iface: str, timeout: float | None = None) -> dict[str, Any] | None:
+    """
+    Send request to control daemon.
+    Returns reply dictionary or None if caller should do the work itself:
+     - no daemon running (socket missing or connect refused)
+     - daemon declined it (e.g. it serves another iface) or status got no answer
+    A request that changes state (up, down, ssh-*) may still be running in the
+    daemon if its answer is lost : that returns an okay False reply, never None,
+    so the work is not done twice.
+     - timeout : secs to wait for the answer; default no limit except
+       for status (the daemon's wg-quick has its own deadline)
+    """
+    if cmd not in DAEMON_CMDS:
+        return None
+
+    path = daemon_socket_path()
+    if not os.path.exists(path):
+        return None
+
+    if timeout is None and cmd == 'status':
+        timeout = STATUS_TIMEOUT
+
+    request = {'cmd': cmd, 'iface': iface}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM | socket.SOCK_CLOEXEC) as sock:
+        try:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(path)
+        except OSError:
+            return None
+
+        try:
+            sock.settimeout(timeout)
+            sock.sendall(json.dumps(request).encode() + b'\n')
+            data = read_line(sock)
+        except OSError as err:
+            return _no_reply(cmd, f'no reply from daemon : {err}')
+
+    if not data:
+        return _no_reply(cmd, 'daemon closed connection without reply')
+
+    try:
+        reply = json.loads(data)
+    except json.JSONDecodeError:
+        return _no_reply(cmd, 'bad reply from daemon')
+
+    if not isinstance(reply, dict) or not reply.get('okay'):
+        return None
+    return reply
+
+
+def _no_reply(cmd: str, error: str) -> dict[str, Any] | None:
+    """ request was sent but no answer : only status is safe to redo """
+    if cmd == 'status':
+        return None
+    return {'okay': False, 'error': error}
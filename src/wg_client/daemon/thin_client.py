@@ -0,0 +1,82 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Thin client : hand a single request straight to a running control daemon
+ - no WgClient is built (argparse, config, signal handlers, ssh manager)
+   and only the light daemon client is imported
+ - anything else (several options, other options, no daemon, root) is
+   left to the full wg-client
+"""
+import os
+
+from .client import (daemon_socket_path, daemon_request)
+
+# option -> status item it shows ('status' : all of them)
+_SHOW_OPTS = {
+        '--show-iface': 'wg_iface',
+        '--show-ssh-server': 'ssh_server',
+        '--show-ssh-running': 'ssh_running',
+        '--show-wg-running': 'wg_running',
+        '--show-fix-dns-auto': 'resolv_monitor',
+        '--show-info': 'status',
+        '--status': 'status',
+        }
+
+# option -> daemon request
+_CMD_OPTS = {
+        '--wg-up': 'up',
+        '--wg-dn': 'down',
+        '--ssh-start': 'ssh-start',
+        '--ssh-stop': 'ssh-stop',
+        }
+
+
+def thin_request(args: list[str]) -> bool:
+    """
+    Do what command line args ask through the daemon, if it is one of the
+    options above (and optionally the iface).
+    Returns True if done, False if wg-client should run in full
+     - output is the same as wg-client gives
+    """
+    if os.geteuid() == 0 or not os.path.exists(daemon_socket_path()):
+        # root status covers all users
+        return False
+
+    opts = [arg for arg in args if arg.startswith('-')]
+    others = [arg for arg in args if not arg.startswith('-')]
+    if len(opts) != 1 or len(others) > 1:
+        return False
+    opt = opts[0]
+    iface = others[0] if others else ''
+
+    if opt in _SHOW_OPTS:
+        return _show(_SHOW_OPTS[opt], iface)
+
+    if opt in _CMD_OPTS:
+        cmd = _CMD_OPTS[opt]
+        reply = daemon_request(cmd, iface)
+        if reply is None:
+            return False
+        if not reply.get('okay'):
+            print(f'Error: {cmd} : {reply.get("error", "")}')
+        return True
+    return False
+
+
+def _show(which: str, iface: str) -> bool:
+    """ status (or one item of it) from daemon """
+    reply = daemon_request('status', iface)
+    if reply is None:
+        return False
+
+    items = reply.get('result', {})
+    if which != 'status':
+        if which not in items:
+            return False
+        items = {which: items[which]}
+
+    for (key, val) in items.items():
+        if which == 'status':
+            print(f'{key:>15s} : ', end='')
+        print(val)
+    return True
@@ -5,3 +5,4 @@ GUI Suport
 """
 from .class_gui import WgClientGui
 from .class_gui import MainGui
+from .class_status import GuiStatus
@@ -14,12 +14,9 @@ from PyQt6.QtWidgets import (QVBoxLayout, QGridLayout, QMainWindow)
 
 from wg_client.proc import MySignals
 from wg_client.utils import MyLog
-from wg_client.cmd_line import is_wg_running
-from wg_client.cmd_line import is_ssh_running
-from wg_client.cmd_line import get_wg_iface
-from wg_client.cmd_line import get_ssh_server
 
 from .class_worker import MyRunners
+from .class_status import GuiStatus
 
 
 def _wg_client_cmd() -> str:
@@ -77,19 +74,23 @@ class WgClientGui():
         logfile = self.logger.logfile()
         self.message(f'Info is logged to {logfile}')
 
+        #
+        # Status is gathered in process (config, wg iface, ssh pid)
+        # wg-client is only run for actions that change something
+        #
+        self.status = GuiStatus(self.log)
+
         #
         # Get the wireguard interface name
         # uses to check if wg is running
         #
-        self.wg_iface: str = get_wg_iface(self.log)
+        self.wg_iface: str = self.status.wg_iface
         if self.wg_iface:
             self.log(f'wg iface : {self.wg_iface}')
         else:
             self.message('Error: Failed to get wireguard interface')
 
-        self.ssh_server: str = get_ssh_server(self.log)
-        if self.ssh_server == 'None':
-            self.ssh_server = ''
+        self.ssh_server: str = self.status.ssh_server
 
     def log(self, msg):
         """ log to file """
@@ -173,7 +174,7 @@ class WgClientGui():
         '''
         Start
         '''
-        wg_running = is_wg_running(self.wg_iface)
+        wg_running = self.status.is_wg_running()
         if wg_running:
             self.message('vpn already running')
             self.log('vpn_up - vpn already running')
@@ -215,6 +216,7 @@ class WgClientGui():
             pargs = [self.cmd, '--fix-dns-auto-start']
             id_num = self.runners.new_worker(self.complete, pargs)
             self.id_num_map[id_num] = 'start auto fix dns'
+            self.status.invalidate()
 
     def vpn_dn(self):
         ''' Stop '''
@@ -237,25 +239,34 @@ class WgClientGui():
         #
         # 2) stop wireguard
         #
-        wg_running = is_wg_running(self.wg_iface)
+        wg_running = self.status.is_wg_running()
         if wg_running:
             self.log('vpn_dn - stopping vpn')
             self.message('stop vpn')
             pargs = [self.cmd, '--wg-dn']
             id_num = self.runners.new_worker(self.complete, pargs)
             self.id_num_map[id_num] = 'stop vpn'
+            self.status.invalidate()
         else:
             self.log('vpn_dn - vpn not running')
             self.message('vpn not running')
 
+    def ssh_failed(self):
+        ''' show why ssh listener was given up on, if it was '''
+        why = self.status.ssh_failure()
+        if why:
+            self.log(f'ssh : {why}')
+            self.message(f' ssh {why} - check ssh keys / server')
+
     def ssh_start(self):
         ''' Start SSH '''
-        ssh_running = is_ssh_running(self.log)
+        self.ssh_failed()
+        ssh_running = self.status.is_ssh_running()
         if ssh_running:
             self.log('ssh_start ssh already running')
             self.message(' ssh aleady running')
         else:
-            wg_running = is_wg_running(self.wg_iface)
+            wg_running = self.status.is_wg_running()
             if wg_running:
                 self.log('ssh_start - starting ssh listener')
                 self.message('Starting ssh')
@@ -269,13 +280,14 @@ class WgClientGui():
 
                 id_num = self.runners.new_worker(self.complete, pargs)
                 self.id_num_map[id_num] = 'ssh start'
+                self.status.invalidate('ssh_running')
             else:
                 self.log('ssh_start - vpn not running')
                 self.message('vpn not running - cant run ssh')
 
     def ssh_stop(self):
         ''' Stop SSH '''
-        ssh_running = is_ssh_running(self.log)
+        ssh_running = self.status.is_ssh_running()
         if ssh_running:
             self.log('ssh_stop - stopping ssh listener')
             self.message('Stopping ssh')
@@ -287,9 +299,11 @@ class WgClientGui():
                 return
             id_num = self.runners.new_worker(self.complete, pargs)
             self.id_num_map[id_num] = 'ssh stop'
+            self.status.invalidate('ssh_running')
         else:
             self.log('ssh_stop ssh not running')
             self.message('ssh not running')
+            self.ssh_failed()
 
     def complete(self, id_num):
         '''
@@ -297,12 +311,16 @@ class WgClientGui():
         we're either starting or stopping.
         '''
         which = self.id_num_map[id_num]
+        self.status.invalidate()
         self.log(f'{id_num} {which} : completed')
         self.message(f'{which} : completed')
+        if which == 'ssh start':
+            self.ssh_failed()
 
     def quit(self):
         ''' Done '''
         self.log('Quit : Client GUI')
+        self.status.invalidate()
         self.ssh_stop()
         self.vpn_dn()
         # self.runners.quit()
@@ -0,0 +1,74 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+In process status for the GUI
+ - no need to run wg-client just to ask a question
+ - results are cached and invalidated when gui starts/stops something
+"""
+import time
+from typing import Callable
+
+from wg_client.cmd_line import WgClientOpts
+from wg_client.cmd_line import is_wg_running
+from wg_client.ssh import SshMgr
+from wg_client.ssh import (read_ssh_status, ssh_failure)
+
+
+class GuiStatus:
+    """
+    Status provider
+     - config via WgClientOpts (config file only - gui has no wg-client options)
+     - wg running via interface check
+     - ssh running via SshMgr pidfile check
+     - ssh failure (given up on) via its state record - not cached
+    Cached values expire after ttl secs or when invalidate() is called.
+    """
+    def __init__(self, log: Callable[[str], None], ttl: float = 2.0):
+        self.log = log
+        self.ttl: float = ttl
+        self.cache: dict[str, tuple[float, bool]] = {}
+
+        self.opts = WgClientOpts(parse_args=False)
+        self.okay: bool = bool(self.opts.okay)
+
+        self.wg_iface: str = self.opts.iface if self.okay else ''
+        self.ssh_server: str = self.opts.ssh_server if self.okay else ''
+        test = self.wg_iface == 'test-dummy'
+
+        self.ssh_mgr = SshMgr(test, log=log)
+        self.ssh_mgr.server = self.ssh_server
+
+    def invalidate(self, key: str = ''):
+        """
+        Drop cached value for key (or all if no key)
+        """
+        if key:
+            self.cache.pop(key, None)
+        else:
+            self.cache.clear()
+
+    def _cached(self, key: str, func: Callable[[], bool]) -> bool:
+        """
+        Return cached value if still fresh otherwise refresh it
+        """
+        now = time.monotonic()
+        if key in self.cache:
+            (when, value) = self.cache[key]
+            if now - when < self.ttl:
+                return value
+
+        value = func()
+        self.cache[key] = (now, value)
+        return value
+
+    def is_wg_running(self) -> bool:
+        """ is wireguard up """
+        return self._cached('wg_running', lambda: is_wg_running(self.wg_iface))
+
+    def is_ssh_running(self) -> bool:
+        """ is ssh listener running """
+        return self._cached('ssh_running', self.ssh_mgr.is_running)
+
+    def ssh_failure(self) -> str:
+        """ why ssh listener was given up on ('' if it was not) """
+        return ssh_failure(read_ssh_status(self.ssh_mgr.tag))
@@ -5,3 +5,10 @@ Library
 """
 from .ip_addr import iface_to_ips
 from .ip_addr import ip_to_octet
+from .ip_addr import ip_cmd_iface_to_ips
+from .class_netlink import NetLink
+from .class_netlink import netlink_iface_to_ips
+from .class_netwatch import (NetWatch, NET_UP_GROUPS)
+
+from .iface_wait import iface_exists
+from .iface_wait import wait_for_iface
@@ -0,0 +1,351 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Minimal rtnetlink (NETLINK_ROUTE) client.
+ - talks to the kernel directly over an AF_NETLINK socket
+ - avoids fork/exec of 'ip' and parsing its json output
+"""
+import socket
+import struct
+
+#
+# linux/netlink.h
+#
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+NLM_F_REQUEST = 0x01
+NLM_F_MULTI = 0x02
+NLM_F_DUMP = 0x300
+
+#
+# linux/rtnetlink.h
+#
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+RTM_NEWROUTE = 24
+RTM_DELROUTE = 25
+RTM_GETROUTE = 26
+
+# multicast groups : RTMGRP_xxx = 1 << (RTNLGRP_xxx - 1)
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+RTMGRP_IPV6_ROUTE = 0x400
+
+RT_TABLE_MAIN = 254
+RTN_UNICAST = 1
+RT_SCOPE_UNIVERSE = 0
+
+# linux/if.h
+IFF_UP = 0x1
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+
+IFLA_IFNAME = 3
+
+#
+# struct formats (native byte order)
+#   nlmsghdr    : len, type, flags, seq, pid
+#   ifaddrmsg   : family, prefixlen, flags, scope, index
+#   ifinfomsg   : family, pad, type, index, flags, change
+#   rtmsg       : family, dst_len, src_len, tos, table, protocol, scope, type, flags
+#   rtattr      : len, type
+#
+_NLMSGHDR = struct.Struct('=LHHLL')
+_IFADDRMSG = struct.Struct('=BBBBI')
+_IFINFOMSG = struct.Struct('=BxHiII')
+_RTMSG = struct.Struct('=BBBBBBBBI')
+_RTATTR = struct.Struct('=HH')
+
+_RCVBUF = 65536
+
+
+def _align(length: int) -> int:
+    """ netlink messages and attributes are 4 byte aligned """
+    return (length + 3) & ~3
+
+
+def parse_attrs(data: bytes, offset: int) -> dict[int, bytes]:
+    """
+    Parse rtattr list starting at offset.
+    Returns dictionary of attribute type -> payload
+    """
+    attrs: dict[int, bytes] = {}
+    end = len(data)
+    while offset + _RTATTR.size <= end:
+        (rta_len, rta_type) = _RTATTR.unpack_from(data, offset)
+        if rta_len < _RTATTR.size:
+            break
+        attrs[rta_type] = data[offset + _RTATTR.size:offset + rta_len]
+        offset += _align(rta_len)
+    return attrs
+
+
+def parse_headers(data: bytes) -> list[tuple[int, int, int, int, bytes]]:
+    """
+    Split buffer received from kernel into netlink messages
+    Returns list of (nlmsg_type, nlmsg_flags, nlmsg_seq, nlmsg_pid, body)
+    """
+    msgs: list[tuple[int, int, int, int, bytes]] = []
+    offset = 0
+    end = len(data)
+    while offset + _NLMSGHDR.size <= end:
+        (msg_len, msg_type, msg_flags, msg_seq, msg_pid) = _NLMSGHDR.unpack_from(data, offset)
+        if msg_len < _NLMSGHDR.size:
+            break
+        body = data[offset + _NLMSGHDR.size:offset + msg_len]
+        msgs.append((msg_type, msg_flags, msg_seq, msg_pid, body))
+        offset += _align(msg_len)
+    return msgs
+
+
+def parse_messages(data: bytes) -> list[tuple[int, int, bytes]]:
+    """
+    Split buffer received from kernel into netlink messages
+    Returns list of (nlmsg_type, nlmsg_flags, body)
+    """
+    return [(msg_type, msg_flags, body)
+            for (msg_type, msg_flags, _seq, _pid, body) in parse_headers(data)]
+
+
+def parse_link(body: bytes) -> tuple[int, str]:
+    """
+    RTM_NEWLINK / RTM_DELLINK body
+    Returns (index, name)
+    """
+    (_fam, _type, index, _flags, _change) = _IFINFOMSG.unpack_from(body, 0)
+    attrs = parse_attrs(body, _IFINFOMSG.size)
+    name = attrs.get(IFLA_IFNAME, b'').split(b'\0', 1)[0].decode(errors='replace')
+    return (index, name)
+
+
+def parse_link_flags(body: bytes) -> int:
+    """
+    RTM_NEWLINK / RTM_DELLINK body
+    Returns interface flags (IFF_xxx)
+    """
+    (_fam, _type, _index, flags, _change) = _IFINFOMSG.unpack_from(body, 0)
+    return flags
+
+
+def parse_addr_scope(body: bytes) -> int:
+    """
+    RTM_NEWADDR / RTM_DELADDR body
+    Returns address scope (RT_SCOPE_UNIVERSE for global)
+    """
+    (_family, _plen, _flags, scope, _index) = _IFADDRMSG.unpack_from(body, 0)
+    return scope
+
+
+def parse_route(body: bytes) -> tuple[int, int, int, int]:
+    """
+    RTM_NEWROUTE / RTM_DELROUTE body
+    Returns (family, dst_len, table, type)
+     - dst_len 0 is a default route
+    """
+    (family, dst_len, _src_len, _tos, table,
+     _proto, _scope, rtype, _flags) = _RTMSG.unpack_from(body, 0)
+    return (family, dst_len, table, rtype)
+
+
+def parse_addr(body: bytes) -> tuple[int, int, str]:
+    """
+    RTM_NEWADDR / RTM_DELADDR body
+    Returns (index, family, address)
+     - address is IFA_LOCAL if present (point to point) else IFA_ADDRESS
+       This matches the 'local' field reported by 'ip -j address'
+    """
+    (family, _plen, _flags, _scope, index) = _IFADDRMSG.unpack_from(body, 0)
+    attrs = parse_attrs(body, _IFADDRMSG.size)
+    raw = attrs.get(IFA_LOCAL) or attrs.get(IFA_ADDRESS)
+    addr = ''
+    if raw:
+        try:
+            addr = socket.inet_ntop(family, raw)
+        except (OSError, ValueError):
+            addr = ''
+    return (index, family, addr)
+
+
+class NetLink:
+    """
+    rtnetlink socket
+     - groups is bitmask of RTMGRP_xxx multicast groups to subscribe to (0 = none)
+     - okay is False if socket could not be created
+     - port_id is our netlink port (kernel assigned) : replies to our requests carry it
+    """
+    def __init__(self, groups: int = 0):
+        self.okay: bool = True
+        self.seq: int = 0
+        self.port_id: int = 0
+        self.sock: socket.socket | None = None
+
+        try:
+            self.sock = socket.socket(socket.AF_NETLINK,
+                                      socket.SOCK_RAW | socket.SOCK_CLOEXEC,
+                                      socket.NETLINK_ROUTE)
+            self.sock.bind((0, groups))
+            self.port_id = self.sock.getsockname()[0]
+        except (OSError, AttributeError):
+            self.close()
+            self.okay = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    def close(self):
+        """ close socket """
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def fileno(self) -> int:
+        """ socket file descriptor (-1 if closed) """
+        if self.sock is None:
+            return -1
+        return self.sock.fileno()
+
+    def recv(self) -> list[tuple[int, int, bytes]]:
+        """
+        Read one buffer from kernel and split into messages
+        """
+        if self.sock is None:
+            return []
+        data = self.sock.recv(_RCVBUF)
+        return parse_messages(data)
+
+    def dump(self, msg_type: int, payload: bytes) -> list[tuple[int, bytes]] | None:
+        """
+        Send dump request and collect all replies.
+         - messages not answering this request (other seq or port, e.g. group
+           notifications or late replies to an earlier one) are skipped
+        Returns list of (nlmsg_type, body) or None on error
+        """
+        if self.sock is None:
+            return None
+
+        self.seq += 1
+        flags = NLM_F_REQUEST | NLM_F_DUMP
+        hdr = _NLMSGHDR.pack(_NLMSGHDR.size + len(payload), msg_type, flags, self.seq, 0)
+
+        replies: list[tuple[int, bytes]] = []
+        try:
+            self.sock.sendto(hdr + payload, (0, 0))
+            while True:
+                for (rtype, _flags, seq, pid, body) in parse_headers(self.sock.recv(_RCVBUF)):
+                    if seq != self.seq or pid != self.port_id:
+                        continue
+                    if rtype == NLMSG_DONE:
+                        return replies
+                    if rtype == NLMSG_ERROR:
+                        return None
+                    replies.append((rtype, body))
+        except OSError:
+            return None
+
+    def links(self) -> dict[int, str] | None:
+        """
+        RTM_GETLINK dump
+        Returns dictionary of index -> interface name
+        """
+        payload = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)
+        replies = self.dump(RTM_GETLINK, payload)
+        if replies is None:
+            return None
+
+        links: dict[int, str] = {}
+        for (rtype, body) in replies:
+            if rtype == RTM_NEWLINK:
+                (index, name) = parse_link(body)
+                links[index] = name
+        return links
+
+    def link_flags(self) -> dict[str, int] | None:
+        """
+        RTM_GETLINK dump
+        Returns dictionary of interface name -> flags (IFF_xxx)
+        """
+        payload = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)
+        replies = self.dump(RTM_GETLINK, payload)
+        if replies is None:
+            return None
+        return {parse_link(body)[1]: parse_link_flags(body)
+                for (rtype, body) in replies if rtype == RTM_NEWLINK}
+
+    def routes(self) -> list[tuple[int, int, int, int]] | None:
+        """
+        RTM_GETROUTE dump (all tables, ipv4 and ipv6)
+        Returns list of (family, dst_len, table, type) - see parse_route()
+        """
+        payload = _RTMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0, 0, 0, 0, 0)
+        replies = self.dump(RTM_GETROUTE, payload)
+        if replies is None:
+            return None
+        return [parse_route(body) for (rtype, body) in replies if rtype == RTM_NEWROUTE]
+
+    def addr_scopes(self) -> list[int] | None:
+        """
+        RTM_GETADDR dump
+        Returns scope of each address (RT_SCOPE_UNIVERSE for global)
+        """
+        payload = _IFADDRMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)
+        replies = self.dump(RTM_GETADDR, payload)
+        if replies is None:
+            return None
+        return [parse_addr_scope(body) for (rtype, body) in replies if rtype == RTM_NEWADDR]
+
+    def addrs(self, index: int) -> tuple[list[str], list[str]] | None:
+        """
+        RTM_GETADDR dump for interface index
+        Returns (ips4, ips6) or None on error
+        """
+        ips4: list[str] = []
+        ips6: list[str] = []
+
+        payload = _IFADDRMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)
+        replies = self.dump(RTM_GETADDR, payload)
+        if replies is None:
+            return None
+
+        for (rtype, body) in replies:
+            if rtype != RTM_NEWADDR:
+                continue
+            (ifindex, family, addr) = parse_addr(body)
+            if ifindex != index or not addr:
+                continue
+            if family == socket.AF_INET:
+                ips4.append(addr)
+            elif family == socket.AF_INET6:
+                ips6.append(addr)
+        return (ips4, ips6)
+
+
+def netlink_iface_to_ips(iface: str) -> tuple[list[str], list[str]] | None:
+    """
+    Get ip4 and ip6 addresses of iface using rtnetlink.
+     - Returns None if netlink is unavailable so caller can fall back to 'ip'
+     - Missing interface returns empty lists
+    """
+    with NetLink() as nlink:
+        if not nlink.okay:
+            return None
+
+        links = nlink.links()
+        if links is None:
+            return None
+
+        index = next((idx for (idx, name) in links.items() if name == iface), -1)
+        if index < 0:
+            return ([], [])
+
+        return nlink.addrs(index)
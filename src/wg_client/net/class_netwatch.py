@@ -0,0 +1,159 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Network change notifications
+ - rtnetlink link and ipv4/ipv6 route groups (RTNLGRP_LINK, RTNLGRP_IPV4_ROUTE,
+   RTNLGRP_IPV6_ROUTE)
+ - resume, wifi roam and dhcp renew all show up here, usually just before
+   something rewrites resolv.conf
+ - with address groups too (NET_UP_GROUPS) it also tells when the network
+   comes back : it was down (no default route, no global address or wg interface
+   not up) and now is up. Routine refreshes of routes and addresses (dhcp renew,
+   ipv6 router advertisements) while it stays up are not the network coming back.
+"""
+import errno
+
+from .class_netlink import (NetLink, RTM_NEWLINK, RTM_DELLINK, RTM_NEWROUTE, RTM_DELROUTE)
+from .class_netlink import (RTM_NEWADDR, RTM_DELADDR)
+from .class_netlink import (RTMGRP_LINK, RTMGRP_IPV4_ROUTE, RTMGRP_IPV6_ROUTE)
+from .class_netlink import (RTMGRP_IPV4_IFADDR, RTMGRP_IPV6_IFADDR)
+from .class_netlink import (RT_TABLE_MAIN, RTN_UNICAST, RT_SCOPE_UNIVERSE, IFF_UP)
+from .class_netlink import (parse_link, parse_link_flags, parse_addr_scope, parse_route)
+
+_CHANGE_TYPES = (RTM_NEWLINK, RTM_DELLINK, RTM_NEWROUTE, RTM_DELROUTE)
+
+NET_GROUPS = RTMGRP_LINK | RTMGRP_IPV4_ROUTE | RTMGRP_IPV6_ROUTE
+NET_UP_GROUPS = NET_GROUPS | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR
+
+
+def _is_default_route(route: tuple[int, int, int, int]) -> bool:
+    """ default route in main table (see parse_route()) """
+    (_family, dst_len, table, route_type) = route
+    return dst_len == 0 and table == RT_TABLE_MAIN and route_type == RTN_UNICAST
+
+
+def affects_net_up(rtype: int, body: bytes, iface: str) -> bool:
+    """
+    True if message could change whether network is up (see net_is_up())
+     - default route in main table added or removed
+     - global address added or removed
+     - iface (wg) link changed
+    """
+    if rtype in (RTM_NEWROUTE, RTM_DELROUTE):
+        return _is_default_route(parse_route(body))
+
+    if rtype in (RTM_NEWADDR, RTM_DELADDR):
+        return parse_addr_scope(body) == RT_SCOPE_UNIVERSE
+
+    if rtype in (RTM_NEWLINK, RTM_DELLINK) and iface:
+        return parse_link(body)[1] == iface
+    return False
+
+
+def net_is_up(iface: str = '') -> bool | None:
+    """
+    Network is up : default route, global address and iface (if given) up
+    Returns None if netlink could not tell
+    """
+    with NetLink() as nlink:
+        if not nlink.okay:
+            return None
+        routes = nlink.routes()
+        scopes = nlink.addr_scopes()
+        flags = nlink.link_flags() if iface else {}
+    if routes is None or scopes is None or flags is None:
+        return None
+
+    if not any(_is_default_route(route) for route in routes):
+        return False
+    if RT_SCOPE_UNIVERSE not in scopes:
+        return False
+    return not iface or bool(flags.get(iface, 0) & IFF_UP)
+
+
+class NetWatch:
+    """
+    Non blocking subscription to link and route changes
+     - okay is False if netlink is unavailable
+     - caller polls fileno() and calls read_changes() (or read_net_up()) when readable
+     - groups : NET_UP_GROUPS needed for read_net_up() to see new addresses
+     - iface : wg interface that must be up too for read_net_up()
+     - is_up : network up when last checked (None if not known) - with
+       NET_UP_GROUPS checked when opened, then after each change that matters
+    """
+    def __init__(self, groups: int = NET_GROUPS, iface: str = ''):
+        self.nlink = NetLink(groups=groups)
+        self.okay: bool = self.nlink.okay
+        self.iface: str = iface
+        self.is_up: bool | None = None
+        if self.nlink.sock is not None:
+            self.nlink.sock.setblocking(False)
+        if self.okay and groups & NET_UP_GROUPS == NET_UP_GROUPS:
+            # subscribed first : changes from here on are queued for read_net_up()
+            self.is_up = net_is_up(iface)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    def close(self):
+        """ close netlink socket """
+        self.nlink.close()
+        self.okay = False
+
+    def fileno(self) -> int:
+        """ for poll or event loop (-1 if closed) """
+        return self.nlink.fileno()
+
+    def _read_all(self) -> tuple[list[tuple[int, int, bytes]], bool]:
+        """
+        Read all queued notifications without blocking.
+        Returns (messages, dropped)
+         - dropped is True if kernel dropped some (ENOBUFS)
+        """
+        msgs: list[tuple[int, int, bytes]] = []
+        dropped = False
+        while True:
+            try:
+                more = self.nlink.recv()
+            except BlockingIOError:
+                break
+            except OSError as err:
+                if err.errno == errno.ENOBUFS:
+                    dropped = True
+                    continue
+                break
+            if not more:
+                break
+            msgs += more
+        return (msgs, dropped)
+
+    def read_changes(self) -> int:
+        """
+        Read all queued notifications without blocking.
+        Returns number of link / route changes
+         - kernel dropped some (ENOBUFS) : counted as one change
+        """
+        (msgs, dropped) = self._read_all()
+        count = sum(1 for (rtype, _flags, _body) in msgs if rtype in _CHANGE_TYPES)
+        return count + int(dropped)
+
+    def read_net_up(self) -> bool:
+        """
+        Read all queued notifications without blocking.
+        Returns True if network was down and is now up (see net_is_up())
+         - only checked again if some change could matter (or kernel dropped some)
+        """
+        (msgs, dropped) = self._read_all()
+        if not dropped and not any(affects_net_up(rtype, body, self.iface)
+                                   for (rtype, _flags, body) in msgs):
+            return False
+
+        was_up = self.is_up
+        is_up = net_is_up(self.iface)
+        if is_up is None:
+            return False
+        self.is_up = is_up
+        return is_up and was_up is False
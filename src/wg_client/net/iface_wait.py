@@ -0,0 +1,80 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Wait for a network interface to appear
+ - event driven using rtnetlink link notifications (RTNLGRP_LINK)
+"""
+import os
+import select
+import time
+
+from .class_netlink import (NetLink, RTM_NEWLINK, RTMGRP_LINK, parse_link)
+
+
+def iface_exists(iface: str) -> bool:
+    """
+    Interface exists if kernel lists it in sysfs
+    """
+    if not iface:
+        return False
+    return os.path.exists(f'/sys/class/net/{iface}')
+
+
+def _poll_for_iface(iface: str, deadline: float) -> bool:
+    """
+    Fallback when netlink is not available
+    """
+    interval = 0.25
+    while True:
+        if iface_exists(iface):
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(interval, remaining))
+
+
+def wait_for_iface(iface: str, deadline: float) -> bool:
+    """
+    Wait until iface exists or deadline is reached.
+     - deadline is an absolute time.monotonic() value
+     - returns True as soon as the kernel announces the link
+       or False if deadline passes first
+    We subscribe before checking, so a link created between the
+    check and the subscription cannot be missed.
+    """
+    if not iface:
+        return False
+
+    with NetLink(groups=RTMGRP_LINK) as nlink:
+        if not nlink.okay:
+            return _poll_for_iface(iface, deadline)
+
+        if iface_exists(iface):
+            return True
+
+        poller = select.poll()
+        poller.register(nlink.fileno(), select.POLLIN)
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return iface_exists(iface)
+
+            if not poller.poll(remaining * 1000):
+                continue
+
+            try:
+                msgs = nlink.recv()
+            except OSError:
+                # ENOBUFS - events were dropped, so ask directly
+                if iface_exists(iface):
+                    return True
+                continue
+
+            for (rtype, _flags, body) in msgs:
+                if rtype != RTM_NEWLINK:
+                    continue
+                (_index, name) = parse_link(body)
+                if name == iface:
+                    return True
@@ -3,9 +3,14 @@
 """
 Parse output of wg-quick and get client wg address
 """
-import ipaddress
 import json
-from pyconcurrent import run_prog
+
+from wg_client.utils.lazy import lazy_import
+
+from .class_netlink import netlink_iface_to_ips
+
+ipaddress = lazy_import('ipaddress')
+pyconcurrent = lazy_import('pyconcurrent')
 
 
 def wg_quick_out_to_ip4(wg_quick_output: str) -> str:
@@ -65,14 +70,26 @@ def ip_to_octet(ip_str: str) -> str:
 
 def iface_to_ips(iface: str) -> tuple[list[str], list[str]]:
     """
-    Use ni to get ips
+    Return list of ip4,ip6 addresses of iface
+     - ask kernel directly using rtnetlink
+     - fall back to 'ip' program if netlink is not available
+    """
+    ips = netlink_iface_to_ips(iface)
+    if ips is not None:
+        return ips
+    return ip_cmd_iface_to_ips(iface)
+
+
+def ip_cmd_iface_to_ips(iface: str) -> tuple[list[str], list[str]]:
+    """
+    Use ip program to get ips
     return list of ip4,ip6 addresses
     """
     ip4: list[str] = []
     ip6: list[str] = []
 
     pargs = ['ip', '-j', '-d', 'address', 'show', iface]
-    (ret, out, _err) = run_prog(pargs)
+    (ret, out, _err) = pyconcurrent.run_prog(pargs)
     if ret != 0:
         # print(f'Error getting ips from interface: {err}')
         return (ip4, ip6)
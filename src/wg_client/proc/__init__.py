@@ -11,7 +11,24 @@ from .users import process_owner
 
 from .state import is_pid_running
 from .state import kill_program
+from .state import signal_program
 from .state import write_pid
 from .state import read_pid
 from .state import check_pid
 from .state import get_parent_pid
+
+from .proc_table import ProcTable
+from .class_pidfd import PidFd
+from .class_pidfd import pid_alive
+from .proc_table import user_uid
+
+
+def __getattr__(name: str):
+    """
+    Async runner (and asyncio) only loaded when needed
+    """
+    if name == 'MyAsyncProc':
+        # pylint: disable=import-outside-toplevel
+        from .class_async_proc import MyAsyncProc
+        return MyAsyncProc
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
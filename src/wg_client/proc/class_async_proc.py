@@ -0,0 +1,308 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Async child process (asyncio)
+ - per call deadline : child is ended (SIGTERM, then SIGKILL) once it passes
+ - cancellation : cancelling the awaiting task or cancel() (any thread) ends the child
+ - stdout / stderr handed to callbacks a line at a time as they arrive
+ - output kept for the caller is bounded : oldest lines dropped past max_output chars
+"""
+import os
+import asyncio
+import codecs
+import signal
+from asyncio.subprocess import Process
+from collections import deque
+from typing import Callable
+
+from .class_pidfd import PidFd
+
+# chars kept of each of stdout, stderr
+MAX_OUTPUT = 1 << 20
+
+type LineFunc = Callable[[str], None]
+
+
+class _Output:
+    """
+    One output pipe : split into lines, keep the last max_chars of them
+     - a line longer than max_chars is passed on in pieces
+    """
+    def __init__(self, on_line: LineFunc | None, max_chars: int):
+        self.on_line = on_line
+        self.max_chars: int = max_chars
+        self.lines: deque[str] = deque()
+        self.size: int = 0
+        self.dropped: int = 0
+        self._partial: str = ''
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def feed(self, data: bytes):
+        """ more output; complete lines are passed on """
+        lines = (self._partial + self._decoder.decode(data)).split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self._add(line + '\n')
+        if len(self._partial) >= self.max_chars:
+            (line, self._partial) = (self._partial, '')
+            self._add(line)
+
+    def flush(self):
+        """ end of output : last line may have no newline """
+        line = self._partial + self._decoder.decode(b'', final=True)
+        self._partial = ''
+        if line:
+            self._add(line)
+
+    def _add(self, line: str):
+        if self.on_line:
+            self.on_line(line)
+        self.lines.append(line)
+        self.size += len(line)
+        while self.size > self.max_chars and len(self.lines) > 1:
+            old = self.lines.popleft()
+            self.size -= len(old)
+            self.dropped += len(old)
+
+    def text(self) -> str:
+        """ kept output """
+        return ''.join(self.lines)
+
+
+async def _open_pipe() -> tuple[int, asyncio.StreamReader, asyncio.ReadTransport]:
+    """
+    Pipe for one child output : (write fd for child, reader, its transport)
+     - our own pipe rather than PIPE so Process.wait() does not also wait
+       for end of output and we can close the read end ourselves
+    """
+    (rfd, wfd) = os.pipe2(os.O_CLOEXEC)
+    reader = asyncio.StreamReader()
+    loop = asyncio.get_running_loop()
+    try:
+        (transport, _proto) = await loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(rfd, 'rb', buffering=0))
+    except OSError:
+        os.close(wfd)
+        raise
+    return (wfd, reader, transport)
+
+
+def _send_signal(proc: Process, sig: int):
+    """
+    on proc's loop : skipped once its exit was seen
+     - os.kill, as Process.send_signal() polls (reaps) the child itself,
+       which then leaves the child watcher without its exit status
+    """
+    if proc.returncode is not None:
+        return
+    try:
+        os.kill(proc.pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+async def _pump(stream: asyncio.StreamReader, output: _Output):
+    """ copy pipe to output until eof """
+    while data := await stream.read(65536):
+        output.feed(data)
+    output.flush()
+
+
+class MyAsyncProc:
+    """
+    Run a child process on the event loop - see popen()
+     - takes the instance of MySignals (child is killed with us) or None
+     - timed_out / cancelled : how the last popen() ended, if not by itself
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, mysignals=None):
+        self.proc: Process | None = None
+        self.pidfd: PidFd | None = None
+        self.mysignals = mysignals
+        self.max_output: int = MAX_OUTPUT
+        self.kill_after: float = 5.0
+        self.drain_secs: float = 1.0
+        self.timed_out: bool = False
+        self.cancelled: bool = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._cancel: asyncio.Event | None = None
+
+    def is_running(self) -> bool:
+        """ Is our child still running - pidfd poll, no /proc access """
+        if self.pidfd is None:
+            return False
+        return self.pidfd.is_alive()
+
+    @property
+    def returncode(self) -> int | None:
+        """ exit status once reaped (MySignals checks it) """
+        return self.proc.returncode if self.proc is not None else None
+
+    def terminate(self) -> bool:
+        """
+        SIGTERM our child - safe from other threads and signal handlers
+        Returns True if signal was sent
+        """
+        return self._signal(signal.SIGTERM)
+
+    def kill(self) -> bool:
+        """ SIGKILL our child - as terminate() """
+        return self._signal(signal.SIGKILL)
+
+    def _signal(self, sig: int) -> bool:
+        """
+        Signal child via pidfd (so never some other process)
+         - no pidfd : the asyncio Process is only used on its own loop,
+           which may be run by another thread
+        """
+        if self.pidfd is not None and self.pidfd.okay:
+            return self.pidfd.send_signal(sig)
+
+        (proc, loop) = (self.proc, self._loop)
+        if proc is None or proc.returncode is not None or loop is None or loop.is_closed():
+            return False
+        loop.call_soon_threadsafe(_send_signal, proc, sig)
+        return True
+
+    def cancel(self):
+        """
+        End popen() early : child is terminated (killed if it lingers)
+         - safe from other threads and signal handlers
+        """
+        loop = self._loop
+        if loop is not None and self._cancel is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._cancel.set)
+
+    async def popen(self, pargs: list[str], logger: LineFunc | None = None,
+                    pid_saver: Callable[[int], None] | None = None,
+                    on_stdout: LineFunc | None = None, on_stderr: LineFunc | None = None,
+                    timeout: float | None = None) -> tuple[int | None, str | None, str | None]:
+        """
+        Run pargs and wait for it to finish
+         - on_stdout / on_stderr : given each line as it arrives (with its newline)
+         - timeout : secs until child is ended (None or 0 is no limit)
+         - exit does not wait for end of output : a grandchild holding the
+           pipes open only delays us drain_secs
+        Returns (returncode, stdout, stderr) - (None, None, None) if it could not be started
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        # pylint: disable=too-many-locals,too-many-branches
+        log = logger if logger else print
+        self.timed_out = False
+        self.cancelled = False
+        self._loop = asyncio.get_running_loop()
+        self._cancel = asyncio.Event()
+        pipes: list[tuple[int, asyncio.StreamReader, asyncio.ReadTransport]] = []
+        try:
+            for _output in ('stdout', 'stderr'):
+                pipes.append(await _open_pipe())
+            self.proc = await asyncio.create_subprocess_exec(*pargs, stdout=pipes[0][0],
+                                                             stderr=pipes[1][0])
+        except OSError as err:
+            cmd = ' '.join(pargs)
+            log(f'Error starting {cmd} : {err}')
+            self.proc = None
+            for (_wfd, _reader, transport) in pipes:
+                transport.close()
+            if pid_saver:
+                pid_saver(-1)
+            return (None, None, None)
+        finally:
+            # child has its own copies of the write ends
+            for (wfd, _reader, _transport) in pipes:
+                os.close(wfd)
+
+        self.pidfd = PidFd(self.proc.pid)
+        if self.mysignals is not None:
+            self.mysignals.add_proc(self)
+        if pid_saver:
+            pid_saver(self.proc.pid)
+
+        outs = _Output(on_stdout, self.max_output)
+        errs = _Output(on_stderr, self.max_output)
+        pumps = [asyncio.create_task(_pump(pipes[0][1], outs)),
+                 asyncio.create_task(_pump(pipes[1][1], errs))]
+        try:
+            if not await self._wait_exit(self._cancel, timeout):
+                cmd = ' '.join(pargs)
+                why = 'cancelled' if self.cancelled else f'no exit after {timeout} secs'
+                log(f'{cmd} : {why} - ending it')
+                await self._end()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            await self._end()
+            raise
+        finally:
+            await self._reap(pumps, [transport for (_wfd, _reader, transport) in pipes])
+            if pid_saver:
+                pid_saver(-1)
+
+        for output in (outs, errs):
+            if output.dropped:
+                log(f' (output trimmed : first {output.dropped} chars dropped)')
+        (stdout, stderr) = (outs.text(), errs.text())
+        if stdout:
+            log(stdout)
+        if stderr:
+            log(stderr)
+        return (self.proc.returncode, stdout, stderr)
+
+    async def _wait_exit(self, cancel: asyncio.Event, timeout: float | None) -> bool:
+        """
+        Wait for exit, deadline or cancel()
+        Returns True if child exited by itself
+        """
+        exit_task = asyncio.create_task(self._exited())
+        cancel_task = asyncio.create_task(cancel.wait())
+        try:
+            (done, _pending) = await asyncio.wait([exit_task, cancel_task], timeout=timeout or None,
+                                                  return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            exit_task.cancel()
+            cancel_task.cancel()
+            await asyncio.gather(exit_task, cancel_task, return_exceptions=True)
+
+        if exit_task in done:
+            return True
+        if cancel_task in done:
+            self.cancelled = True
+        else:
+            self.timed_out = True
+        return False
+
+    async def _exited(self):
+        """
+        child exit : Process.wait() (output pipes are ours, so this does
+        not wait for them)
+        """
+        if self.proc is not None:
+            await self.proc.wait()
+
+    async def _end(self):
+        """ SIGTERM, then SIGKILL if still there after kill_after secs """
+        self.terminate()
+        try:
+            await asyncio.wait_for(self._exited(), self.kill_after)
+            return
+        except TimeoutError:
+            pass
+
+        self.kill()
+        await self._exited()
+
+    async def _reap(self, pumps: list[asyncio.Task], transports: list[asyncio.ReadTransport]):
+        """
+        Child has exited : collect rest of output
+         - pipes still held open by a grandchild are given up on after drain_secs
+        """
+        (_done, pending) = await asyncio.wait(pumps, timeout=self.drain_secs)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for transport in transports:
+            transport.close()
+
+        if self.mysignals is not None:
+            self.mysignals.remove_proc(self)
+        if self.pidfd is not None:
+            self.pidfd.close()
@@ -0,0 +1,108 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+pidfd process handles (linux 5.3+)
+ - a pidfd refers to one process and never to a later process re-using its pid
+ - becomes readable (POLLIN) when the process exits
+"""
+import os
+import select
+import signal
+
+
+class PidFd:
+    """
+    Hold pidfd for pid
+     - okay is False if pid does not exist (or pidfd not supported)
+    """
+    def __init__(self, pid: int):
+        self.pid: int = pid
+        self.fd: int = -1
+        self.okay: bool = False
+
+        if pid <= 0:
+            return
+        try:
+            self.fd = os.pidfd_open(pid)
+            self.okay = True
+        except (OSError, AttributeError):
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    def close(self):
+        """ release the fd """
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def fileno(self) -> int:
+        """ for poll/select """
+        return self.fd
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Wait up to timeout secs (None = forever) for process to exit.
+        Returns True if process has exited.
+        """
+        if self.fd < 0:
+            return True
+
+        poller = select.poll()
+        poller.register(self.fd, select.POLLIN)
+        msecs = None if timeout is None else max(0, int(timeout * 1000))
+        return bool(poller.poll(msecs))
+
+    def is_alive(self) -> bool:
+        """
+        Cheap liveness check : non blocking poll of pidfd
+        """
+        if self.fd < 0:
+            return False
+        return not self.wait(0)
+
+    def send_signal(self, sig: int) -> bool:
+        """
+        Signal via pidfd - cannot hit some other process re-using pid
+        """
+        if self.fd < 0:
+            return False
+        try:
+            signal.pidfd_send_signal(self.fd, sig)
+        except (OSError, AttributeError):
+            return False
+        return True
+
+
+def pid_alive(pid: int) -> bool:
+    """
+    True if pid currently exists (and is not a zombie)
+     - no /proc read; pidfd_open fails with ESRCH if no such process
+     - if pidfd is unavailable fall back to kill(pid, 0)
+    """
+    if pid <= 0:
+        return False
+
+    try:
+        fd = os.pidfd_open(pid)
+    except ProcessLookupError:
+        return False
+    except (OSError, AttributeError):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    try:
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        return not poller.poll(0)
+    finally:
+        os.close(fd)
@@ -5,13 +5,20 @@ Support
 """
 # pylint: disable=consider-using-with
 import os
-from typing import (Any, Callable)
+from typing import (Any, Callable, TYPE_CHECKING)
 import signal
 from types import FrameType
 import subprocess
 from subprocess import PIPE
 
-from pyconcurrent import run_prog
+from wg_client.utils.lazy import lazy_import
+
+from .class_pidfd import PidFd
+
+if TYPE_CHECKING:
+    from .class_async_proc import MyAsyncProc
+
+pyconcurrent = lazy_import('pyconcurrent')
 
 
 def is_pid_valid(pid: int) -> bool:
@@ -48,12 +55,30 @@ def signal_catcher(sighandler: Callable[[int, FrameType | None], Any | None]):
         try:
             signum = getattr(signal, sig)
             signal.signal(signum, sighandler)
-        except OSError:
+        except (OSError, ValueError):
+            # ValueError : not main thread (e.g. daemon worker) - main thread handler stays
             # skip any that cannot be caught in case user messes up above :)
             # print (f'Skipping {sig}')
             pass
 
 
+def _read_into(fd: int, buf: list[bytes]) -> bool:
+    """
+    Read available data from non-blocking fd into buf
+    Returns False on eof
+    """
+    while True:
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        if not data:
+            return False
+        buf.append(data)
+
+
 class MySignals:
     """
     Handle signals once and share with each process handler
@@ -66,7 +91,11 @@ class MySignals:
         signal_catcher(self.signal_handler)
 
     def signal_handler(self, _signum, _frame):
-        """ kill child proc """
+        """
+        kill child proc
+         - Popen or MyAsyncProc : the latter signals via pidfd, as its
+           asyncio Process may belong to another thread's loop
+        """
         for proc in self.procs:
             if not proc.returncode:
                 proc.terminate()
@@ -87,69 +116,187 @@ class MySignals:
             self.procs.remove(proc)
 
 
+def _run_coro(coro):
+    """
+    Run coroutine to completion from sync code
+     - called from an event loop callback : run it on its own loop in a thread
+     - asyncio only loaded here : options that never run a child do not pay for it
+    """
+    # pylint: disable=import-outside-toplevel
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
 class MyProc:
     """
     Handle popen()
      - only have one MyProc() to have one signal handler
      - takes the instance of MySignals
+     - popen() blocks : it runs MyAsyncProc.popen() on its own event loop
+     - spawn() / read_pipe() / reap() : caller waits (e.g. on its event loop)
     """
     def __init__(self, mysignals):
         self.proc = None
+        self.pidfd: PidFd | None = None
         self.mysignals = mysignals
+        self.aproc: MyAsyncProc | None = None
+        self._bufs: dict[int, list[bytes]] = {}
+        self._err_fd: int = -1
+        self._on_stderr: Callable[[str], None] | None = None
+
+    def is_running(self) -> bool:
+        """
+        Is our child still running - pidfd poll, no /proc access
+        """
+        if self.aproc is not None:
+            return self.aproc.is_running()
+        if self.pidfd is None:
+            return False
+        return self.pidfd.is_alive()
+
+    def terminate(self) -> bool:
+        """
+        SIGTERM our child (via pidfd so never some other process)
+        Returns True if signal was sent
+        """
+        if self.aproc is not None:
+            return self.aproc.terminate()
+        if self.pidfd is None or not self.pidfd.okay:
+            if self.proc is None or self.proc.returncode is not None:
+                return False
+            self.proc.terminate()
+            return True
+        return self.pidfd.send_signal(signal.SIGTERM)
 
-    def popen(self, pargs, logger=None, pid_saver=None):
+    def spawn(self, pargs: list[str], logger: Callable[[str], None] | None = None,
+              pid_saver: Callable[[int], None] | None = None,
+              on_stderr: Callable[[str], None] | None = None) -> bool:
         """
-        run using subprocess.Popen()
+        Start child without waiting for it
+         - output pipes are non-blocking; read_pipe() collects what is there
+         - on_stderr is given stderr as it arrives (not only after exit)
+         - once pidfd is readable the child has exited : call reap()
+        Returns False if it could not be started
         """
-        log = print
-        if logger:
-            log = logger
-        outs = None
-        errs = None
-        ret = None
+        log = logger if logger else print
+        self.aproc = None
+        self._bufs = {}
+        self._on_stderr = on_stderr
+        self._err_fd = -1
         try:
             self.proc = subprocess.Popen(pargs, text=True, stdout=PIPE, stderr=PIPE)
-            if not self.proc:
-                return (ret, outs, errs)
+        except OSError as err:
+            cmd = ' '.join(pargs)
+            log(f'Error starting {cmd} : {err}')
+            self.proc = None
+            return False
 
-            self.mysignals.add_proc(self.proc)
+        self.pidfd = PidFd(self.proc.pid)
+        self.mysignals.add_proc(self.proc)
+        for pipe in (self.proc.stdout, self.proc.stderr):
+            if pipe is not None:
+                os.set_blocking(pipe.fileno(), False)
+                self._bufs[pipe.fileno()] = []
+        if self.proc.stderr is not None:
+            self._err_fd = self.proc.stderr.fileno()
 
-            # pid if requested
-            if pid_saver:
-                pid_saver(self.proc.pid)
+        # pid if requested
+        if pid_saver:
+            pid_saver(self.proc.pid)
+        return True
 
-            # flush any output
-            try:
-                outs, errs = self.proc.communicate()
-                if outs:
-                    log(outs)
-                if errs:
-                    log(errs)
+    def pipe_fds(self) -> list[int]:
+        """ stdout, stderr of running child (for poll or event loop) """
+        return list(self._bufs)
 
-            except OSError:
-                if not self.proc.returncode:
-                    self.proc.terminate()
-                    self.proc.kill()
+    def read_pipe(self, fd: int) -> bool:
+        """
+        Collect available output on fd.
+        Returns False on eof
+        """
+        buf = self._bufs[fd]
+        start = len(buf)
+        more = _read_into(fd, buf)
+        if fd == self._err_fd and self._on_stderr and len(buf) > start:
+            self._on_stderr(b''.join(buf[start:]).decode(errors='replace'))
+        return more
 
-        except OSError as err:
-            cmd = ' '.join(pargs)
-            log(f'Error starting {cmd} : {err}')
+    def reap(self, logger: Callable[[str], None] | None = None,
+             pid_saver: Callable[[int], None] | None = None) -> tuple[int | None, str, str]:
+        """
+        Child has exited (pidfd readable) : collect rest of output and
+        its exit status.
+        Returns (returncode, stdout, stderr)
+        """
+        log = logger if logger else print
+        if self.proc is None:
+            return (None, '', '')
+
+        # drain whatever is left in pipes
+        for fd in list(self._bufs):
+            self.read_pipe(fd)
+
+        self.proc.wait()
+        out = self.proc.stdout
+        err = self.proc.stderr
+        outs = b''.join(self._bufs[out.fileno()]).decode(errors='replace') if out else ''
+        errs = b''.join(self._bufs[err.fileno()]).decode(errors='replace') if err else ''
+        for pipe in (out, err):
+            if pipe is not None:
+                pipe.close()
+        self._bufs = {}
+        self._on_stderr = None
+        if outs:
+            log(outs)
+        if errs:
+            log(errs)
+
+        if self.pidfd is not None:
+            self.pidfd.close()
+        self.mysignals.remove_proc(self.proc)
+        # when killed ret = 255 (= 128 + signal-127)
 
-        if self.proc:
-            self.mysignals.remove_proc(self.proc)
-            ret = self.proc.returncode
-            # when killed ret = 255 (= 128 + signal-127)
-            # if ret != 0:
-            #     cmd = ' '.join(pargs)
-            #     print(f'Err: failed to run {cmd} : {ret}')
         # clear the child process pid
         if pid_saver:
-            pid_saver('-1')
-        return (ret, outs, errs)
+            pid_saver(-1)
+        return (self.proc.returncode, outs, errs)
+
+    def cancel(self):
+        """
+        End a popen() in progress (from another thread or signal handler)
+         - child is terminated, killed if it does not exit
+        """
+        if self.aproc is not None:
+            self.aproc.cancel()
+
+    def popen(self, pargs, logger=None, pid_saver=None,
+              on_stderr=None, on_stdout=None, timeout=None):
+        """
+        run pargs and wait for it to finish
+         - on_stderr, on_stdout : given each line as it arrives
+         - timeout : secs until child is ended (None is no limit)
+        Returns (returncode, stdout, stderr)
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        # pylint: disable=import-outside-toplevel
+        from .class_async_proc import MyAsyncProc
+
+        self.aproc = MyAsyncProc(self.mysignals)
+        coro = self.aproc.popen(pargs, logger=logger, pid_saver=pid_saver,
+                                on_stdout=on_stdout, on_stderr=on_stderr, timeout=timeout)
+        return _run_coro(coro)
 
     def run(self, pargs):
         """
         uses subprocess.run()
         """
-        (retc, output, errors) = run_prog(pargs)
+        (retc, output, errors) = pyconcurrent.run_prog(pargs)
         return [retc, output, errors]
@@ -0,0 +1,139 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Snapshot of process table
+ - one pass over /proc (no fork, no psutil)
+ - used when several process checks are needed at once (status)
+"""
+import os
+import pwd
+
+
+def user_uid(user: str = '') -> int:
+    """
+    uid of user (or of process owner if no user given)
+    Returns -1 if unknown user
+    """
+    if not user:
+        return os.geteuid()
+    try:
+        return pwd.getpwnam(user).pw_uid
+    except KeyError:
+        return -1
+
+
+def _read_cmdline(pid_dir: str) -> list[str]:
+    """
+    /proc/<pid>/cmdline is nul separated list of args
+    kernel threads have empty cmdline
+    """
+    try:
+        with open(os.path.join(pid_dir, 'cmdline'), 'rb') as fobj:
+            data = fobj.read()
+    except OSError:
+        return []
+
+    if not data:
+        return []
+    return data.rstrip(b'\0').decode(errors='replace').split('\0')
+
+
+def _read_uid(pid_dir: str) -> int:
+    """
+    Real uid from /proc/<pid>/status.
+    NB owner of /proc/<pid> itself is root for non-dumpable processes (ssh)
+    so it cannot be used.
+    """
+    try:
+        with open(os.path.join(pid_dir, 'status'), 'rb') as fobj:
+            for line in fobj:
+                if line.startswith(b'Uid:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return -1
+
+
+class ProcTable:
+    """
+    pid -> cmdline for every visible process
+     - uid is only read for processes we actually check (and then cached)
+    """
+    def __init__(self, proc_dir: str = '/proc'):
+        self.proc_dir: str = proc_dir
+        self.cmdlines: dict[int, list[str]] = {}
+        self.uids: dict[int, int] = {}
+        self.sig_index: dict[tuple[int, str], list[int]] = {}
+        self.scan()
+
+    def scan(self):
+        """
+        Walk /proc once
+        """
+        self.cmdlines = {}
+        self.uids = {}
+        self.sig_index = {}
+        try:
+            entries = os.scandir(self.proc_dir)
+        except OSError:
+            return
+
+        with entries:
+            for entry in entries:
+                if not entry.name.isdigit():
+                    continue
+                cmdline = _read_cmdline(entry.path)
+                if cmdline:
+                    self.cmdlines[int(entry.name)] = cmdline
+
+    def add(self, pid: int, uid: int, cmdline: list[str]):
+        """
+        Add one entry (lets tools build synthetic tables)
+        """
+        self.cmdlines[pid] = cmdline
+        self.uids[pid] = uid
+
+    def uid(self, pid: int) -> int:
+        """
+        real uid of pid (-1 if gone)
+        """
+        if pid not in self.uids:
+            self.uids[pid] = _read_uid(os.path.join(self.proc_dir, str(pid)))
+        return self.uids[pid]
+
+    def check(self, pid: int, pargs: list[str] | None = None, user: str = '') -> bool:
+        """
+        Same semantics as is_pid_running() but from the snapshot
+          - pid must exist and be owned by user (process owner if no user)
+          - every element of pargs must be in process cmdline
+        """
+        if pid <= 1 or pid not in self.cmdlines:
+            return False
+
+        if pargs is not None and pargs and pargs[0]:
+            if not set(pargs).issubset(self.cmdlines[pid]):
+                return False
+
+        return self.uid(pid) == user_uid(user)
+
+    def index(self, signatures: dict[str, list[str]]):
+        """
+        Build (uid, signature) -> [pids] index.
+          signatures: name -> args that must all be in cmdline
+        One pass over the snapshot; uid is only read for matching processes.
+        After this, per user checks via find() are O(1).
+        """
+        self.sig_index = {}
+        sig_sets = [(name, set(pargs)) for (name, pargs) in signatures.items()]
+        for (pid, cmdline) in self.cmdlines.items():
+            cmd_set = set(cmdline)
+            for (name, pargs_set) in sig_sets:
+                if pargs_set.issubset(cmd_set):
+                    key = (self.uid(pid), name)
+                    self.sig_index.setdefault(key, []).append(pid)
+
+    def find(self, uid: int, signature: str) -> list[int]:
+        """
+        pids owned by uid matching signature (needs index())
+        """
+        return self.sig_index.get((uid, signature), [])
@@ -5,12 +5,19 @@ App stuff
 """
 import os
 import signal
-from typing import Iterable
-import psutil
+from typing import (Iterable, TYPE_CHECKING)
 
 from wg_client.utils import open_file
+from wg_client.utils.lazy import lazy_import
 
 from .users import process_owner
+from .proc_table import ProcTable
+from .class_pidfd import (PidFd, pid_alive)
+
+if TYPE_CHECKING:
+    import psutil
+else:
+    psutil = lazy_import('psutil')
 
 
 def all_in(col1: Iterable, col2: Iterable):
@@ -22,7 +29,8 @@ def all_in(col1: Iterable, col2: Iterable):
     return s_col1.intersection(s_col2) == s_col1
 
 
-def _get_process(pid: int, pargs: list[str] | None = None, user: str = '') -> psutil.Process | None:
+def _get_process(pid: int, pargs: list[str] | None = None,
+                 user: str = '') -> 'psutil.Process | None':
     """
     Return psutil.process for given (pid, pargs, user)
     or None if not found
@@ -163,8 +171,9 @@ def write_pidfile(pid: int, fpath: str):
     """
     write
      - caller ensures basedir exists
+     - pid -1 marks that the process has exited
     """
-    if pid <= 1:
+    if pid <= 1 and pid != -1:
         return
 
     contents = str(pid)
@@ -182,15 +191,24 @@ def read_pid(tag: str, user: str = '') -> int:
     return pid
 
 
-def check_pid(pid: int, pargs: list[str], user: str = '') -> bool:
+def check_pid(pid: int, pargs: list[str], user: str = '',
+              procs: ProcTable | None = None) -> bool:
     """
     Check pid is valid
      - we write pid = -1 when child process terminates cleanly
      - root permitted to read pidfile
+     - procs: use process table snapshot instead of querying psutil
     """
     if pid <= 1:
         return False
 
+    if procs is not None:
+        return procs.check(pid, pargs=pargs, user=user)
+
+    # cheap pidfd probe - only look closer at live processes
+    if not pid_alive(pid):
+        return False
+
     pid_is_valid = is_pid_running(pid, pargs=pargs, user=user)
     return pid_is_valid
 
@@ -206,12 +224,32 @@ def write_pid(pid: int, tag: str) -> None:
     write_pidfile(pid, pidfile)
 
 
+def signal_program(pid: int, pargs: list[str], sig: int) -> bool:
+    """
+    Send sig to process with pid and program given by pargs
+     - check its valid
+     - only owner allowed to signal
+    Returns True if signal was sent
+    """
+    with PidFd(pid) as pidfd:
+        # pidfd taken before checking - so signal cannot go to a process re-using pid
+        pid_is_valid = is_pid_running(pid, pargs=pargs)
+        if not pid_is_valid:
+            return False
+
+        if pidfd.okay:
+            return pidfd.send_signal(sig)
+        try:
+            os.kill(pid, sig)
+        except OSError:
+            return False
+    return True
+
+
 def kill_program(pid: int, pargs: list[str]) -> None:
     """
     kill processs with pid and program given by pargs
      - check its valid
      - only owner allowed to kill
     """
-    pid_is_valid = is_pid_running(pid, pargs=pargs)
-    if pid_is_valid:
-        os.kill(pid, signal.SIGKILL)
+    signal_program(pid, pargs, signal.SIGKILL)
@@ -2,27 +2,72 @@
 # SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
 """
 Who is logged in
+ - read from utmp, as /usr/bin/users does, without running it
+ - no utmp (some systemd only systems) : users logind has sessions for
 """
 import os
 import pwd
-from pyconcurrent import run_prog
+import struct
 
+UTMP_FILE = '/run/utmp'
+LOGIND_USERS = '/run/systemd/users'
 
-def who_logged_in(with_self: bool = True) -> list[str]:
+# struct utmp (glibc, same on 32 and 64 bit) : type, pid, line, id, user, ...
+_UTMP = struct.Struct('h2xi32s4s32s256s2hi2i4i20x')
+_USER_PROCESS = 7
+
+
+def _utmp_users(utmp_file: str) -> list[str] | None:
     """
-    Returns list of logged in users
+    Users with a login session in utmp
+    Returns None if utmp cannot be read
     """
+    try:
+        with open(utmp_file, 'rb') as fobj:
+            data = fobj.read()
+    except OSError:
+        return None
+
     users: list[str] = []
+    size = len(data) - len(data) % _UTMP.size
+    for fields in _UTMP.iter_unpack(data[:size]):
+        (ut_type, _pid, _line, _id, ut_user) = fields[:5]
+        if ut_type == _USER_PROCESS:
+            user = ut_user.split(b'\0', 1)[0].decode(errors='replace')
+            if user:
+                users.append(user)
+    return users
+
 
-    (retc, output, _errors) = run_prog(['/usr/bin/users'])
-    if retc != 0 or not output:
+def _logind_users(users_dir: str) -> list[str]:
+    """
+    logind keeps a file per uid with a session : /run/systemd/users/<uid>
+    """
+    users: list[str] = []
+    try:
+        uids = [int(name) for name in os.listdir(users_dir) if name.isdigit()]
+    except OSError:
         return users
 
-    # get list of unique users
-    users = output.split()
+    for uid in uids:
+        try:
+            users.append(pwd.getpwuid(uid).pw_name)
+        except KeyError:
+            pass
+    return users
+
+
+def who_logged_in(with_self: bool = True) -> list[str]:
+    """
+    Returns list of logged in users
+    """
+    users = _utmp_users(UTMP_FILE)
+    if users is None:
+        users = _logind_users(LOGIND_USERS)
     if not users:
-        return users
+        return []
 
+    # get list of unique users
     users_set = set(users)
     if not with_self:
         self_user = process_owner()
@@ -4,3 +4,4 @@
 Library
 """
 from .class_resolv import WgResolv
+from .class_resolv import RESOLV_SIGNATURE
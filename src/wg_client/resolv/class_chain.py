@@ -0,0 +1,139 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Watch resolv.conf through its symlink chain
+ - resolv.conf is often a link into /run/systemd/resolve or /run/NetworkManager
+   (possibly via more links). Resolvers replace the file at the end of the
+   chain, which a watch on /etc alone never sees
+ - every hop (link or final file) is watched by its directory entry
+   plus the final file itself (in place edits)
+ - when a hop changes only the chain from that hop on is re-resolved
+   and re-armed; directory watches are shared and cached
+"""
+import os
+
+from wg_client.utils import Inotify
+from wg_client.utils import class_inotify as ino
+
+# same limit as the kernel (ELOOP)
+MAX_HOPS = 40
+
+
+def get_events_mask() -> int:
+    """
+    Monitor all events on /etc/resolv.conf except for
+     - access and open
+    We are only interested in changes to the file
+    Dont really care about attribute changes either but we need to be sure
+    root can still adjust as needed so we check after attrib change just in case
+    """
+    events_remove = ino.IN_ACCESS | ino.IN_OPEN | ino.IN_CLOSE_NOWRITE
+    resolv_events = ino.IN_ALL_EVENTS & ~events_remove
+    return resolv_events
+
+
+def get_dir_events_mask() -> int:
+    """
+    Directory events for each hop of the chain
+     - entry replaced (rename over it), (re)created, removed or symlink swapped
+    """
+    return (ino.IN_MOVED_TO | ino.IN_MOVED_FROM | ino.IN_CREATE | ino.IN_DELETE
+            | ino.IN_CLOSE_WRITE | ino.IN_ONLYDIR)
+
+
+def resolve_chain(path: str, max_hops: int = MAX_HOPS) -> list[str]:
+    """
+    List of paths from path to the file it finally refers to
+     - each hop but the last is a symlink
+     - last may not exist (dangling link)
+    """
+    hops: list[str] = []
+    while len(hops) < max_hops:
+        hops.append(path)
+        try:
+            target = os.readlink(path)
+        except OSError:
+            # not a link (or missing) : end of chain
+            break
+        path = os.path.normpath(os.path.join(os.path.dirname(path), target))
+    return hops
+
+
+class ResolvChain:
+    """
+    inotify watches for path and every hop of its symlink chain
+     - hops[0] is path, hops[-1] the final file
+     - entries maps (dir wd, name) -> hop index
+    """
+    def __init__(self, inot: Inotify, path: str):
+        self.inot = inot
+        self.path: str = path
+        self.hops: list[str] = []
+        self.entries: dict[tuple[int, str], int] = {}
+        self.dir_wds: dict[str, int] = {}
+        self.file_wd: int = -1
+
+    def arm(self, start: int = 0) -> list[str]:
+        """
+        (Re)resolve chain from hop start and update watches
+        Returns the new chain
+        """
+        start = min(start, max(len(self.hops) - 1, 0))
+        from_path = self.hops[start] if self.hops else self.path
+        self.hops = self.hops[:start] + resolve_chain(from_path, MAX_HOPS - start)
+
+        # directory entries of each hop
+        self.entries = {key: idx for (key, idx) in self.entries.items() if idx < start}
+        for (idx, hop) in enumerate(self.hops[start:], start):
+            hop_dir = os.path.dirname(hop)
+            wd = self.dir_wds.get(hop_dir, -1)
+            if wd < 0 or wd not in self.inot.watches:
+                wd = self.inot.add_watch(hop_dir, get_dir_events_mask())
+                self.dir_wds[hop_dir] = wd
+            if wd >= 0:
+                self.entries[(wd, os.path.basename(hop))] = idx
+
+        # drop directories no longer in chain
+        in_use = {wd for (wd, _name) in self.entries}
+        for (hop_dir, wd) in list(self.dir_wds.items()):
+            if wd not in in_use:
+                if wd >= 0:
+                    self.inot.rm_watch(wd)
+                del self.dir_wds[hop_dir]
+
+        # the file itself - same inode gives same wd
+        file_wd = self.inot.add_watch(self.hops[-1], get_events_mask())
+        if self.file_wd >= 0 and file_wd != self.file_wd:
+            self.inot.rm_watch(self.file_wd)
+        self.file_wd = file_wd
+        return self.hops
+
+    def read_changes(self) -> int:
+        """
+        Read queued events and re-arm from the first hop that changed
+        Returns number of events for the chain
+         - directory events for other files are ignored
+        """
+        count = 0
+        rearm = len(self.hops)
+
+        for (wd, mask, _cookie, name) in self.inot.read_events():
+            if mask & ino.IN_Q_OVERFLOW:
+                count += 1
+                rearm = 0
+
+            elif wd == self.file_wd:
+                if mask & ino.IN_IGNORED:
+                    rearm = min(rearm, len(self.hops) - 1)
+                else:
+                    count += 1
+
+            elif (wd, name) in self.entries:
+                count += 1
+                rearm = min(rearm, self.entries[(wd, name)])
+
+        if self.file_wd not in self.inot.watches:
+            rearm = min(rearm, len(self.hops) - 1)
+        if rearm < len(self.hops):
+            self.arm(rearm)
+        return count
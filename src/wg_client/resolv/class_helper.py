@@ -0,0 +1,137 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Persistent wg-fix-resolv helper
+ - helper is started once in serve mode (wg-fix-resolv --serve)
+ - each repair is one request line on its stdin and one reply line on stdout
+ - avoids fork + exec + capability check for every resolv.conf change
+"""
+import os
+import select
+import subprocess
+from subprocess import PIPE
+from typing import Callable
+
+
+class FixResolvHelper:
+    """
+    Pipe to long running wg-fix-resolv
+     - okay is False once serve mode failed (e.g. older helper without
+       --serve); caller then uses one-shot mode
+     - if we exit, helper sees end of input on stdin and exits too
+     - helper that served before and then died is restarted on next request
+    """
+    def __init__(self, pargs: list[str], log: Callable[[str], None] = print,
+                 timeout: float = 10.0):
+        self.pargs: list[str] = pargs + ['--serve']
+        self.log = log
+        self.timeout: float = timeout
+        self.okay: bool = True
+        self.proc: subprocess.Popen | None = None
+        self.served: int = 0
+        self._out: bytes = b''
+
+    def start(self) -> bool:
+        """ start helper if not running """
+        if self.proc is not None and self.proc.poll() is None:
+            return True
+        self.close()
+
+        try:
+            self.proc = subprocess.Popen(self.pargs, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        except OSError as err:
+            self.log(f' helper: failed to start {self.pargs[0]} : {err}')
+            self.okay = False
+            return False
+
+        for pipe in (self.proc.stdout, self.proc.stderr):
+            if pipe is not None:
+                os.set_blocking(pipe.fileno(), False)
+        self._out = b''
+        return True
+
+    def close(self):
+        """ ask helper to exit (quit or end of input) """
+        if self.proc is None:
+            return
+        proc = self.proc
+        self.proc = None
+        try:
+            if proc.stdin:
+                proc.stdin.close()
+            proc.wait(timeout=self.timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+            proc.wait()
+        for pipe in (proc.stdout, proc.stderr):
+            if pipe is not None:
+                pipe.close()
+
+    def _log_stderr(self):
+        """ helper messages go to stderr - pass them to our log """
+        if self.proc is None or self.proc.stderr is None:
+            return
+        try:
+            data = self.proc.stderr.read()
+        except OSError:
+            return
+        if data:
+            for line in data.decode(errors='replace').splitlines():
+                self.log(f' helper: {line}')
+
+    def _read_reply(self) -> str | None:
+        """
+        One reply line from stdout or None on timeout / exit
+        """
+        if self.proc is None or self.proc.stdout is None:
+            return None
+        fd = self.proc.stdout.fileno()
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+
+        while b'\n' not in self._out:
+            if not poller.poll(int(self.timeout * 1000)):
+                return None
+            try:
+                data = os.read(fd, 4096)
+            except BlockingIOError:
+                continue
+            except OSError:
+                return None
+            if not data:
+                return None
+            self._out += data
+
+        (line, self._out) = self._out.split(b'\n', 1)
+        return line.decode(errors='replace')
+
+    def request(self, cmd: str = 'repair') -> str | None:
+        """
+        Send request and return reply (e.g. 'ok same', 'ok updated').
+        Returns None if helper could not handle it
+        (caller should fall back to one-shot run)
+        """
+        if not self.okay or not self.start() or self.proc is None or self.proc.stdin is None:
+            return None
+
+        try:
+            self.proc.stdin.write(cmd.encode() + b'\n')
+            self.proc.stdin.flush()
+        except OSError:
+            reply = None
+        else:
+            reply = self._read_reply()
+        self._log_stderr()
+
+        if reply is None or not reply.startswith(('ok', 'err')):
+            self.close()
+            if self.served:
+                self.log(' helper: exited - restart on next request')
+            else:
+                # older helper without serve mode : dont try again
+                self.log(f' helper: serve mode unavailable (reply: {reply})')
+                self.okay = False
+            return None
+
+        self.served += 1
+        return reply
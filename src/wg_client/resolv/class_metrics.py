@@ -0,0 +1,122 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Resolv monitor metrics
+ - counters for events, bursts, helper runs, no-op and real repairs
+   and for content checks after network changes
+ - histogram of latency from first event to completed restore
+ - saved as json status file next to the monitor pid file
+   so wg-client (or anything else) can read it
+"""
+import os
+import json
+import time
+from typing import Any
+
+# histogram bucket upper bounds (ms) - last bucket is everything larger
+LATENCY_BUCKETS_MS = (50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def read_metrics(path: str) -> dict[str, Any]:
+    """ metrics saved by a resolv monitor ({} if none) """
+    try:
+        with open(path, 'r', encoding='utf-8') as fobj:
+            data = json.load(fobj)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+class ResolvMetrics:
+    """
+    Counters and latency histogram for one resolv monitor
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, path: str = ''):
+        self.path: str = path
+        self.started: float = time.time()
+        self.events: int = 0
+        self.bursts: int = 0
+        self.helper_runs: int = 0
+        self.noop_repairs: int = 0
+        self.restores: int = 0
+        self.errors: int = 0
+        self.net_events: int = 0
+        self.net_checks: int = 0
+        self.net_repairs: int = 0
+        self.latency_hist: list[int] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latency_sum_ms: float = 0.0
+        self.latency_max_ms: float = 0.0
+
+    def add_burst(self, events: int):
+        """ one coalesced burst of events """
+        self.bursts += 1
+        self.events += events
+
+    def add_repair(self, result: str, latency_ms: float):
+        """
+        result of a burst:
+         - 'noop'    : resolv.conf already correct (in process check or helper)
+         - 'restore' : resolv.conf was restored (latency is recorded)
+         - 'error'   : helper failed
+        """
+        match result:
+            case 'noop':
+                self.noop_repairs += 1
+            case 'restore':
+                self.restores += 1
+                self.add_latency(latency_ms)
+            case _:
+                self.errors += 1
+
+    def add_latency(self, latency_ms: float):
+        """ event to restore time """
+        for (idx, bound) in enumerate(LATENCY_BUCKETS_MS):
+            if latency_ms <= bound:
+                break
+        else:
+            idx = len(LATENCY_BUCKETS_MS)
+        self.latency_hist[idx] += 1
+        self.latency_sum_ms += latency_ms
+        self.latency_max_ms = max(self.latency_max_ms, latency_ms)
+
+    def as_dict(self) -> dict[str, Any]:
+        """ metrics for status file """
+        buckets = [f'<={bound}' for bound in LATENCY_BUCKETS_MS]
+        buckets.append(f'>{LATENCY_BUCKETS_MS[-1]}')
+        avg = self.latency_sum_ms / self.restores if self.restores else 0.0
+        return {
+                'pid': os.getpid(),
+                'started': round(self.started),
+                'updated': round(time.time()),
+                'events': self.events,
+                'bursts': self.bursts,
+                'helper_runs': self.helper_runs,
+                'noop_repairs': self.noop_repairs,
+                'restores': self.restores,
+                'errors': self.errors,
+                'net_events': self.net_events,
+                'net_checks': self.net_checks,
+                'net_repairs': self.net_repairs,
+                'latency_ms': {
+                    'avg': round(avg, 1),
+                    'max': round(self.latency_max_ms, 1),
+                    'hist': dict(zip(buckets, self.latency_hist)),
+                    },
+                }
+
+    def save(self) -> bool:
+        """
+        Write status file (atomic replace so readers never see partial file)
+        """
+        if not self.path:
+            return False
+        tmp = f'{self.path}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as fobj:
+                json.dump(self.as_dict(), fobj)
+            os.replace(tmp, self.path)
+        except OSError:
+            return False
+        return True
@@ -8,29 +8,30 @@ Ensure that nothing overwrites the wireguard resolv.conf
 import os
 import sys
 import time
-from pynotify import Inotify
-from pynotify import InotifyMask as mask
+import select
+from typing import Any
 
 from wg_client.proc import (MyProc, MySignals)
 from wg_client.proc import (kill_program, read_pid, write_pid, check_pid)
+from wg_client.proc import signal_program
+from wg_client.proc import ProcTable
+from wg_client.proc.state import get_appdir
 from wg_client.utils import MyLog
+from wg_client.utils import Inotify
+from wg_client.net import NetWatch
+from wg_client.supervisor.consts import (SUPERVISOR_SIGNATURE, SIG_STOP_RESOLV)
 
+from .fingerprint import (Fingerprint, file_fingerprint, same_content)
+from .class_helper import FixResolvHelper
+from .class_metrics import (ResolvMetrics, read_metrics)
+from .class_chain import ResolvChain
 
-# for tests only
-# from .resolv import restore_resolv
 
+# args of every resolv monitor - identifies them in a process table
+RESOLV_SIGNATURE = ['--fix-dns-auto-start']
 
-def get_events_mask() -> int:
-    """
-    Monitor all events on /etc/resolv.conf except for
-     - access and open
-    We are only interested in changes to the file
-    Dont really care about attribute changes either but we need to be sure
-    root can still adjust as needed so we check after attrib change just in case
-    """
-    events_remove = mask.IN_ACCESS | mask.IN_OPEN | mask.IN_CLOSE_NOWRITE
-    resolv_events = mask.IN_ALL_EVENTS - events_remove
-    return resolv_events
+# for tests only
+# from .resolv import restore_resolv
 
 
 class WgResolv():
@@ -40,15 +41,41 @@ class WgResolv():
        it can overwrite resolv.conf
      - tool to monitor and restore the wireguard config kept in /etc/resolv.conf.wg
     """
-    def __init__(self):
+    def __init__(self, quiet_ms: int = 200, max_ms: int = 1000, net_ms: int = 500):
         self.okay: bool = True
         self.resolv: str = '/etc/resolv.conf'
         self.resolv_wg: str = '/etc/resolv.conf.wg'
         self.pid: int = os.getpid()
         self.pidfile_tag: str = 'wg-resolv-monitor'
 
-        self.mysignals = None
-        self.run_proc = None
+        # made on first runit() : its signal handler then replaces the caller's
+        self.mysignals: MySignals | None = None
+        self.run_proc: MyProc | None = None
+
+        # event coalescing : repair once file is quiet (or max latency reached)
+        self.quiet_time: float = quiet_ms / 1000
+        self.max_latency: float = max(quiet_ms, max_ms) / 1000
+        self.last_burst: int = 0
+        self.last_latency_ms: float = 0.0
+
+        # content check after link / route changes : at most one per net_check_time
+        # (first one at once, trailing one at end of interval)
+        self.net_check_time: float = net_ms / 1000
+        self.net_due: float | None = None
+        self.net_first: float = 0.0
+        self.net_last: float = 0.0
+
+        # cached fingerprint of resolv.conf.wg (only re-read when it changes)
+        self.wg_fingerprint: Fingerprint | None = None
+
+        # watches on resolv.conf symlink chain (monitor only)
+        self.chain: ResolvChain | None = None
+
+        # long running wg-fix-resolv (started on first repair)
+        self.helper: FixResolvHelper | None = None
+
+        # counters / latency : saved to status file by monitor
+        self.metrics: ResolvMetrics = ResolvMetrics(self.metrics_file())
 
         # use separate log file
         self.logger = MyLog('wg-mon-resolv')
@@ -78,14 +105,48 @@ class WgResolv():
     #         self.okay = False
     #     return self.okay
 
-    def runit(self, pargs):
+    def runit(self, pargs) -> tuple[int | None, str]:
         """
         run a program via subprocess.run
+        Returns (returncode, stdout)
         """
         self.log(f' Running : {pargs}')
-        self.mysignals = MySignals()
-        self.run_proc = MyProc(self.mysignals)
-        (_ret, _outs, _errs) = self.run_proc.popen(pargs, logger=self.log, pid_saver=None)
+        if self.run_proc is None:
+            self.mysignals = MySignals()
+            self.run_proc = MyProc(self.mysignals)
+        (ret, outs, _errs) = self.run_proc.popen(pargs, logger=self.log, pid_saver=None)
+        return (ret, outs or '')
+
+    def repair(self, pargs: list[str]) -> str:
+        """
+        Restore resolv.conf
+         - request to persistent helper if possible
+         - otherwise one-shot run of helper
+        Returns 'restore', 'noop' or 'error'
+        """
+        if self.helper is None:
+            self.helper = FixResolvHelper(pargs, log=self.log)
+        self.metrics.helper_runs += 1
+
+        reply = self.helper.request('repair')
+        if reply is None:
+            (ret, outs) = self.runit(pargs)
+            if ret != 0:
+                return 'error'
+            return 'restore' if ('Updating' in outs or 'Restoring' in outs) else 'noop'
+
+        self.log(f' repair: {reply}')
+        if reply.startswith('ok'):
+            return 'noop' if reply == 'ok same' else 'restore'
+        return 'error'
+
+    def metrics_file(self, user: str = '') -> str:
+        """ monitor status file (json) """
+        return os.path.join(get_appdir(user), f'{self.pidfile_tag}.json')
+
+    def read_metrics(self, user: str = '') -> dict[str, Any]:
+        """ metrics of running (or last) monitor for user """
+        return read_metrics(self.metrics_file(user))
 
     def pidfile(self) -> str:
         """ return the basenme of pid file """
@@ -95,59 +156,197 @@ class WgResolv():
         """ save pid to pidfile """
         write_pid(self.pid, self.pidfile_tag)
 
+    def clear_pidfile(self):
+        """ monitor stopped but process carries on """
+        write_pid(-1, self.pidfile_tag)
+
     def read_pidfile(self, user: str = '') -> int:
         """ save pid to pidfile """
         pid = read_pid(self.pidfile_tag, user=user)
         return pid
 
-    def check_already_running(self, user: str = '') -> bool:
+    def check_already_running(self, user: str = '', procs: ProcTable | None = None) -> bool:
         """
         Check if monitor already running by this user.
         If no user given then user is process owner.
         Only root can query other users
+        procs: optional process table snapshot
         """
         pid = read_pid(self.pidfile_tag, user=user)
-        pargs = ['--fix-dns-auto-start']
-        pid_valid = check_pid(pid, pargs, user=user)
+        pargs = RESOLV_SIGNATURE
+        pid_valid = check_pid(pid, pargs, user=user, procs=procs)
 
         return pid_valid
 
     def kill_monitor(self):
         """
         kill any running resol monitor process
+         - monitor hosted by a supervisor : only ask it to stop the monitor
         """
         pid = self.read_pidfile()
+        if signal_program(pid, SUPERVISOR_SIGNATURE, SIG_STOP_RESOLV):
+            return
         pargs = sys.argv
         pargs = ['--fix-dns-auto-start']
         kill_program(pid, pargs)
 
-    def _wait_for_events(self, inot: Inotify):
-        """ returns when itnotify tells us file event occurred """
-        try:
-            for events in inot.get_events():
-                num = len(events)
-                self.log(f' num file events: {num}')
-                return
+    def resolv_is_wg(self) -> bool:
+        """
+        True if resolv.conf content already matches resolv.conf.wg
+         - wg version fingerprint is cached and re-read only if its stat changes
+         - resolv.conf is small and is always read (no trusting mtime)
+        Any read problem returns False so the helper gets to deal with it.
+        """
+        self.wg_fingerprint = file_fingerprint(self.resolv_wg, self.wg_fingerprint)
+        if self.wg_fingerprint is None:
+            return False
+        return same_content(file_fingerprint(self.resolv), self.wg_fingerprint)
+
+    def read_changes(self) -> int:
+        """
+        Read queued events.
+        Returns number of events for resolv.conf (or any hop of its symlink chain)
+        """
+        if self.chain is None:
+            return 0
+        hops = self.chain.hops
+        count = self.chain.read_changes()
+        if self.chain.hops != hops:
+            self.log(f' watching {" -> ".join(self.chain.hops)}')
+        return count
+
+    def _wait_for_burst(self, inot: Inotify, netw: NetWatch | None = None) -> tuple[int, float]:
+        """
+        Wait for a change then coalesce the burst that usually follows
+        (create, write, chmod, rename ...)
+         - done once no event for quiet_time, or max_latency after first event
+         - network changes (netw) schedule a content check (see net_changed)
+        Returns (burst size, time of first event)
+        burst is 0 if there was no file change but the content check is due
+        """
+        poller = select.poll()
+        poller.register(inot.fileno(), select.POLLIN)
+        if netw is not None and netw.okay:
+            poller.register(netw.fileno(), select.POLLIN)
 
-        except (IOError, KeyboardInterrupt) as exc:
-            self.log(f'Exception : {exc}')
-            # inot.rm_watch(self.resolv)
-            sys.exit()
+        burst = 0
+        first = 0.0
+        while True:
+            timeout = None
+            if burst:
+                timeout = min(self.quiet_time, first + self.max_latency - time.monotonic())
+            elif self.net_due is not None:
+                timeout = self.net_due - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                break
+
+            msecs = None if timeout is None else 1000 * timeout
+            ready = [fd for (fd, _event) in poller.poll(msecs)]
+            if not ready:
+                # quiet (or net check due)
+                break
+
+            if netw is not None and netw.fileno() in ready:
+                self.net_changed(netw.read_changes())
+
+            if inot.fileno() in ready:
+                count = self.read_changes()
+                if count and not burst:
+                    first = time.monotonic()
+                burst += count
+
+        return (burst, first)
+
+    def open_watch(self, inot: Inotify):
+        """
+        Watch resolv.conf and every hop of its symlink chain
+        (see ResolvChain)
+        """
+        self.chain = ResolvChain(inot, self.resolv)
+        self.chain.arm()
+        self.log(f' watching {" -> ".join(self.chain.hops)}')
+
+    def handle_burst(self, pargs: list[str], burst: int, first: float):
+        """
+        One coalesced burst of changes : repair resolv.conf if needed
+        and update metrics
+         - first is (monotonic) time of first event in burst
+        """
+        self.log(f' File change detected {self.resolv}')
+        self.metrics.add_burst(burst)
+
+        # our own repair, attribute change or rewrite with same content
+        if self.resolv_is_wg():
+            self.log(f' {self.resolv} matches wg version: no repair needed')
+            self.metrics.add_repair('noop', 0.0)
+            self.metrics.save()
+            return
+        self._restore(pargs, burst, first)
+
+    def net_changed(self, count: int):
+        """
+        Link or route changed : schedule a content check
+         - rate limited : due now if none done recently,
+           otherwise at end of current interval
+        """
+        if not count:
+            return
+        now = time.monotonic()
+        self.metrics.net_events += count
+        if self.net_due is None:
+            self.net_first = now
+            self.net_due = max(now, self.net_last + self.net_check_time)
+
+    def net_check(self, pargs: list[str]):
+        """
+        Cheap check after network change (fingerprint compare, no helper)
+        Catches a rewrite inotify missed or raced with a re-armed watch.
+        """
+        self.net_due = None
+        self.net_last = time.monotonic()
+        self.metrics.net_checks += 1
+        if self.resolv_is_wg():
+            return
+
+        self.log(f' {self.resolv} changed : found after network change')
+        self.metrics.net_repairs += 1
+        self._restore(pargs, 0, self.net_first)
+
+    def _restore(self, pargs: list[str], burst: int, first: float):
+        """ repair and record result """
+        result = self.repair(pargs)
+
+        self.last_burst = burst
+        self.last_latency_ms = 1000 * (time.monotonic() - first)
+        self.log(f' repair {result}: {burst} events, {self.last_latency_ms:.0f} ms')
+        self.metrics.add_repair(result, self.last_latency_ms)
+        self.metrics.save()
+
+    def close(self):
+        """ stop persistent helper """
+        if self.helper is not None:
+            self.helper.close()
 
     def monitor_resolv(self):
         """
         Monitor /etc/resolv.conf for any changes and call
         /usr/lib/wg-client/wg-fix-resolv to restore resolv.conf from .conf.wg
-        wg-fix-resolv checks for file change so we dont need to.
+        wg-fix-resolv is only run if resolv.conf content differs from the wg version.
         wg vpn version.
         NB this stays running until killed
-         - must always start new inotify watch in case inode changes
-         - file may be replaced and inode changes
-         - file may be editied and can change or not
-         - file may be symlink (inotify follows synlinks by default)
-         - what is optimal inotify mask?
-           - simplest is to trigger on any event and fix-resolv will
-             do the right thing. Simple is good
+         - one inotify instance for the life of the monitor; events queue
+           in the kernel while the fixer runs so none are lost
+         - watch the directory entry (file replaced, inode changes or symlink swapped)
+           plus the file itself (edited in place, inode unchanged)
+         - file may be symlink (e.g. into /run/systemd/resolve) : every hop of
+           the chain is watched the same way (see ResolvChain)
+         - simplest is to trigger on any event and fix-resolv will
+           do the right thing. Simple is good
+           Our own repair shows up as one more event; the in process
+           fingerprint compare then skips running fix-resolv.
+         - bursts of events are coalesced into one repair (see _wait_for_burst)
+         - link and route changes trigger a rate limited content check
+           (resume, wifi roam, dhcp renew are when resolv.conf gets rewritten)
         """
         #
         # Make sure only 1 copy running
@@ -161,23 +360,28 @@ class WgResolv():
         self.save_pidfile()
 
         pargs = self.fix_resolv_cmd()
-        events_mask = get_events_mask()
 
-        while True:
-            #
-            # we *must* always create fresh watch
-            #
-            inot = Inotify()
-            inot.add_watch(self.resolv, mask=events_mask)
-            inot.timeout = -1               # wait forever
-
-            self._wait_for_events(inot)
-            inot.rm_watch(self.resolv)
-
-            self.log(f' File change detected {self.resolv}')
-
-            pargs = ['/usr/lib/wg-client/wg-fix-resolv']
-            time.sleep(0.2)
-            self.runit(pargs)
-            # time.sleep(0.2)
-            # inot.add_watch(self.resolv, mask=events_mask)
+        with Inotify() as inot:
+            if not inot.okay:
+                self.log(' inotify unavailable - cannot monitor')
+                return
+
+            self.open_watch(inot)
+
+            netw = NetWatch()
+            if not netw.okay:
+                self.log(' netlink unavailable - file events only')
+
+            self.metrics.save()
+            try:
+                while True:
+                    (burst, first) = self._wait_for_burst(inot, netw)
+                    if burst:
+                        self.handle_burst(pargs, burst, first)
+                    elif self.net_due is not None and self.net_due <= time.monotonic():
+                        self.net_check(pargs)
+
+            except (OSError, KeyboardInterrupt) as exc:
+                self.log(f'Exception : {exc}')
+                netw.close()
+                sys.exit()
@@ -0,0 +1,42 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+File fingerprints for cheap in process compare of resolv.conf files
+ - (size, mtime_ns, inode, digest)
+ - digest is SHA384 of the content, same as wg-fix-resolv uses
+"""
+import os
+
+from wg_client.utils.lazy import lazy_import
+
+hashlib = lazy_import('hashlib')
+
+type Fingerprint = tuple[int, int, int, bytes]
+
+
+def file_fingerprint(path: str, prev: Fingerprint | None = None) -> Fingerprint | None:
+    """
+    Fingerprint of file path (follows symlinks)
+     - if prev is given and size, mtime and inode are unchanged
+       prev is returned without reading the file
+    Returns None if file cannot be read
+    """
+    try:
+        stat = os.stat(path)
+        if prev and prev[:3] == (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            return prev
+
+        with open(path, 'rb') as fobj:
+            data = fobj.read()
+    except OSError:
+        return None
+
+    digest = hashlib.sha384(data).digest()
+    return (len(data), stat.st_mtime_ns, stat.st_ino, digest)
+
+
+def same_content(fp1: Fingerprint | None, fp2: Fingerprint | None) -> bool:
+    """ True if both fingerprints exist and have same size and digest """
+    if fp1 is None or fp2 is None:
+        return False
+    return fp1[0] == fp2[0] and fp1[3] == fp2[3]
@@ -5,4 +5,11 @@ ssh stuff
 """
 from .ssh_listener import (get_ssh_port_prefix, ssh_args)
 from .ssh_state import (read_ssh_pid, write_ssh_pid, check_ssh_pid, kill_ssh)
+from .ssh_state import (SSH_SIGNATURE, ssh_pid_tag)
+from .ssh_state import (read_ssh_status, write_ssh_status, ssh_failure)
+from .class_reconnect import (ReconnectPolicy, RECONNECT_PRESETS, reconnect_policy)
+from .class_probe import (SshProbe, ssh_control_path)
+from .port_cache import (read_prefix_cache, prefix_order)
+from .ssh_errors import (SshErrors, classify_line)
+from .class_latency import (LatencyStats, latency_string)
 from .class_ssh import SshMgr
@@ -0,0 +1,54 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+'''
+Tunnel probe latency
+ - each sample is how long one probe took : ssh client over the control
+   socket, remote ss and the answer back. Not the bare network round trip,
+   but it goes through the tunnel so it tracks it
+ - last size samples kept (ring buffer); percentiles over those
+'''
+from collections import deque
+from typing import Any
+
+
+def percentile(values: list[float], pct: float) -> float:
+    '''
+    Nearest rank percentile of sorted values (0 if empty)
+    '''
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * pct // 100))
+    return values[int(rank) - 1]
+
+
+class LatencyStats:
+    '''
+    Ring buffer of probe latency samples (ms)
+    '''
+    def __init__(self, size: int = 64):
+        self.samples: deque[float] = deque(maxlen=size)
+
+    def add(self, latency_ms: float):
+        ''' new sample - oldest drops out once full '''
+        self.samples.append(latency_ms)
+
+    def summary(self) -> dict[str, Any]:
+        '''
+        count, last, p50, p95 and max (ms)
+        '''
+        values = sorted(self.samples)
+        return {
+                'count': len(values),
+                'last': round(self.samples[-1], 1) if values else 0.0,
+                'p50': round(percentile(values, 50), 1),
+                'p95': round(percentile(values, 95), 1),
+                'max': round(values[-1], 1) if values else 0.0,
+                }
+
+
+def latency_string(summary: dict[str, Any]) -> str:
+    ''' one line for status ('' if no samples) '''
+    if not summary or not summary.get('count'):
+        return ''
+    return (f'p50 {summary["p50"]} p95 {summary["p95"]} max {summary["max"]} ms'
+            f' ({summary["count"]} samples)')
@@ -0,0 +1,113 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+'''
+Reverse tunnel health probe
+ - ssh listener runs as ControlMaster; probe is a command run over its
+   control socket, so no new login and it travels the same tcp connection
+ - remote 'ss' confirms the -R port is still bound
+ - time from starting the probe to its answer is its latency (latency_ms)
+'''
+import os
+import time
+import subprocess
+from typing import Callable
+
+from wg_client.daemon import daemon_socket_path
+
+# ssh itself failed (connection, control socket) - anything else is the remote command
+_SSH_FAILED = 255
+
+
+def ssh_control_path(tag: str = 'ssh') -> str:
+    '''
+    ssh ControlMaster socket - next to the daemon control socket
+      $XDG_RUNTIME_DIR/wg-client/<tag>-ctl.sock
+     - tag is the listener pidfile tag (see ssh_pid_tag())
+    '''
+    return os.path.join(os.path.dirname(daemon_socket_path()), f'{tag}-ctl.sock')
+
+
+class SshProbe:
+    '''
+    Check ssh listener over its control socket
+     - pargs() is the probe command, verdict() judges its result
+     - run() does both (blocking, with timeout)
+    '''
+    def __init__(self, ctl_path: str = '', timeout: float = 10.0,
+                 log: Callable[[str], None] = print):
+        self.ctl_path: str = ctl_path if ctl_path else ssh_control_path()
+        self.timeout: float = timeout
+        self.log = log
+        self.port_check: bool = True
+        self.latency_ms: float = 0.0
+
+    def prepare(self):
+        '''
+        Control socket directory must exist; socket left from
+        an ssh that was killed would stop the new master
+        '''
+        os.makedirs(os.path.dirname(self.ctl_path), mode=0o700, exist_ok=True)
+        try:
+            os.unlink(self.ctl_path)
+        except OSError:
+            pass
+
+    def master_args(self) -> list[str]:
+        ''' ssh options that make the listener the control master '''
+        return ['-o', 'ControlMaster=yes', '-o', f'ControlPath={self.ctl_path}',
+                '-o', 'ControlPersist=no']
+
+    def pargs(self, server: str, rport: str) -> list[str]:
+        '''
+        Probe command
+         - session only once remote is known to lack ss
+        '''
+        remote = f"ss -Hltn 'sport = :{rport}'" if self.port_check else 'true'
+        return ['/usr/bin/ssh', '-S', self.ctl_path, '-o', 'BatchMode=yes', server, remote]
+
+    def verdict(self, retc: int | None, output: str, rport: str) -> bool:
+        '''
+        True if tunnel looks alive
+         - ssh failed (255) or timed out (None) : dead
+         - port listed by ss : alive
+         - remote ss missing or failed (e.g. no -H or filter support) : session
+           answered so alive; from then on only the session is checked
+        '''
+        if retc is None:
+            self.log('ssh:probe timed out')
+            return False
+
+        if self.port_check and retc not in (0, _SSH_FAILED):
+            self.log(f'ssh:probe remote ss failed ({retc}) - checking session only')
+            self.port_check = False
+            return True
+
+        if retc != 0:
+            self.log(f'ssh:probe failed ({retc})')
+            return False
+
+        if self.port_check and f':{rport}' not in output:
+            self.log(f'ssh:probe remote port {rport} not bound')
+            return False
+        return True
+
+    def run(self, server: str, rport: str) -> bool:
+        '''
+        Probe and wait for the answer
+         - latency_ms is how long it took (0 if no answer)
+        '''
+        retc: int | None = None
+        output = ''
+        self.latency_ms = 0.0
+        start = time.perf_counter()
+        try:
+            ret = subprocess.run(self.pargs(server, rport), capture_output=True, text=True,
+                                 timeout=self.timeout, check=False)
+            (retc, output) = (ret.returncode, ret.stdout)
+            self.latency_ms = 1000 * (time.perf_counter() - start)
+        except subprocess.TimeoutExpired:
+            retc = None
+        except OSError as err:
+            self.log(f'ssh:probe cannot run ssh : {err}')
+            return True
+        return self.verdict(retc, output, rport)
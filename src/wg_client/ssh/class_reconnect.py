@@ -0,0 +1,87 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+'''
+ssh reconnect policy
+ - exponential backoff with jitter; reset once a connection stays up
+ - 'fixed' preset is the original behaviour : always wait 30 secs
+   (network coming back does not cut it short)
+'''
+import random
+from typing import Any
+
+# preset name -> policy args (None : args come from config)
+RECONNECT_PRESETS: dict[str, dict[str, Any] | None] = {
+        'backoff': None,
+        'fixed': {'initial': 30, 'multiplier': 1, 'cap': 30, 'jitter': 0, 'reset_after': 0,
+                  'net_up_reset': False},
+        }
+
+
+class ReconnectPolicy:
+    '''
+    Delay before the next ssh (re)connect
+     - delay = initial * multiplier ** failures, at most cap
+     - jitter : delay is spread by +/- that fraction so clients dropped
+       together (e.g. server reboot) do not all return at once
+     - connection that stayed up reset_after secs or longer resets the backoff
+     - net_up_reset : network coming back resets the backoff and ends the wait
+    '''
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, initial: float = 2.0, multiplier: float = 2.0, cap: float = 120.0,
+                 jitter: float = 0.2, reset_after: float = 60.0, net_up_reset: bool = True):
+        self.initial: float = initial
+        self.multiplier: float = multiplier
+        self.cap: float = max(cap, initial)
+        self.jitter: float = jitter
+        self.reset_after: float = reset_after
+        self.net_up_reset: bool = net_up_reset
+        self.failures: int = 0
+
+    def next_delay(self, uptime: float) -> float:
+        '''
+        Secs to wait after a connection that was up for uptime secs
+        '''
+        if uptime >= self.reset_after:
+            self.failures = 0
+
+        delay = min(self.cap, self.initial * self.multiplier ** self.failures)
+        if delay < self.cap:
+            self.failures += 1
+
+        if self.jitter > 0:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        return min(self.cap, max(0.0, delay))
+
+    def reset(self):
+        ''' next delay is initial again '''
+        self.failures = 0
+
+    def net_up(self) -> bool:
+        '''
+        Network came back while waiting.
+        Returns True if the wait should end now (backoff starts over)
+        '''
+        if not self.net_up_reset:
+            return False
+        self.reset()
+        return True
+
+    def describe(self) -> str:
+        ''' for log '''
+        return (f'initial {self.initial}s x{self.multiplier} max {self.cap}s'
+                f' jitter {self.jitter} reset after {self.reset_after}s')
+
+
+def reconnect_policy(conf: dict[str, Any]) -> ReconnectPolicy:
+    '''
+    Policy from config (see CONF_DEFAULTS ssh_reconnect*)
+    '''
+    preset = RECONNECT_PRESETS.get(conf.get('ssh_reconnect', 'backoff'))
+    if preset is not None:
+        return ReconnectPolicy(**preset)
+
+    return ReconnectPolicy(initial=conf.get('ssh_reconnect_initial', 2.0),
+                           multiplier=conf.get('ssh_reconnect_multiplier', 2.0),
+                           cap=conf.get('ssh_reconnect_max', 120.0),
+                           jitter=conf.get('ssh_reconnect_jitter', 0.2),
+                           reset_after=conf.get('ssh_reconnect_reset', 60.0))
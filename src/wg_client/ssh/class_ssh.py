@@ -4,16 +4,27 @@
 Manage ssh listener
 '''
 # pylint: disable=too-many-instance-attributes
+import os
+import select
 import time
-from typing import Callable
+import threading
+from typing import (Any, Callable)
 
 from wg_client.proc.class_proc import MyProc
 from wg_client.proc.class_proc import MySignals
 from wg_client.proc import process_owner
+from wg_client.proc import ProcTable
+from wg_client.net import (NetWatch, NET_UP_GROUPS)
 
 from wg_client.utils import relative_time_string
 
 from .ssh_state import (read_ssh_pid, write_ssh_pid, check_ssh_pid, kill_ssh)
+from .ssh_state import write_ssh_status
+from .class_reconnect import ReconnectPolicy
+from .class_probe import (SshProbe, ssh_control_path)
+from .port_cache import save_prefix
+from .ssh_errors import (SshErrors, NEXT_PORT, STOP)
+from .class_latency import LatencyStats
 
 
 class SshMgr:
@@ -22,20 +33,59 @@ class SshMgr:
      - start and stop ssh listener process
      - if exits (not by stop request) then restart to keep it up
      Input: ssh_args : ['/usr/bin/ssh', '-R', <remote_fwd_string>, '-N', <server>]
+     - policy decides the wait before each reconnect (default backoff)
+     - wait ends net_up_delay secs after network comes back (netlink): default
+       route, global address or wg_iface was missing and now all are there
+       (unless policy says to keep waiting, e.g. 'fixed')
+     - dead tunnel : ssh ServerAlive keepalives make ssh exit; optional periodic
+       probe (probe_secs > 0) over the control socket restarts it at once
+     - tag names pidfile and control socket : one SshMgr per tunnel (see ssh_pid_tag())
+     - state, connects and next_try are the tunnel's state record
+     - ports : (prefix, remote port) choices, current first. Remote port in use
+       moves on to the next one at once; prefix that worked is cached per server
+     - ssh stderr is classified as it arrives (see ssh_errors) and picks what
+       happens after exit : reconnect now, back off, next port or stop
+     - each probe that succeeds is a latency sample; state record
+       with p50/p95/max is saved to the tunnel status file (see ssh_status_file())
+     - lock : listener info, ports and policy may be changed from another
+       thread (config reload) while the reconnect loop runs
     '''
-    def __init__(self, test: bool, log: Callable[[str], None] = print):
+    # pylint: disable=too-many-public-methods
+    def __init__(self, test: bool, log: Callable[[str], None] = print,
+                 policy: ReconnectPolicy | None = None, tag: str = 'ssh'):
+        self.tag: str = tag
         self.pid: int = -1
         self.server: str = ''
         self.rport: str = ''
         self.lip: str = ''
         self.lport: str = ''
         self.pargs: list[str] = []
-        self.proc: MyProc
+        self.proc: MyProc | None = None
         self.user: str = process_owner()
         self.log = log
         self.test: bool = test
         self.start_time: float = -1
         self.end_time: float = -1
+        self.policy: ReconnectPolicy = policy if policy is not None else ReconnectPolicy()
+        self.stop_event = threading.Event()
+        self.restart_event = threading.Event()
+        self.wg_iface: str = ''
+        self.net_up_delay: float = 0.5
+        self._wake_fds: tuple[int, int] | None = None
+        self.alive_interval: int = 15
+        self.alive_count: int = 3
+        self.probe_secs: int = 0
+        self.probe: SshProbe = SshProbe(ctl_path=ssh_control_path(tag), log=log)
+        self.state: str = 'idle'
+        self.connects: int = 0
+        self.next_try: float = 0
+        self.ports: list[tuple[int, str]] = []
+        self.prefix: int = -1
+        self.tried: set[str] = set()
+        self.forward_ok_secs: float = 10
+        self.ssh_errors: SshErrors = SshErrors()
+        self.latency: LatencyStats = LatencyStats()
+        self.lock = threading.RLock()
 
         self.mysignals: MySignals = MySignals()
 
@@ -43,11 +93,88 @@ class SshMgr:
         '''
         Initialize the ssh info we need
         '''
-        self.server = server
-        self.rport = rport
-        self.lip = lip
-        self.lport = lport
-        self.pargs = self.get_pargs()
+        with self.lock:
+            self.server = server
+            self.rport = rport
+            self.lip = lip
+            self.lport = lport
+            self.pargs = self.get_pargs()
+
+    def set_health(self, alive_interval: int, alive_count: int, probe_secs: int):
+        '''
+        ServerAlive options and probe interval (0 = no probe)
+         - used from next set_info() / reconfigure()
+        '''
+        with self.lock:
+            self.alive_interval = alive_interval
+            self.alive_count = alive_count
+            self.probe_secs = probe_secs
+
+    def set_policy(self, policy: ReconnectPolicy):
+        ''' reconnect policy - used from next reconnect '''
+        with self.lock:
+            self.policy = policy
+
+    def set_ports(self, ports: list[tuple[int, str]]):
+        '''
+        Remote port choices : list of (prefix, remote port)
+         - first is the one to use (caller passes it to set_info() / reconfigure())
+        '''
+        with self.lock:
+            self.ports = ports
+            self.tried = set()
+            if ports:
+                self.prefix = ports[0][0]
+
+    def next_port(self) -> bool:
+        '''
+        Remote port is in use : switch to next untried one
+        Returns False once all have been tried (then starts over)
+        '''
+        with self.lock:
+            self.tried.add(self.rport)
+            for (prefix, rport) in self.ports:
+                if rport not in self.tried:
+                    self.log(f'ssh: remote port {self.rport} in use - trying {rport}')
+                    self.prefix = prefix
+                    self.set_info(self.server, rport, self.lip, self.lport)
+                    return True
+
+            if len(self.ports) > 1:
+                self.log('ssh: all remote ports in use')
+            self.tried = set()
+            return False
+
+    def forward_ok(self):
+        '''
+        ssh stayed up forward_ok_secs : remote port was bound.
+        Remember its prefix for next time.
+        '''
+        self.tried = set()
+        if self.prefix > 0 and self.server and not self.test:
+            save_prefix(self.server, self.prefix)
+
+    def reconfigure(self, server: str, rport: str, lip: str, lport: str) -> bool:
+        '''
+        Apply new listener info (e.g. after config change)
+         - unchanged ssh command : nothing to do, tunnel stays up
+         - otherwise running ssh is ended and reconnected at once with new info
+        Returns True if a running ssh was restarted
+        '''
+        with self.lock:
+            old_pargs = self.pargs
+            self.set_info(server, rport, lip, lport)
+            if self.pargs == old_pargs:
+                return False
+
+        if self.proc is None or not self.proc.is_running():
+            # not connected - next (re)connect uses new info
+            return False
+
+        self.log(f'ssh: new listener {rport} on {server} - reconnecting')
+        self.restart_event.set()
+        self.proc.terminate()
+        return True
 
     def get_pargs(self) -> list[str]:
         '''
@@ -57,22 +184,35 @@ class SshMgr:
         pargs = []
         if self.test:
             pargs += ['/usr/bin/echo']
-        pargs += ['/usr/bin/ssh', '-R', remfwd, '-N', self.server]
+        pargs += ['/usr/bin/ssh', '-R', remfwd, '-N']
+        pargs += ['-o', f'ServerAliveInterval={self.alive_interval}',
+                  '-o', f'ServerAliveCountMax={self.alive_count}',
+                  '-o', 'ExitOnForwardFailure=yes']
+        if self.probe_secs > 0:
+            pargs += self.probe.master_args()
+        pargs += [self.server]
         return pargs
 
-    def is_running(self, user: str = '') -> bool:
-        ''' check if running '''
+    def is_running(self, user: str = '', procs: ProcTable | None = None) -> bool:
+        '''
+        check if running
+         - procs: optional process table snapshot
+        '''
         user_to_check = user
         if not user:
             user_to_check = self.user
 
-        pid = read_ssh_pid(user_to_check)
+        # ssh supervised by this process: pidfd poll is all we need
+        if user_to_check == self.user and self.proc is not None and self.proc.is_running():
+            return True
+
+        pid = read_ssh_pid(user_to_check, self.tag)
         if not user or user == self.user:
             self.pid = pid
 
         if pid < 0:
             return False
-        running = check_ssh_pid(pid, self.server, user=user)
+        running = check_ssh_pid(pid, self.server, user=user, procs=procs)
         return running
 
     def stop(self):
@@ -80,7 +220,16 @@ class SshMgr:
         Kill the ssh listener
         So only way to stop this is from another process (wg-client --stop-ssh)
         Doing so will kill the parent wg-client process and it's child ssh
+        If the listener is supervised by this process (daemon) it will not be restarted.
+         - our own child is ended via its pidfd (kill_ssh() would stop this process)
         '''
+        self.stop_event.set()
+        self.wake()
+        if self.proc is not None and self.proc.is_running():
+            self.log('ssh:stop - terminating ssh process')
+            self.proc.terminate()
+            return
+
         is_running = self.is_running()
         if is_running:
             self.log('ssh:stop - terminating ssh process')
@@ -99,42 +248,275 @@ class SshMgr:
         delta_str = relative_time_string(secs)
         return delta_str
 
-    def start(self):
-        ''' run it '''
-        running = self.is_running()
-        if running:
-            self.log('ssh:start already running')
+    def connecting(self):
+        '''
+        About to (re)start ssh
+        '''
+        re = 're-' if self.start_time > 0 else ''
+        self.log(f'ssh:start - {re}connecting')
+        self.start_time = time.time()
+        self.state = 'connecting'
+        self.connects += 1
+        self.ssh_errors.reset()
+        if self.probe_secs > 0 and not self.test:
+            self.probe.prepare()
+
+    def probe_done(self, alive: bool, latency_ms: float):
+        '''
+        Probe result : keep how long it took or restart if tunnel is dead
+        '''
+        if not alive:
+            self.probe_failed()
+            return
+        if latency_ms > 0:
+            self.latency.add(latency_ms)
+            self.save_status()
+
+    def probe_failed(self):
+        '''
+        Tunnel is dead though ssh is still running : restart it now
+        '''
+        self.log('ssh: probe failed - restarting')
+        if self.proc is None:
+            return
+        self.restart_event.set()
+        if not self.proc.terminate():
+            self.restart_event.clear()
+
+    def _watch(self, done: threading.Event):
+        '''
+        While ssh runs (until done)
+         - after forward_ok_secs : forward_ok()
+         - then probe every probe_secs until a probe fails
+        '''
+        if done.wait(self.forward_ok_secs):
             return
+        self.forward_ok()
+
+        while self.probe_secs > 0 and not done.wait(self.probe_secs):
+            alive = self.probe.run(self.server, self.rport)
+            self.probe_done(alive, self.probe.latency_ms)
+            if not alive:
+                return
+
+    def on_stderr(self, text: str):
+        '''
+        ssh wrote to stderr (still running)
+         - port in use or fatal error : no point keeping this ssh
+        '''
+        category = self.ssh_errors.feed(text)
+        if category and self.ssh_errors.action() in (NEXT_PORT, STOP) and self.proc is not None:
+            self.log(f'ssh: {category} error - ending ssh')
+            self.proc.terminate()
+
+    def can_start(self) -> bool:
+        '''
+        Before the first connect : False if ssh already running or test only
+        '''
+        if self.is_running():
+            self.log('ssh:start already running')
+            return False
 
         if self.test:
             arg_str = ' '.join(self.pargs)
             self.log(f'ssh:start test: {arg_str}')
+            return False
+        return True
+
+    def begin_attempt(self) -> list[str]:
+        '''
+        About to (re)start ssh : returns args to run it with
+        '''
+        self.connecting()
+        with self.lock:
+            return self.pargs
+
+    def end_attempt(self) -> tuple[bool, float]:
+        '''
+        ssh of this attempt has exited : decide the next one
+         - same for start() and the supervisor (which does not block)
+        Returns (again, delay)
+         - again : False once stopped or ssh said not to retry
+         - delay : secs to wait first; next port, if any, is already picked
+        '''
+        delay_time = self.exited()
+        return (not self.stop_event.is_set(), delay_time)
+
+    def exited(self) -> float:
+        '''
+        ssh has exited.
+        Returns secs to wait before reconnecting (see _reconnect_delay())
+        '''
+        self.end_time = time.time()
+        delta_str = self.running_time()
+        self.log(f'ssh: exited after {delta_str}')
+
+        self.state = 'waiting'
+        self.next_try = self.end_time
+        delay_time = self._reconnect_delay()
+        self.save_status()
+        return delay_time
+
+    def _reconnect_delay(self) -> float:
+        '''
+        Secs to wait before reconnecting
+         - wait is from reconnect policy : grows while ssh keeps failing,
+           back to initial once a connection stayed up long enough
+         - no wait if we ended it to apply new listener info
+         - otherwise by what ssh said on stderr :
+           remote port in use and another to try : no wait
+           host key or authentication failure : stop_event is set, no more tries
+           anything else (dropped connection too) : wait from policy
+        '''
+        if self.restart_event.is_set():
+            self.restart_event.clear()
+            return 0
+
+        if self.stop_event.is_set():
+            return 0
+
+        self.ssh_errors.flush()
+        action = self.ssh_errors.action()
+        if self.ssh_errors.category:
+            self.log(f'ssh: exit reason {self.ssh_errors.category} ({action})')
+
+        if action == STOP:
+            self.log(f'Error: ssh {self.ssh_errors.category} failure - not retrying')
+            self.log(f' {self.ssh_errors.line}')
+            self.state = 'failed'
+            self.stop_event.set()
+            return 0
+
+        if action == NEXT_PORT and self.next_port():
+            return 0
+
+        with self.lock:
+            delay_time = self.policy.next_delay(self.end_time - self.start_time)
+        self.next_try = self.end_time + delay_time
+        self.log(f'ssh: reconnect in {delay_time:.1f} secs')
+        return delay_time
+
+    def save_pid(self, pid: int):
+        '''
+        pid_saver for this tunnel's ssh
+         - pid is -1 once ssh exited
+        '''
+        write_ssh_pid(pid, self.tag)
+        if pid > 0:
+            self.state = 'running'
+            self.save_status()
+
+    def stopped(self):
+        ''' no more reconnects '''
+        if self.state != 'failed':
+            self.state = 'stopped'
+        self.save_status()
+        self.log('ssh: stopped')
+
+    def record(self) -> dict[str, Any]:
+        '''
+        State record of this tunnel
+        '''
+        return {'server': self.server, 'rport': self.rport, 'state': self.state,
+                'connects': self.connects, 'started': self.start_time,
+                'next_try': self.next_try if self.state == 'waiting' else 0,
+                'exit_reason': self.ssh_errors.category,
+                'probe_ms': self.latency.summary()}
+
+    def save_status(self):
+        ''' state record to status file (read by --show-ssh-stats and --status) '''
+        if not self.test:
+            write_ssh_status(self.record(), self.tag)
+
+    def net_up(self) -> float | None:
+        '''
+        Network came back while waiting to reconnect.
+        Returns secs to wait now (to let routes settle)
+         - None : policy keeps the wait as is
+        '''
+        with self.lock:
+            if not self.policy.net_up():
+                return None
+        self.log('ssh: network up - reconnecting')
+        return self.net_up_delay
+
+    def wake(self):
+        '''
+        End wait_reconnect() early (e.g. after setting stop_event)
+         - safe from signal handler or other thread
+        '''
+        if self._wake_fds is not None:
+            try:
+                os.write(self._wake_fds[1], b'x')
+            except OSError:
+                pass
+
+    def wait_reconnect(self, delay: float) -> bool:
+        '''
+        Wait up to delay secs before reconnecting
+         - stop() (or wake()) ends it
+         - network coming back shortens it to net_up_delay
+        Returns True if cut short by network
+        '''
+        if delay <= 0 or self.stop_event.is_set():
+            return False
+
+        if self._wake_fds is None:
+            self._wake_fds = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+        wake_fd = self._wake_fds[0]
+
+        poller = select.poll()
+        poller.register(wake_fd, select.POLLIN)
+        netw = NetWatch(groups=NET_UP_GROUPS, iface=self.wg_iface)
+        if netw.okay:
+            poller.register(netw.fileno(), select.POLLIN)
+
+        net_up = False
+        deadline = time.monotonic() + delay
+        with netw:
+            while not self.stop_event.is_set():
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                for (fd, _event) in poller.poll(timeout * 1000):
+                    if fd == wake_fd:
+                        try:
+                            os.read(wake_fd, 512)
+                        except OSError:
+                            pass
+                    elif netw.read_net_up() and not net_up:
+                        net_up_delay = self.net_up()
+                        if net_up_delay is not None:
+                            net_up = True
+                            deadline = min(deadline, time.monotonic() + net_up_delay)
+        return net_up
+
+    def start(self):
+        ''' run it '''
+        if not self.can_start():
             return
         #
         # Set up ssh and reconnect if dropped
         #
         # NB This waits on the ssh process to exit.
         # Open up a pipe and wait for it to exit
-        # the ssh (child) pid will be saved via write_ssh_pid
+        # the ssh (child) pid will be saved via save_pid()
         # and set to "-1" when exited
-        # In case ssh cannot be restarted we wait and try again.
-        # Should we slowly increase the timeout in this case?
+        # In case ssh cannot be restarted we wait (see ReconnectPolicy) and try again.
         #
         self.proc = MyProc(self.mysignals)
-        delay_time = 30
-        while True:
-            re = 're-' if self.start_time > 0 else ''
-            self.log(f'ssh:start - {re}connecting')
-
-            self.start_time = time.time()
-            self.proc.popen(self.pargs, logger=self.log, pid_saver=write_ssh_pid)
-            self.end_time = time.time()
-
-            delta_str = self.running_time()
-            self.log(f'ssh: exited after {delta_str}')
-
-            #
-            # always wait before trying again
-            #   - whether exited right away or after running for some time
-            #
-            time.sleep(delay_time)
+        self.stop_event.clear()
+        while not self.stop_event.is_set():
+            pargs = self.begin_attempt()
+            done = threading.Event()
+            threading.Thread(target=self._watch, args=(done,), daemon=True).start()
+            self.proc.popen(pargs, logger=self.log, pid_saver=self.save_pid,
+                            on_stderr=self.on_stderr)
+            done.set()
+
+            # stop() or network coming back ends the wait early
+            (again, delay_time) = self.end_attempt()
+            if not again:
+                break
+            self.wait_reconnect(delay_time)
+        self.stopped()
@@ -0,0 +1,82 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Remote port prefix choice
+ - last prefix whose listener came up is kept per server, so a restarted
+   wg-client asks for the same port first
+ - when the remote port is in use (see ssh_errors) the other prefixes
+   of the range are tried in turn
+"""
+import os
+import json
+import tempfile
+import threading
+
+from wg_client.proc.state import get_appdir
+
+_CACHE_NAME = 'ssh-prefix.json'
+
+# tunnels save from their own threads : one read-modify-write at a time
+_CACHE_LOCK = threading.Lock()
+
+
+def prefix_cache_file() -> str:
+    """ json : server -> prefix """
+    return os.path.join(get_appdir(), _CACHE_NAME)
+
+
+def read_prefix_cache() -> dict[str, int]:
+    """ cached prefixes ({} if none) """
+    try:
+        with open(prefix_cache_file(), 'r', encoding='utf-8') as fobj:
+            data = json.load(fobj)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {server: pfx for (server, pfx) in data.items() if isinstance(pfx, int)}
+
+
+def save_prefix(server: str, prefix: int) -> bool:
+    """
+    Remember prefix that worked for server
+     - atomic replace; unchanged value is not rewritten
+     - own temp file per write, so concurrent writers never share one
+    """
+    with _CACHE_LOCK:
+        cache = read_prefix_cache()
+        if cache.get(server) == prefix:
+            return True
+        cache[server] = prefix
+
+        path = prefix_cache_file()
+        tmp = ''
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            (fd, tmp) = tempfile.mkstemp(prefix=f'.{_CACHE_NAME}.', dir=os.path.dirname(path))
+            with os.fdopen(fd, 'w', encoding='utf-8') as fobj:
+                json.dump(cache, fobj)
+            os.replace(tmp, path)
+        except OSError:
+            if tmp:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+            return False
+    return True
+
+
+def prefix_order(pfx_range: list[str], first: int) -> list[int]:
+    """
+    Every prefix of range ("n" or "n-m"), starting with first
+    then the ones after it, wrapping around
+    """
+    if not pfx_range:
+        return [first] if first > 0 else []
+    nums = [int(num) for num in pfx_range]
+    prefixes = list(range(nums[0], nums[-1] + 1))
+    if first in prefixes:
+        idx = prefixes.index(first)
+        prefixes = prefixes[idx:] + prefixes[:idx]
+    return prefixes
@@ -0,0 +1,110 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Why did ssh fail - from its stderr
+ - each message category maps to what to do next:
+     retry     : connection was up and got dropped - reconnect after policy wait
+                 (initial wait if it stayed up long enough)
+     backoff   : wait per reconnect policy (network or server not there yet)
+     next-port : remote port in use - try next prefix
+     stop      : retrying cannot help (host key, authentication) - stop and alert
+"""
+import re
+
+SSH_DNS = 'dns'
+SSH_REFUSED = 'refused'
+SSH_TIMEOUT = 'timeout'
+SSH_HOSTKEY = 'host-key'
+SSH_AUTH = 'auth'
+SSH_FORWARD = 'forward'
+SSH_DISCONNECT = 'disconnect'
+
+RETRY = 'retry'
+BACKOFF = 'backoff'
+NEXT_PORT = 'next-port'
+STOP = 'stop'
+
+# (stderr pattern, category) - first match wins
+_PATTERNS: list[tuple[re.Pattern, str]] = [
+        (re.compile(r'could not resolve hostname|name or service not known'
+                    r'|temporary failure in name resolution', re.I), SSH_DNS),
+        (re.compile(r'connection refused', re.I), SSH_REFUSED),
+        (re.compile(r'connection timed out|operation timed out|no route to host'
+                    r'|network is unreachable', re.I), SSH_TIMEOUT),
+        (re.compile(r'host key verification failed|remote host identification has changed', re.I),
+         SSH_HOSTKEY),
+        (re.compile(r'permission denied \(|too many authentication failures', re.I), SSH_AUTH),
+        (re.compile(r'remote port forwarding failed', re.I), SSH_FORWARD),
+        (re.compile(r'connection (closed|reset) by|broken pipe|timeout, server .* not responding'
+                    r'|client_loop: send disconnect', re.I), SSH_DISCONNECT),
+        ]
+
+SSH_ACTIONS: dict[str, str] = {
+        SSH_DNS: BACKOFF,
+        SSH_REFUSED: BACKOFF,
+        SSH_TIMEOUT: BACKOFF,
+        SSH_HOSTKEY: STOP,
+        SSH_AUTH: STOP,
+        SSH_FORWARD: NEXT_PORT,
+        SSH_DISCONNECT: RETRY,
+        }
+
+# when several show up the one that matters most is kept
+_RANK = {RETRY: 1, BACKOFF: 2, NEXT_PORT: 3, STOP: 4}
+
+
+def classify_line(line: str) -> str:
+    """ category of one stderr line ('' if none) """
+    for (pattern, category) in _PATTERNS:
+        if pattern.search(line):
+            return category
+    return ''
+
+
+class SshErrors:
+    """
+    Classify ssh stderr as it arrives
+     - feed() takes any chunk; only complete lines are classified
+     - category / line : most important so far ('' if none)
+    """
+    def __init__(self):
+        self.category: str = ''
+        self.line: str = ''
+        self._partial: str = ''
+
+    def reset(self):
+        """ new ssh run """
+        self.category = ''
+        self.line = ''
+        self._partial = ''
+
+    def action(self) -> str:
+        """ what to do about it (backoff if nothing recognized) """
+        return SSH_ACTIONS.get(self.category, BACKOFF)
+
+    def feed(self, text: str) -> str:
+        """
+        More stderr.
+        Returns category of new lines if it became the most important one, else ''
+        """
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()
+        return self._classify(lines)
+
+    def flush(self) -> str:
+        """ ssh exited : classify last line even without newline """
+        (lines, self._partial) = ([self._partial], '')
+        return self._classify(lines)
+
+    def _classify(self, lines: list[str]) -> str:
+        """ keep most important category """
+        new = ''
+        for line in lines:
+            category = classify_line(line)
+            if not category:
+                continue
+            rank = _RANK[SSH_ACTIONS[category]]
+            if not self.category or rank > _RANK[self.action()]:
+                (self.category, self.line) = (category, line.strip())
+                new = category
+        return new
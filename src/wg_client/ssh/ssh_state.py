@@ -3,35 +3,100 @@
 """
 Ssh application process managerment
 """
+import os
+import json
+from typing import Any
+
+from wg_client.proc.state import get_appdir
 from wg_client.proc import (get_parent_pid, kill_program, read_pid, write_pid, check_pid)
+from wg_client.proc import ProcTable
+from wg_client.proc import signal_program
+from wg_client.supervisor.consts import (SUPERVISOR_SIGNATURE, SIG_STOP_SSH)
+
+# args every ssh listener has - identifies them in a process table
+SSH_SIGNATURE = ['/usr/bin/ssh', '-R', '-N']
 
 
-def read_ssh_pid(user: str = '') -> int:
+def ssh_pid_tag(server: str = '') -> str:
+    """
+    pidfile tag of a listener
+     - 'ssh' for the primary (ssh_server)
+     - 'ssh-<server>' for each of ssh_extra_servers
+    """
+    if not server:
+        return 'ssh'
+    return 'ssh-' + server.replace('/', '_')
+
+
+def read_ssh_pid(user: str = '', tag: str = 'ssh') -> int:
     """
     Read pid of last ssh
     """
-    pid = read_pid('ssh', user)
+    pid = read_pid(tag, user)
     return pid
 
 
-def check_ssh_pid(pid: int, host: str, user: str = '') -> bool:
+def check_ssh_pid(pid: int, host: str, user: str = '',
+                  procs: ProcTable | None = None) -> bool:
     """
     Check pid is valid
      - we write pid = -1 when child process terminates cleanly
+     - procs: optional process table snapshot
     """
     pargs = ['/usr/bin/ssh']
     if host:
         pargs += [host]
 
-    pid_is_valid = check_pid(pid, pargs, user=user)
+    pid_is_valid = check_pid(pid, pargs, user=user, procs=procs)
     return pid_is_valid
 
 
-def write_ssh_pid(pid: int):
+def write_ssh_pid(pid: int, tag: str = 'ssh'):
     """
     write pid of last ssh
     """
-    write_pid(pid, 'ssh')
+    write_pid(pid, tag)
+
+
+def ssh_status_file(tag: str = 'ssh', user: str = '') -> str:
+    """ json state record of a listener (see SshMgr.record()) """
+    return os.path.join(get_appdir(user), f'{tag}-status.json')
+
+
+def read_ssh_status(tag: str = 'ssh', user: str = '') -> dict[str, Any]:
+    """ last saved state record ({} if none) """
+    try:
+        with open(ssh_status_file(tag, user), 'r', encoding='utf-8') as fobj:
+            data = json.load(fobj)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def ssh_failure(record: dict[str, Any]) -> str:
+    """
+    Why ssh was given up on, from its state record ('' if it was not)
+     - host key or authentication failure : retrying cannot help
+    """
+    if record.get('state') != 'failed':
+        return ''
+    return f'{record.get("exit_reason") or "ssh"} failure - not retrying'
+
+
+def write_ssh_status(status: dict[str, Any], tag: str = 'ssh') -> bool:
+    """
+    Save state record (atomic replace so readers never see partial file)
+    """
+    path = ssh_status_file(tag)
+    tmp = f'{path}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, 'w', encoding='utf-8') as fobj:
+            json.dump(status, fobj)
+        os.replace(tmp, path)
+    except OSError:
+        return False
+    return True
 
 
 def kill_ssh(pid: int, server: str):
@@ -39,6 +104,7 @@ def kill_ssh(pid: int, server: str):
     Since ssh is started by wg-client which will auto restart ssh if it dies
     we first stop the parent wg-client process then ssh if its not dead
      1 - kill wg-client
+         (a supervisor is only asked to stop ssh - it keeps its other tasks)
      2 - kill ssh if alive
     """
     if pid < 0:
@@ -49,7 +115,7 @@ def kill_ssh(pid: int, server: str):
         pargs += [server]
 
     ppid = get_parent_pid(pid, pargs)
-    if ppid > 0:
+    if ppid > 0 and not signal_program(ppid, SUPERVISOR_SIGNATURE, SIG_STOP_SSH):
         ppargs = ['/usr/bin/wg-client', '--ssh-start']
         kill_program(ppid, ppargs)
 
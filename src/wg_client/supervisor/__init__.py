@@ -0,0 +1,19 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Single process supervisor
+"""
+from .consts import SUPERVISOR_SIGNATURE
+from .consts import (SIG_STOP_RESOLV, SIG_STOP_SSH)
+
+
+def __getattr__(name: str):
+    """
+    Supervisor itself is only loaded when needed (--supervise)
+    Stop requests from other wg-client invocations only need the above.
+    """
+    if name == 'WgSupervisor':
+        # pylint: disable=import-outside-toplevel
+        from .class_supervisor import WgSupervisor
+        return WgSupervisor
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,486 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Single process supervisor
+ - resolv monitor, ssh listeners (reconnecting) and config reload
+   run as callbacks on one asyncio event loop
+ - one ssh task per tunnel (ssh_server and each of ssh_extra_servers),
+   each with its own state and reconnect timer
+ - replaces separate --fix-dns-auto-start and blocking --ssh-start processes:
+   one interpreter, one logger and one set of signal handlers
+ - child exit is seen when its pidfd becomes readable; only resolv repairs
+   (which block) run on a worker thread
+ - stopping either task from another wg-client (--fix-dns-auto-stop, --ssh-stop)
+   signals us to stop just that task. We exit once nothing is left.
+"""
+import asyncio
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asyncio.subprocess import (PIPE, DEVNULL, Process)
+from typing import (Callable, TYPE_CHECKING)
+
+from wg_client.proc import MyProc
+from wg_client.utils import Inotify
+from wg_client.config import ConfigWatch
+from wg_client.net import (NetWatch, NET_UP_GROUPS)
+from wg_client.resolv import WgResolv
+from wg_client.ssh import SshMgr
+
+from .consts import (SIG_STOP_RESOLV, SIG_STOP_SSH)
+
+if TYPE_CHECKING:
+    from wg_client.cmd_line.class_client import WgClient
+
+
+async def _end_child(child: Process, wait_secs: float = 1.0):
+    """
+    Kill a probe child and reap it
+     - wait gives up after wait_secs should something else hold its output open
+    """
+    try:
+        child.kill()
+    except ProcessLookupError:
+        pass
+    try:
+        await asyncio.wait_for(child.wait(), wait_secs)
+    except TimeoutError:
+        pass
+
+
+class _ResolvTask:
+    """
+    Resolv monitor on event loop
+     - same watches and repair as WgResolv.monitor_resolv()
+     - burst coalescing by timer : repair once quiet or max latency reached
+     - link / route changes schedule the rate limited content check by timer
+     - repair (helper request or one-shot run) blocks : it runs on a worker
+       thread, one at a time in order, so the loop (ssh, signals) never waits on it
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, resolv: WgResolv, loop: asyncio.AbstractEventLoop,
+                 on_done: Callable[[], None]):
+        self.resolv = resolv
+        self.loop = loop
+        self.on_done = on_done
+        self.log = resolv.log
+        self.pargs: list[str] = resolv.fix_resolv_cmd()
+        self.inot: Inotify | None = None
+        self.burst: int = 0
+        self.first: float = 0.0
+        self.timer: asyncio.TimerHandle | None = None
+        self.netw: NetWatch | None = None
+        self.net_timer: asyncio.TimerHandle | None = None
+        self.pool: ThreadPoolExecutor | None = None
+
+    def start(self) -> bool:
+        """ start watching """
+        self.log('monitor_resolv: start (supervised)')
+        if self.resolv.check_already_running():
+            self.log(' resolv monitor already running')
+            return False
+
+        self.inot = Inotify()
+        if not self.inot.okay:
+            self.log(' inotify unavailable - cannot monitor')
+            return False
+
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='repair')
+        self.resolv.save_pidfile()
+        self.resolv.open_watch(self.inot)
+        self.resolv.metrics.save()
+        self.loop.add_reader(self.inot.fileno(), self._on_events)
+
+        self.netw = NetWatch()
+        if self.netw.okay:
+            self.loop.add_reader(self.netw.fileno(), self._on_net)
+        else:
+            self.log(' netlink unavailable - file events only')
+            self.netw = None
+        return True
+
+    def _on_events(self):
+        """ inotify readable : (re)arm the burst timer """
+        if self.inot is None:
+            return
+        count = self.resolv.read_changes()
+        if not count:
+            return
+
+        now = time.monotonic()
+        if not self.burst:
+            self.first = now
+        self.burst += count
+
+        if self.timer:
+            self.timer.cancel()
+        delay = min(self.resolv.quiet_time, self.first + self.resolv.max_latency - now)
+        self.timer = self.loop.call_later(max(0.0, delay), self._on_quiet)
+
+    def _on_quiet(self):
+        """ burst is over """
+        (burst, first) = (self.burst, self.first)
+        self.burst = 0
+        self.timer = None
+        self._repair(self.resolv.handle_burst, self.pargs, burst, first)
+
+    def _on_net(self):
+        """ link / route change : arm the content check timer """
+        if self.netw is None:
+            return
+        self.resolv.net_changed(self.netw.read_changes())
+        if self.net_timer is None and self.resolv.net_due is not None:
+            delay = self.resolv.net_due - time.monotonic()
+            self.net_timer = self.loop.call_later(max(0.0, delay), self._on_net_check)
+
+    def _on_net_check(self):
+        """ content check due """
+        self.net_timer = None
+        self._repair(self.resolv.net_check, self.pargs)
+
+    def _repair(self, func: Callable[..., None], *args):
+        """ run check / repair on the worker thread """
+        if self.pool is None:
+            return
+        future = self.loop.run_in_executor(self.pool, func, *args)
+        future.add_done_callback(self._repair_done)
+
+    def _repair_done(self, future: asyncio.Future):
+        """ repair errors are logged - monitor keeps going """
+        if not future.cancelled() and future.exception() is not None:
+            self.log(f' repair failed : {future.exception()}')
+
+    def stop(self):
+        """ stop watching """
+        if self.inot is None:
+            return
+        for timer in (self.timer, self.net_timer):
+            if timer:
+                timer.cancel()
+        self.timer = None
+        self.net_timer = None
+
+        if self.netw is not None:
+            self.loop.remove_reader(self.netw.fileno())
+            self.netw.close()
+            self.netw = None
+
+        self.loop.remove_reader(self.inot.fileno())
+        self.inot.close()
+        self.inot = None
+        if self.pool is not None:
+            # let a repair in progress finish before its helper is closed
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+        self.resolv.close()
+        self.resolv.clear_pidfile()
+        self.log('monitor_resolv: stopped')
+        self.on_done()
+
+
+class _SshTask:
+    """
+    ssh listener on event loop
+     - SshMgr decides each attempt (args, delay, next port, stop) as
+       for SshMgr.start(); here it is driven without blocking
+     - output collected as it arrives; pidfd tells us when ssh exits
+     - while waiting to reconnect, network coming back (netlink) shortens the wait
+     - while connected : forward_ok() after forward_ok_secs, then optional
+       probe every probe_secs (async subprocess)
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, ssh_mgr: SshMgr, loop: asyncio.AbstractEventLoop,
+                 on_done: Callable[[], None]):
+        self.mgr = ssh_mgr
+        self.loop = loop
+        self.on_done = on_done
+        self.log = ssh_mgr.log
+        self.proc: MyProc | None = None
+        self.fds: list[int] = []
+        self.pidfd: int = -1
+        self.timer: asyncio.TimerHandle | None = None
+        self.netw: NetWatch | None = None
+        self.conn_timer: asyncio.TimerHandle | None = None
+        self.probe_task: asyncio.Task | None = None
+        self.active: bool = False
+
+    def start(self) -> bool:
+        """ connect """
+        if not self.mgr.can_start():
+            return False
+
+        self.active = True
+        self.mgr.stop_event.clear()
+        self._connect()
+        return True
+
+    def _connect(self):
+        """ (re)start ssh """
+        self.timer = None
+        self._close_netw()
+        pargs = self.mgr.begin_attempt()
+        self.proc = MyProc(self.mgr.mysignals)
+        self.mgr.proc = self.proc
+        if not self.proc.spawn(pargs, logger=self.log, pid_saver=self.mgr.save_pid,
+                               on_stderr=self.mgr.on_stderr):
+            self.mgr.save_pid(-1)
+            self._reconnect()
+            return
+
+        self.fds = self.proc.pipe_fds()
+        for fd in self.fds:
+            self.loop.add_reader(fd, self._on_output, fd)
+
+        # no pidfd : exit is seen as end of output instead
+        self.pidfd = -1
+        if self.proc.pidfd is not None and self.proc.pidfd.okay:
+            self.pidfd = self.proc.pidfd.fileno()
+            self.loop.add_reader(self.pidfd, self._on_exit)
+        self.conn_timer = self.loop.call_later(self.mgr.forward_ok_secs, self._on_up)
+
+    def _on_up(self):
+        """ ssh stayed up : remote port is ours """
+        self.mgr.forward_ok()
+        self._schedule_probe()
+
+    def _schedule_probe(self):
+        """ next probe of this connection """
+        self.conn_timer = None
+        if self.mgr.probe_secs > 0:
+            self.conn_timer = self.loop.call_later(self.mgr.probe_secs, self._on_probe)
+
+    def _on_probe(self):
+        """ probe due """
+        self.conn_timer = None
+        self.probe_task = self.loop.create_task(self._probe())
+
+    def _cancel_timers(self):
+        """ connection ended """
+        if self.conn_timer:
+            self.conn_timer.cancel()
+            self.conn_timer = None
+        if self.probe_task:
+            self.probe_task.cancel()
+            self.probe_task = None
+
+    async def _probe(self):
+        """ run probe over control socket without blocking the loop """
+        probe = self.mgr.probe
+        retc: int | None = None
+        output = ''
+        start = self.loop.time()
+        probe.latency_ms = 0.0
+        try:
+            pargs = probe.pargs(self.mgr.server, self.mgr.rport)
+            child = await asyncio.create_subprocess_exec(*pargs, stdout=PIPE, stderr=DEVNULL)
+        except OSError as err:
+            self.log(f'ssh:probe cannot run ssh : {err}')
+            self._schedule_probe()
+            return
+
+        try:
+            (out, _err) = await asyncio.wait_for(child.communicate(), probe.timeout)
+            (retc, output) = (child.returncode, out.decode(errors='replace'))
+            probe.latency_ms = 1000 * (self.loop.time() - start)
+        except TimeoutError:
+            await _end_child(child)
+        except asyncio.CancelledError:
+            # ssh exited while probing
+            await _end_child(child)
+            raise
+
+        self.probe_task = None
+        alive = probe.verdict(retc, output, self.mgr.rport)
+        self.mgr.probe_done(alive, probe.latency_ms)
+        if alive:
+            self._schedule_probe()
+
+    def _on_output(self, fd: int):
+        """ ssh wrote something (or closed its output) """
+        if self.proc is None or self.proc.read_pipe(fd):
+            return
+        self.loop.remove_reader(fd)
+        self.fds.remove(fd)
+        if not self.fds and self.pidfd < 0:
+            self._on_exit()
+
+    def _on_exit(self):
+        """ ssh exited : reap it then reconnect """
+        self._cancel_timers()
+        for fd in self.fds:
+            self.loop.remove_reader(fd)
+        self.fds = []
+        if self.pidfd >= 0:
+            self.loop.remove_reader(self.pidfd)
+            self.pidfd = -1
+
+        if self.proc is not None:
+            self.proc.reap(logger=self.log, pid_saver=self.mgr.save_pid)
+        self._reconnect()
+
+    def _reconnect(self):
+        """ wait as SshMgr says, unless stopped """
+        (again, delay_time) = self.mgr.end_attempt()
+        if not again:
+            self._done()
+            return
+        self.timer = self.loop.call_later(delay_time, self._connect)
+        if delay_time > 0:
+            self._open_netw()
+
+    def _open_netw(self):
+        """ watch for network coming back while waiting """
+        self.netw = NetWatch(groups=NET_UP_GROUPS, iface=self.mgr.wg_iface)
+        if self.netw.okay:
+            self.loop.add_reader(self.netw.fileno(), self._on_net)
+        else:
+            self.netw = None
+
+    def _close_netw(self):
+        """ done waiting """
+        if self.netw is not None:
+            self.loop.remove_reader(self.netw.fileno())
+            self.netw.close()
+            self.netw = None
+
+    def _on_net(self):
+        """ network came back : reconnect shortly """
+        if self.netw is None or not self.netw.read_net_up():
+            return
+        self._close_netw()
+        if self.timer is None:
+            return
+        delay = self.mgr.net_up()
+        if delay is not None and self.timer.when() - self.loop.time() > delay:
+            self.timer.cancel()
+            self.timer = self.loop.call_later(delay, self._connect)
+
+    def _done(self):
+        """ no more reconnects """
+        if not self.active:
+            return
+        self.active = False
+        self.mgr.stopped()
+        self.on_done()
+
+    def stop(self):
+        """
+        End ssh - done once it has exited and been reaped
+        """
+        if not self.active:
+            return
+        self.mgr.stop_event.set()
+        if self.timer:
+            # waiting to reconnect
+            self.timer.cancel()
+            self.timer = None
+            self._close_netw()
+            self._done()
+        elif self.proc is not None:
+            self.proc.terminate()
+
+
+class WgSupervisor:
+    """
+    Hosts resolv monitor and ssh listener of a WgClient in one process
+    """
+    def __init__(self, client: 'WgClient'):
+        self.client = client
+        self.done: asyncio.Future | None = None
+        self.resolv_task: _ResolvTask | None = None
+        self.ssh_tasks: list[_SshTask] = []
+        self.config_watch: ConfigWatch | None = None
+
+    def log(self, msg: str):
+        """ share client log """
+        self.client.log(msg)
+
+    def run(self) -> bool:
+        """
+        Run requested tasks until stopped
+         - waiting for wg to come up is done before the loop starts
+        """
+        opts = self.client.opts
+        self.log('supervisor: start')
+
+        with_resolv = False
+        if opts.fix_dns_auto_start:
+            with_resolv = self.client.wait_for_wg()
+            if not with_resolv:
+                self.log(' wg not running - skipping resolv monitor')
+
+        with_ssh = bool(opts.ssh_start) and self.client.ssh_prepare()
+
+        if not (with_resolv or with_ssh):
+            self.log('supervisor: nothing to do')
+            return False
+
+        asyncio.run(self._main(with_resolv, with_ssh))
+        self.log('supervisor: exit')
+        return True
+
+    async def _main(self, with_resolv: bool, with_ssh: bool):
+        """ event loop """
+        loop = asyncio.get_running_loop()
+        self.done = loop.create_future()
+
+        for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGQUIT):
+            loop.add_signal_handler(sig, self._on_signal, sig)
+        loop.add_signal_handler(SIG_STOP_RESOLV, self._stop_resolv)
+        loop.add_signal_handler(SIG_STOP_SSH, self._stop_ssh)
+
+        if with_resolv:
+            self.resolv_task = _ResolvTask(self.client.resolv, loop, self._check_done)
+            if not self.resolv_task.start():
+                self.resolv_task = None
+
+        if with_ssh:
+            for ssh_mgr in self.client.ssh_mgrs():
+                ssh_task = _SshTask(ssh_mgr, loop, self._check_done)
+                if ssh_task.start():
+                    self.ssh_tasks.append(ssh_task)
+            if self.ssh_tasks:
+                self._start_config_watch(loop)
+
+        self._check_done()
+        await self.done
+
+        if self.config_watch is not None:
+            loop.remove_reader(self.config_watch.fileno())
+            self.config_watch.stop()
+
+    def _start_config_watch(self, loop: asyncio.AbstractEventLoop):
+        """ live config reload - on the loop rather than in a thread """
+        self.config_watch = ConfigWatch(self.client.apply_config, log=self.log)
+        if self.config_watch.open():
+            loop.add_reader(self.config_watch.fileno(), self.config_watch.read_changes)
+            self.client.config_watch = self.config_watch
+        else:
+            self.config_watch = None
+
+    def _check_done(self):
+        """ exit once no task is left """
+        resolv_active = self.resolv_task is not None and self.resolv_task.inot is not None
+        ssh_active = any(ssh_task.active for ssh_task in self.ssh_tasks)
+        if self.done is None or self.done.done():
+            return
+        if not (resolv_active or ssh_active):
+            self.done.set_result(True)
+
+    def _stop_resolv(self):
+        """ another wg-client asked to stop the resolv monitor """
+        if self.resolv_task is not None:
+            self.resolv_task.stop()
+        self._check_done()
+
+    def _stop_ssh(self):
+        """ another wg-client asked to stop the ssh listeners """
+        for ssh_task in self.ssh_tasks:
+            ssh_task.stop()
+        self._check_done()
+
+    def _on_signal(self, signum: int):
+        """ stop everything """
+        self.log(f'supervisor: signal {signum} - shutting down')
+        self._stop_resolv()
+        self._stop_ssh()
@@ -0,0 +1,15 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Supervisor identity and stop signals
+ - used by resolv and ssh to stop a supervised task; imports nothing
+   of ours so they do not import the supervisor (which imports them)
+"""
+import signal
+
+# args of every supervisor - identifies them in a process table
+SUPERVISOR_SIGNATURE = ['--supervise']
+
+# ask a supervisor to stop one of its tasks (it exits once none are left)
+SIG_STOP_RESOLV = signal.SIGUSR1
+SIG_STOP_SSH = signal.SIGUSR2
@@ -13,3 +13,7 @@ from .file import write_file
 from .file import read_file
 
 from .toml import read_toml_file
+
+from .lazy import lazy_import
+
+from .class_inotify import Inotify
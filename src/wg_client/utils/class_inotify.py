@@ -0,0 +1,144 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Minimal inotify (linux)
+ - one non-blocking inotify fd which can be polled alongside other fds
+ - watches persist until removed (or the watched object goes away)
+"""
+import os
+import select
+import struct
+
+from .lazy import lazy_import
+
+ctypes = lazy_import('ctypes')
+
+IN_ACCESS = 0x00000001
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_CLOSE_NOWRITE = 0x00000010
+IN_OPEN = 0x00000020
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_ALL_EVENTS = 0x00000fff
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+
+# struct inotify_event : wd, mask, cookie, len then name (len bytes, nul padded)
+_EVENT = struct.Struct('=iIII')
+
+
+def parse_events(data: bytes) -> list[tuple[int, int, int, str]]:
+    """
+    Split buffer read from inotify fd.
+    Returns list of (wd, mask, cookie, name)
+    """
+    events: list[tuple[int, int, int, str]] = []
+    offset = 0
+    while offset + _EVENT.size <= len(data):
+        (wd, mask, cookie, name_len) = _EVENT.unpack_from(data, offset)
+        offset += _EVENT.size
+        name = data[offset:offset + name_len].rstrip(b'\0').decode(errors='replace')
+        offset += name_len
+        events.append((wd, mask, cookie, name))
+    return events
+
+
+class Inotify:
+    """
+    inotify instance
+     - okay is False if inotify is unavailable
+     - watches : wd -> path
+    """
+    def __init__(self):
+        self.fd: int = -1
+        self.okay: bool = False
+        self.watches: dict[int, str] = {}
+        self._libc = None
+
+        try:
+            self._libc = ctypes.CDLL(None, use_errno=True)
+            self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            self.fd = -1
+        self.okay = self.fd >= 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    def close(self):
+        """ release the fd (and with it all watches) """
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self.watches = {}
+
+    def fileno(self) -> int:
+        """ for poll/select """
+        return self.fd
+
+    def add_watch(self, path: str, mask: int) -> int:
+        """
+        Watch path for events in mask.
+        Returns watch descriptor or -1 on failure.
+        Adding an existing watch again replaces its mask.
+        """
+        if self.fd < 0 or self._libc is None:
+            return -1
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd >= 0:
+            self.watches[wd] = path
+        return wd
+
+    def rm_watch(self, wd: int):
+        """ remove watch wd """
+        if wd in self.watches:
+            del self.watches[wd]
+            if self.fd >= 0 and self._libc is not None:
+                self._libc.inotify_rm_watch(self.fd, wd)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Wait up to timeout secs (None = forever) for events.
+        Returns True if events are ready to read.
+        """
+        if self.fd < 0:
+            return False
+        poller = select.poll()
+        poller.register(self.fd, select.POLLIN)
+        msecs = None if timeout is None else max(0, int(timeout * 1000))
+        return bool(poller.poll(msecs))
+
+    def read_events(self) -> list[tuple[int, int, int, str]]:
+        """
+        Read all queued events without blocking.
+        Returns list of (wd, mask, cookie, name)
+         - watches the kernel dropped (IN_IGNORED) are forgotten
+        """
+        data = b''
+        while self.fd >= 0:
+            try:
+                chunk = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                break
+            if not chunk:
+                break
+            data += chunk
+
+        events = parse_events(data)
+        for (wd, mask, _cookie, _name) in events:
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+        return events
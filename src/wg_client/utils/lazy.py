@@ -0,0 +1,33 @@
+# SPDX-License-SPDX-License-Identifier: GPL-2.0-or-later
+# SPDX-FileCopyrightText: © 2023-present Gene C <arch@sapience.com>
+"""
+Lazy module import
+ - module is loaded on first attribute access rather than at import
+ - keeps start up fast for options that never use it (e.g. --version)
+"""
+import sys
+import importlib
+import importlib.util
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Return module 'name' which is only executed when first used.
+    If already imported, or no spec can be found, use normal import
+    (so a missing module still raises ImportError right here).
+    Top level modules only : finding the spec of 'a.b' imports 'a' now.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        return importlib.import_module(name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -4,7 +4,6 @@
 wg-tool support utils`
 """
 from datetime import datetime
-from dateutil import relativedelta
 
 
 def relative_time_string(seconds: int) -> str:
@@ -13,6 +12,9 @@ def relative_time_string(seconds: int) -> str:
      - seems like the largest unit returned is days
        keep years/months in case that ever changes
     '''
+    # pylint: disable=import-outside-toplevel
+    from dateutil import relativedelta
+
     delt = relativedelta.relativedelta(seconds=seconds)
     res = ''
     if delt.years > 0: